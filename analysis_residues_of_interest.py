@@ -52,6 +52,28 @@ def setupArguments ():
         help='Number of iterations to perform the significance test' 
     )
 
+    parser.add_argument(
+        '--all_cols',
+        default=False,
+        action='store_true',
+        help='To be used with find_significance. Runs the significance test for every column of the input csv (instead of only --col) and writes one combined table.'
+    )
+
+    parser.add_argument(
+        '--seed',
+        default=None,
+        type=int,
+        help='To be used with find_significance. Base seed of the random samples, so that the significance test can be reproduced (the seed used is printed if not given).'
+    )
+
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        default=1,
+        type=int,
+        help='To be used with find_significance. Number of worker processes used to run the iterations of the significance test in parallel (results do not depend on this).'
+    )
+
     parser.add_argument(
         '--no_normalize_by_total', 
         default=False,
@@ -100,7 +122,10 @@ def main ():
     resiObject.findOverlapInputSet()
     
     if args.find_significance != None:
-        resiObject.findSignificance()
+        if args.all_cols == True:
+            resiObject.findSignificanceAllCols()
+        else:
+            resiObject.findSignificance()
 
     resiObject.labelGraphOverlap()
     resiObject.visualize(resiObject.overlapGraph, "overlapGraph")
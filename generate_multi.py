@@ -1,4 +1,5 @@
 from multirin.generate import MainFunctions
+from multirin.generate.Structure import getNameFromPath
 import logging
 
 def main ():
@@ -6,8 +7,20 @@ def main ():
     args = MainFunctions.setupArguments(multiFlag)
     logging.basicConfig(filename=f'{args.output}multirin.log', filemode='w', format='%(name)s - %(levelname)s - %(message)s', level=logging.INFO)
     fileList = MainFunctions.readFile(multiFlag, args)
-    networkList = MainFunctions.generateIndividualNetworks(fileList, args)
-    multi = MainFunctions.generateMultiNetwork(networkList, args)
+
+    # Appends the new structures to an existing MultiNetwork if specified
+    if args.append is not None:
+        multi, networkList = MainFunctions.appendMultiNetwork(fileList, args)
+
+    # Otherwise calculates each network as it is added to the MultiNetwork, only keeping the networks that are visualized afterwards
+    # (all of them with the default --render all, so memory is only bounded with --render none or --render_structures)
+    else:
+        networkList = []
+        networks = MainFunctions.keepRenderedNetworks(MainFunctions.iterateIndividualNetworks(fileList, args), args, networkList)
+        multi = MainFunctions.generateMultiNetwork(networks, args, structList=[getNameFromPath(structName) for structName in fileList])
+
+    # Creates the visualizations of the individual networks after the MultiNetwork is written
+    MainFunctions.renderNetworks(networkList, args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,6 +5,7 @@ def main ():
     args = MainFunctions.setupArguments(multiFlag)
     fileList = MainFunctions.readFile(multiFlag, args)
     networkList = MainFunctions.generateIndividualNetworks(fileList, args)
+    MainFunctions.renderNetworks(networkList, args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,5 +1,6 @@
 from multirin.generate.MultiNetwork import MultiNetwork
-from multirin.generate.Subset import readPickle, exportPickle, generateSubsets
+from multirin.generate.Subset import readPickle, exportPickle, exportStore, exportManifests, generateSubsets, getSubsetIndices
+from multirin.generate.MultiNetworkStore import isStore
 from multirin.generate.MainFunctions import checkExtension
 import argparse
 import logging
@@ -14,7 +15,7 @@ def setupArguments ():
 
     parser.add_argument(
         'filename', 
-        help='Pickle (.pkl) file of the MultiNetwork object' 
+        help='Pickle (.pkl) file, Zarr store (.zarr), or subset manifest (.json) of the MultiNetwork object' 
     )
 
     parser.add_argument(
@@ -42,8 +43,14 @@ def setupArguments ():
         help='Makes continuous numerical values in column into discrete bins. Must specify as arguments (in order): bin size, starting bin, ending bin. \n Ex. for resolutions between 1 and 3A with bins of 0.5A: -d 0.5 1.0 3.0' 
     )
 
+    parser.add_argument(
+        '--copy',
+        action='store_true',
+        help='Exports a copy of each subset MultiNetwork (as a .pkl file, or a .zarr store if the input is a Zarr store). \n By default each subset is exported as a small .json manifest of its networks, which is opened as a view of the input MultiNetwork'
+    )
+
     args = parser.parse_args()
-    checkExtension(args.filename, '.pkl', "Input file must be in .pkl format")
+    checkExtension(args.filename, ['.pkl', '.zarr', '.json'], "Input file must be in .pkl, .zarr or .json format")
 
     return args
 
@@ -55,14 +62,23 @@ def main ():
     # Creates MultiNetwork object
     multinet = readPickle(args.filename)
 
+    # Exports a manifest of the networks of each subset, which are opened from the input MultiNetwork when the manifest is read
+    if not args.copy:
+        subsetIndices = getSubsetIndices(multinet, args.subset, groupName=args.group, makeDiscreteValue=args.make_discrete)
+        exportManifests(multinet, args.filename, subsetIndices, args.subset, args.outputname, makeDiscreteValue=args.make_discrete)
+        return
+
     # Generates subset MultiNetworks by subsetting by the classifier
     if args.group != None:
         subsetMultiNetworks = generateSubsets(multinet, args.subset, groupName=args.group, makeDiscreteValue=args.make_discrete)
     else:
         subsetMultiNetworks = generateSubsets(multinet, args.subset, makeDiscreteValue=args.make_discrete)
 
-    # Exports a series of pickle files
-    exportPickle(subsetMultiNetworks, args.subset, args.outputname)
+    # Exports a series of Zarr stores if the input is a Zarr store, otherwise a series of pickle files
+    if isStore(args.filename):
+        exportStore(subsetMultiNetworks, args.subset, args.outputname)
+    else:
+        exportPickle(subsetMultiNetworks, args.subset, args.outputname)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
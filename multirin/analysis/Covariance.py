@@ -11,6 +11,8 @@ from scipy.spatial.distance import squareform
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import DBSCAN, HDBSCAN
 import sklearn as sk
+from multirin.generate.MultiNetworkStore import readMultiNetwork
+from multirin.generate.MultiNetwork import toDense, toSquare, isCondensed, getPairIndices, getCondensedSize
 
 class Covariance:
 
@@ -19,9 +21,8 @@ class Covariance:
 
     def readPickle (self):
         
-        # Opens pickle file
-        with open(self.args.filename, 'rb') as pickleFile:
-            self.multinet = pickle.load(pickleFile)
+        # Opens pickle file or Zarr store (which is opened lazily)
+        self.multinet = readMultiNetwork(self.args.filename)
 
     def removeWeakEdges (self, sumArray):
         
@@ -40,12 +41,15 @@ class Covariance:
 
     def flatten (self):
 
-        # First stacks the array by creating a combined coordinate resiPair that combines firstResi and secondResi
-        stackedArray = self.multinet.array.stack(resiPair=("firstResi", "secondResi"))
-        stackedArray = stackedArray.dropna(dim="network", how="any")
-        
-        # Then calculates the sum of the stackedArray across the network dimension (ie the sum for each resiPair)
-        sumArray = stackedArray.sum(dim="network")
+        array = self.multinet.array.dropna(dim="network", how="any")
+
+        # Then calculates the sum of the array across the network dimension (ie the sum for each resiPair)
+        # The sum is converted to a dense array if the MultiNetwork is stored as a sparse array
+        # And expanded to a square array if the MultiNetwork is stored with a condensed pair axis
+        sumArray = toSquare(toDense(array.sum(dim="network")))
+
+        # Stacks the sum array by creating a combined coordinate resiPair that combines firstResi and secondResi
+        sumArray = sumArray.stack(resiPair=("firstResi", "secondResi"))
 
         # Removes weak edges if option is specified
         # Makes entries in array 0 if they fall below the threshold -> entries that are = 0 get removed in next step
@@ -54,8 +58,25 @@ class Covariance:
 
         # Then drops indices where the corresponding index in the sumArray is = 0 (meaning that there are no edges for that pair)
         # Creates a stackedArray with only columns with resiPairs that exist in the network
-        stackedArray = stackedArray.where(sumArray != 0, drop=True)
-        return stackedArray
+        sumArray = sumArray[(sumArray != 0).values]
+
+        if isCondensed(array):
+
+            # Gets the columns of each resiPair (in both directions) from the condensed pair axis
+            firstPositions = sumArray['firstResi'].values
+            secondPositions = sumArray['secondResi'].values
+            pairIndices = getPairIndices(firstPositions, secondPositions, getCondensedSize(array))
+
+            stackedArray = array.isel(pair=pairIndices).drop_vars(['firstResi', 'secondResi'])
+            stackedArray = stackedArray.rename(pair='resiPair').assign_coords(resiPair=sumArray.get_index('resiPair'))
+
+        else:
+            # First stacks the array by creating a combined coordinate resiPair that combines firstResi and secondResi
+            stackedArray = array.stack(resiPair=("firstResi", "secondResi"))
+            stackedArray = stackedArray.sel(resiPair=sumArray.get_index('resiPair'))
+
+        # Only these columns are converted to a dense array if the MultiNetwork is stored as a sparse array
+        return toDense(stackedArray)
 
     def calculateCovarianceByResiPair (self, scaleFlag):
         
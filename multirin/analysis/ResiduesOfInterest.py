@@ -8,8 +8,134 @@ import pickle
 import csv
 from multirin.generate.Structure import Structure
 from multirin.generate.IndividualNetwork import IndividualNetwork
+from multirin.generate.ContactSearch import findResidueContacts
 from argparse import Namespace
-import random
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+
+# Number of iterations of the significance test in each block (with its own random stream)
+permutationBlockSize = 1000
+
+def samplePermutations (populationSize, sampleSize, nIter, rng):
+
+    """
+    Function that draws random samples (without replacement) from a population all at once, as a matrix of indices
+
+    Inputs:
+    - populationSize: Number of items to sample from
+    - sampleSize: Number of items in each sample
+    - nIter: Number of samples
+    - rng: NumPy random Generator
+
+    Outputs:
+    - sampleIndices: (nIter, sampleSize) array of indices into the population, each row being one sample
+    """
+
+    if (sampleSize < 0) or (sampleSize > populationSize):
+        raise ValueError("Sample larger than population or is negative")
+
+    # The indices of the smallest sampleSize random keys of each row are a uniformly random sample without replacement
+    randomKeys = rng.random((nIter, populationSize))
+    return np.argsort(randomKeys, axis=1)[:, :sampleSize]
+
+def ksStatistics (firstSample, secondSamples):
+
+    """
+    Function that calculates the two-sided two-sample KS statistic between one sample and every row of a matrix of samples at once.
+    Values are the same as the (unadjusted) statistics calculated by scipy.stats.ks_2samp.
+
+    Inputs:
+    - firstSample: (n1,) array
+    - secondSamples: (m, n2) array, each row being one sample
+
+    Outputs:
+    - statistics: (m,) array of KS statistics
+    """
+
+    n1, n2 = len(firstSample), secondSamples.shape[1]
+    nSamples = secondSamples.shape[0]
+
+    # Combines the first sample with each second sample, and sorts each row (first sample values first if tied)
+    allValues = np.concatenate((np.broadcast_to(firstSample, (nSamples, n1)), secondSamples), axis=1)
+    fromFirst = np.concatenate((np.ones((nSamples, n1), dtype=np.int64), np.zeros((nSamples, n2), dtype=np.int64)), axis=1)
+
+    order = np.argsort(allValues, axis=1, kind='stable')
+    allValues = np.take_along_axis(allValues, order, axis=1)
+    fromFirst = np.take_along_axis(fromFirst, order, axis=1)
+
+    # Counts the values of each sample that are less than or equal to each value (the ECDFs at each value)
+    firstCounts = np.cumsum(fromFirst, axis=1)
+    secondCounts = np.arange(1, n1 + n2 + 1) - firstCounts
+
+    # The ECDFs are only evaluated at the last of each set of tied values
+    lastOfTies = np.ones(allValues.shape, dtype=bool)
+    lastOfTies[:, :-1] = allValues[:, 1:] != allValues[:, :-1]
+
+    cdfDiffs = np.where(lastOfTies, firstCounts / n1 - secondCounts / n2, 0)
+
+    return np.maximum(np.clip(-cdfDiffs.min(axis=1), 0, 1), cdfDiffs.max(axis=1))
+
+def calculateSignificance (closeInputResiCountList, randomResiCounts):
+
+    """
+    Function that runs the KS test between the input set and every random sample of residues.
+    The KS statistics of all samples are found at once (see ksStatistics), and since the p-value only depends on the statistic and sample sizes,
+    scipy.stats.ks_2samp is only run once for each different statistic.
+
+    Inputs:
+    - closeInputResiCountList: List of the fractions/numbers of residues close to network residues for each residue in the input set
+    - randomResiCounts: (n_iter, k) array of the same values for each residue of each random sample
+
+    Outputs:
+    - sig_test_df: Dataframe with the mean of the input set and random sample, KS statistic, and p-value of each random sample
+    """
+
+    import scipy
+    import statistics
+
+    rawStatistics = ksStatistics(np.asarray(closeInputResiCountList), randomResiCounts)
+
+    # Runs the KS test for the first random sample with each different statistic
+    uniqueStatistics, firstSamples, sampleGroups = np.unique(rawStatistics, return_index=True, return_inverse=True)
+    ksStats, pValues = np.zeros(len(uniqueStatistics)), np.zeros(len(uniqueStatistics))
+    for group, sample in enumerate(firstSamples):
+        ksStats[group], pValues[group] = scipy.stats.ks_2samp(closeInputResiCountList, randomResiCounts[sample])
+
+    sig_test_df = pd.DataFrame({'input_set_mean': statistics.mean(closeInputResiCountList),
+                                'non-input_set_mean': randomResiCounts.mean(axis=1),
+                                'ks_stat': ksStats[sampleGroups],
+                                'pvalue': pValues[sampleGroups]})
+
+    return sig_test_df
+
+
+def runSignificanceBlock (closeInputResiCountList, closeFractions, populationIndices, sampleSize, nIter, seedSequence):
+
+    """
+    Function that runs one block of iterations of the significance test (see ResiduesOfInterest.findSignificance) with its own random stream.
+    Blocks only depend on their seed, so they give the same results whether they are run in one process or split across worker processes.
+
+    Inputs:
+    - closeInputResiCountList: List of the fractions/numbers of residues close to network residues for each residue in the input set
+    - closeFractions: Array of the same values for every residue in the reference structure
+    - populationIndices: Array of the indices (into closeFractions) of the residues to draw random samples from
+    - sampleSize: Number of residues in each random sample
+    - nIter: Number of iterations (random samples) in the block
+    - seedSequence: NumPy SeedSequence of the block
+
+    Outputs:
+    - sig_test_df: Dataframe with the results of each iteration (see calculateSignificance)
+    - randomResiCountList: List of the values of the last random sample
+    """
+
+    # Draws all random samples of residues at once as a matrix of indices
+    # Then finds the fraction of residues close to network residues for every residue in every sample at once
+    randomIndices = samplePermutations(len(populationIndices), sampleSize, nIter, np.random.default_rng(seedSequence))
+    randomResiCounts = closeFractions[populationIndices[randomIndices]]
+
+    # Finds the statistical significance between all input set vs random residues' fraction of residues close to network
+    # Does this by a KS test for every random sample
+    return calculateSignificance(closeInputResiCountList, randomResiCounts), randomResiCounts[-1].tolist()
 
 class ResiduesOfInterest:
 
@@ -82,64 +208,128 @@ class ResiduesOfInterest:
 
     def findSignificance (self):
 
-        import scipy
-        import statistics
+        # Runs the significance test for the input set column given by the user
+        sig_test_df, closeInputResiCountList, randomResiCountList = self.runSignificance(self.args.col)
+
+        sig_test_df.to_csv(f'{self.args.outputname}_{self.args.col}_sig_test.csv', index=False)
+
+        # Plots histograms if either flag is provided
+        if (self.args.cumulative_histogram or self.args.histogram) == True:
+            self.plotHistogram(closeInputResiCountList, randomResiCountList)
+            self.plotBoxPlot(closeInputResiCountList, randomResiCountList)
+
+    def findSignificanceAllCols (self):
+
+        """
+        Function that runs the significance test for every column of the input set in one process, and writes the results to one combined table.
+        The contact map of the reference structure, the network residues, and the pool of worker processes are shared by all columns.
+        Every column uses the same seed, so its results are the same as running findSignificance for that column alone.
+        """
+
+        sigTestDfs = []
+
+        # Creates one pool of worker processes for all columns if specified
+        if getattr(self.args, 'jobs', 1) > 1:
+            executor = ProcessPoolExecutor(max_workers=self.args.jobs)
+        else:
+            executor = None
+
+        try:
+            for col in self.inputSetDict:
+
+                sig_test_df, closeInputResiCountList, randomResiCountList = self.runSignificance(col, executor)
+
+                # Adds the column name as the first column of the results
+                sig_test_df.insert(0, 'col', col)
+                sigTestDfs.append(sig_test_df)
+
+                # Plots histograms if either flag is provided
+                if (self.args.cumulative_histogram or self.args.histogram) == True:
+                    self.plotHistogram(closeInputResiCountList, randomResiCountList, col)
+                    self.plotBoxPlot(closeInputResiCountList, randomResiCountList, col)
+
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        pd.concat(sigTestDfs, ignore_index=True).to_csv(f'{self.args.outputname}_sig_test.csv', index=False)
+
+    def setupSignificance (self):
+
+        """
+        Function that finds the contact map of all residues in the reference structure and the seed of the significance test.
+        Only runs once, so that they are shared by every column of the input set.
+        """
+
+        if hasattr(self, 'allResisAdjacency'):
+            return
 
         ### First gets a network of all possible contacts between residues in input structure
         # Sets input structure file as Structure object
         inputStruct = Structure(self.args.find_significance, None)
 
-        # Creates IndividualNetwork object using the sumNetwork as an input network and inputStruct from user as reference structure
-        # Then uses the addallResidues() method to find all possible residue - residue contacts
+        # Gets all residues in the reference structure, then finds all possible residue - residue contacts as a sparse adjacency matrix (in one pass with a KD-tree)
         args = Namespace(no_norm_resi=False)
-        self.allResisNetwork = IndividualNetwork(inputStruct, args)
-        self.allResisNetwork.addAllResidues()
+        allResisDict = IndividualNetwork(inputStruct, args).createAllResidueDict(inputStruct)
+        self.setContactMap(*findResidueContacts(allResisDict))
 
-        allNetworkList = list(self.allResisNetwork.network.nodes)
+        # Residues with at least one contact (in the order of the reference structure), which the random samples are drawn from
+        allNetworkList = [resi for resi in self.allResis if self.totalDegrees[self.allResisIndex[resi]] > 0]
+        self.populationIndices = np.array([self.allResisIndex[resi] for resi in allNetworkList], dtype=np.int64)
 
-        ### Then finds the fraction of residues to each input set residue that are close to network residues
-        closeInputResiCountList = self.findFractionCloseToNetwork(self.inputSetDict[self.args.col])
+        # Gets the entropy of the seed once, so that it can be printed and reused by every column
+        self.seedEntropy = np.random.SeedSequence(getattr(self.args, 'seed', None)).entropy
+        print(f'Significance test seed: {self.seedEntropy}')
 
-        # Finds the set of residues that are not in the input set
-        #nonInputResiList = [i for i in allNetworkList if i not in self.inputSetDict[self.args.col]]
+    def runSignificance (self, col, executor=None):
 
-        # ### Then finds the fraction of residues to each non input set residue that are close to network residues
-        # closeNonInputResiCountList = self.findFractionCloseToNetwork(nonInputResiList)
+        """
+        Function that runs the significance test for one column of the input set.
+        The fraction of residues close to network residues for the input set is compared to random samples of residues by a KS test.
 
-        sig_test_values = []
+        Inputs:
+        - col: Column of the input set
+        - executor: Pool of worker processes to run the blocks of iterations in (runs them in this process if None)
 
-        for i in range(0, int(self.args.n_iter_sig_test)):
+        Outputs:
+        - sig_test_df: Dataframe with the results of each iteration (see calculateSignificance)
+        - closeInputResiCountList: List of the fractions/numbers of residues close to network residues for each residue in the input set
+        - randomResiCountList: List of the same values for the last random sample
+        """
 
-            # Finds random sample of residues
-            #print(len(self.inputSetDict[self.args.col]))
-            randomResiList = random.sample(allNetworkList, len(self.inputSetDict[self.args.col])) # allNetworkList
-            #print(randomResiList)
+        self.setupSignificance()
 
-            ### Then finds the fraction of residues to each non input set residue that are close to network residues
-            randomResiCountList = self.findFractionCloseToNetwork(randomResiList)
+        ### Then finds the fraction of residues to each input set residue that are close to network residues
+        closeInputResiCountList = self.findFractionCloseToNetwork(self.inputSetDict[col])
 
-            # Finds the statistical significance between all input set vs non input set residues' fraction of residues close to network
-            # Does this by a KS test
-            ksStat, pValue = scipy.stats.ks_2samp(closeInputResiCountList, randomResiCountList) #closeNonInputResiCountList
+        # Splits the iterations into blocks with a fixed number of iterations, each with an independent random stream spawned from the seed
+        # So the results for a given seed are the same regardless of the number of worker processes
+        nIter = int(self.args.n_iter_sig_test)
+        blockSizes = [min(permutationBlockSize, nIter - start) for start in range(0, nIter, permutationBlockSize)]
+        seedSequence = np.random.SeedSequence(self.seedEntropy)
 
-            sig_test_values.append({'input_set_mean': statistics.mean(closeInputResiCountList), 
-                                    'non-input_set_mean': statistics.mean(randomResiCountList), 
-                                    'ks_stat': ksStat,
-                                    'pvalue': pValue})
+        blockArgs = (itertools.repeat(closeInputResiCountList), itertools.repeat(self.closeFractions), itertools.repeat(self.populationIndices),
+                     itertools.repeat(len(self.inputSetDict[col])), blockSizes, seedSequence.spawn(len(blockSizes)))
 
-            # print(f'Input set mean: {statistics.mean(closeInputResiCountList)}')
-            # print(f'Non-input set mean: {statistics.mean(randomResiCountList)}')
-            # print(f'The p value is: {pValue}')
+        # Runs the blocks in the pool of worker processes if given (Executor.map returns the blocks in order)
+        if executor is not None:
+            blockResults = list(executor.map(runSignificanceBlock, *blockArgs))
 
-        sig_test_df = pd.DataFrame(sig_test_values)
-        sig_test_df.to_csv(f'{self.args.outputname}_{self.args.col}_sig_test.csv', index=False)
+        # Otherwise creates a pool of worker processes if specified
+        elif getattr(self.args, 'jobs', 1) > 1:
+            with ProcessPoolExecutor(max_workers=self.args.jobs) as executor:
+                blockResults = list(executor.map(runSignificanceBlock, *blockArgs))
 
-        # Plots histograms if either flag is provided
-        if (self.args.cumulative_histogram or self.args.histogram) == True:
-            self.plotHistogram(closeInputResiCountList, randomResiCountList)
-            self.plotBoxPlot(closeInputResiCountList, randomResiCountList)
+        else:
+            blockResults = list(map(runSignificanceBlock, *blockArgs))
+
+        # Merges the results of every block in order
+        sig_test_df = pd.concat([blockResult[0] for blockResult in blockResults], ignore_index=True)
+        randomResiCountList = blockResults[-1][1]
+
+        return sig_test_df, closeInputResiCountList, randomResiCountList
     
-    def plotHistogram (self, closeInputResiCountList, closeNonInputResiCountList):
+    def plotHistogram (self, closeInputResiCountList, closeNonInputResiCountList, col=None):
 
         """
         This function plots the histograms between the input set given and non input set
@@ -148,6 +338,7 @@ class ResiduesOfInterest:
         Inputs:
         - closeInputResiCountList: The list of fractions/numbers of the number of adjacent residues that are in the network for each residue in the input set
         - closeNonInputResiCountList: Same as closeInputResiCountList but for the non-input set
+        - col: Column of the input set (the column given by the user if None)
 
         Outputs:
         - Matplotlib plots of both histograms as .png files
@@ -155,6 +346,12 @@ class ResiduesOfInterest:
 
         import matplotlib.pyplot as plt
 
+        if col is None:
+            col = self.args.col
+
+        # Creates a new figure so that the histograms of different columns are not drawn on top of each other
+        plt.figure()
+
         # # Now plots the two distributions as histograms
         # fig, ax1 = plt.subplots()
 
@@ -169,10 +366,10 @@ class ResiduesOfInterest:
     
         # Creates two histogram plots
         color = 'blue'
-        plt.hist(closeInputResiCountList, label=f'{self.args.col} Residues', color=color, bins=binRange, density=True, cumulative=self.args.cumulative_histogram, histtype='step', linewidth=1.5)
+        plt.hist(closeInputResiCountList, label=f'{col} Residues', color=color, bins=binRange, density=True, cumulative=self.args.cumulative_histogram, histtype='step', linewidth=1.5)
         
         color = 'red'
-        plt.hist(closeNonInputResiCountList, label=f'Non {self.args.col} Residues', color=color, bins=binRange, density=True, cumulative=self.args.cumulative_histogram, histtype='step', linewidth=1.5)
+        plt.hist(closeNonInputResiCountList, label=f'Non {col} Residues', color=color, bins=binRange, density=True, cumulative=self.args.cumulative_histogram, histtype='step', linewidth=1.5)
 
         # Adds the axis labels and figure legend
         if self.args.no_normalize_by_total == False:
@@ -190,14 +387,18 @@ class ResiduesOfInterest:
             plt.legend(loc="upper right")
 
         # Saving figure
-        plt.title(self.args.col)
-        plt.savefig(f'{self.args.outputname}_{self.args.col}_Histogram.png')
+        plt.title(col)
+        plt.savefig(f'{self.args.outputname}_{col}_Histogram.png')
+        plt.close()
 
-    def plotBoxPlot (self, closeInputResiCountList, closeNonInputResiCountList):
+    def plotBoxPlot (self, closeInputResiCountList, closeNonInputResiCountList, col=None):
 
         import matplotlib.pyplot as plt
         import numpy as np
 
+        if col is None:
+            col = self.args.col
+
         # Create a figure and axes
         fig, ax = plt.subplots(figsize=(4, 6))
 
@@ -208,7 +409,7 @@ class ResiduesOfInterest:
         medianprops = dict(color='black', linewidth=0.5)  # Gray median line
 
         # Create the boxplots
-        ax.boxplot([closeInputResiCountList, closeNonInputResiCountList], labels=[f'{self.args.col}', f'Random'], widths=0.5, boxprops=boxprops, medianprops=medianprops, whiskerprops=whiskerprops, capprops=capprops)
+        ax.boxplot([closeInputResiCountList, closeNonInputResiCountList], labels=[f'{col}', f'Random'], widths=0.5, boxprops=boxprops, medianprops=medianprops, whiskerprops=whiskerprops, capprops=capprops)
 
         # Add title and labels
         plt.xlabel('Residues', fontsize=15)
@@ -232,7 +433,36 @@ class ResiduesOfInterest:
             plt.tight_layout()
 
         # Show the plot
-        plt.savefig(f'{self.args.outputname}_{self.args.col}_BoxPlot.png', bbox_inches='tight', dpi=300)
+        plt.savefig(f'{self.args.outputname}_{col}_BoxPlot.png', bbox_inches='tight', dpi=300)
+        plt.close()
+
+    def setContactMap (self, allResis, allResisAdjacency):
+
+        """
+        Function that stores the contact map of all residues in the reference structure (see ContactSearch.findResidueContacts),
+        along with the number of contacts of each residue to all residues and to network residues (residues in the sumNetwork)
+
+        Inputs:
+        - allResis: List of residue numbers, in the same order as the rows and columns of the adjacency matrix
+        - allResisAdjacency: Symmetric SciPy sparse boolean matrix of residue - residue contacts
+        """
+
+        self.allResis = allResis
+        self.allResisIndex = {resi: index for index, resi in enumerate(allResis)}
+        self.allResisAdjacency = allResisAdjacency
+
+        # Counts all contacts, and only contacts to network residues, for every residue at once
+        networkMask = np.array([resi in self.sumNetwork.nodes for resi in allResis], dtype=np.int64)
+        self.totalDegrees = np.asarray(allResisAdjacency.sum(axis=1)).ravel()
+        self.networkDegrees = allResisAdjacency.astype(np.int64) @ networkMask
+
+        # Fraction (or number) of contacts to network residues for every residue (same values as findFractionCloseToNetwork)
+        # Used to find the values of all random samples of residues at once in findSignificance
+        if self.args.no_normalize_by_total == False:
+            self.closeFractions = np.zeros(len(allResis), dtype=np.float64)
+            np.divide(self.networkDegrees, self.totalDegrees, out=self.closeFractions, where=self.totalDegrees > 0)
+        else:
+            self.closeFractions = self.networkDegrees
 
     def findFractionCloseToNetwork (self, resiList):
         
@@ -241,9 +471,9 @@ class ResiduesOfInterest:
         # Loops over every residue of interest in the input set
         for resi in resiList:
             
-            # Checks if the graph has the node or not
-            # If the node is not present then it is not close to any of the network residues
-            if self.allResisNetwork.network.has_node(resi) == False:
+            # Checks if the residue has any contacts or not
+            # If it has none then it is not close to any of the network residues
+            if (resi not in self.allResisIndex) or (self.totalDegrees[self.allResisIndex[resi]] == 0):
                 closeResiCountList.append(0)
 
             # Otherwise, it has at least one connection, and the number of connections is the degree
@@ -256,7 +486,7 @@ class ResiduesOfInterest:
                 if self.args.no_normalize_by_total == False:
 
                     # Then finds the degree of the total residue network (to find number of total connections)
-                    closeTotalResiCount = self.allResisNetwork.network.degree[resi]
+                    closeTotalResiCount = int(self.totalDegrees[self.allResisIndex[resi]])
 
                     # Divides network adjacent count by total count, appends this to list
                     closeNormCount = closeNetworkResiCount / closeTotalResiCount
@@ -276,16 +506,10 @@ class ResiduesOfInterest:
         Function that gets the degree of a node where its edges must pass a certain condtion
         Ex. get only degree of node to only network connections (network residues)
 
-        Based off of solution from: https://stackoverflow.com/questions/30077957/calculate-the-degree-of-nodes-only-including-edges-with-a-specific-attribute-in
+        The counts to network residues are found for every residue at once from the contact map (see setContactMap)
         """
 
-        degree = 0
-        for u,v,d in self.allResisNetwork.network.edges(inputNode, data=True):
-
-            if ((u == inputNode) & (v in self.sumNetwork.nodes)):
-                degree += 1
-              
-        return degree
+        return int(self.networkDegrees[self.allResisIndex[inputNode]])
 
     def labelGraphOverlap (self):
 
@@ -7,7 +7,11 @@ import logging
 import pickle
 import csv
 from multirin.generate.Structure import Structure
-from multirin.generate.Subset import generateSubsets
+from multirin.generate.Subset import getSubsetIndices
+from multirin.generate.MultiNetworkStore import readMultiNetwork
+from multirin.generate.MultiNetwork import toDense, toSquare, isSparse
+from multirin.generate.NetworkBlocks import getNetworkSum, getGroupSums
+from multirin.generate.Normalization import sumNetworkScalings, getMethod, SumNetworkStatistics
 
 class SumNetwork:
 
@@ -18,9 +22,8 @@ class SumNetwork:
 
     def readPickle (self):
         
-        # Opens pickle file
-        with open(self.args.filename, 'rb') as pickleFile:
-            self.multinet = pickle.load(pickleFile)
+        # Opens pickle file or Zarr store (which is opened lazily)
+        self.multinet = readMultiNetwork(self.args.filename)
 
     def generateSumNetworkAll (self):
 
@@ -42,6 +45,8 @@ class SumNetwork:
 
         """
         Calculates the sum network for each subset. Main running function for sum networks of subsets.
+        The sums of all subsets are calculated in a single pass through the MultiNetwork array (see NetworkBlocks.getGroupSums),
+        without creating a separate array for each subset.
 
         Inputs:
         - self.multinet - object that has MultiNetwork of all structures
@@ -52,25 +57,37 @@ class SumNetwork:
         - Adds values to self.sumArrays which are all the sum arrays with keys of the group
         """
 
-        # Generates subsets using the generateSubsets function in Subset.py
-        subsetMultiNetworks = generateSubsets(self.multinet, classifier, groupName=groupName)
+        # Finds the network indices of the structures in each subset using the getSubsetIndices function in Subset.py
+        subsetIndices = getSubsetIndices(self.multinet, classifier, groupName=groupName)
 
-        # Loops over each subset MultiNetwork object in the list
-        for subsetMultiNetwork in list(subsetMultiNetworks):
+        # Calculates the sum arrays of all subsets at once
+        groupSums = getGroupSums(self.multinet.array, list(subsetIndices.values()))
 
-            # Calculates the sum array (takes into account all flags provided)
-            self.sumArrays[subsetMultiNetwork] = self.calculateSum(subsetMultiNetworks[subsetMultiNetwork].array)
+        # Loops over each subset
+        for subset, sumValues in zip(subsetIndices, groupSums):
+
+            # Scales the sum array (takes into account all flags provided)
+            self.sumArrays[subset] = self.processSum(self.getSumArray(self.multinet.array, sumValues), len(subsetIndices[subset]))
             
-            # Tests whether the output from calculateSum is None (meaning the sumArray was empty)
-            if self.sumArrays[subsetMultiNetwork] is None:
+            # Tests whether the output from processSum is None (meaning the sumArray was empty)
+            if self.sumArrays[subset] is None:
 
-                # If so, then delete MultiNetwork and sumArray related to that group
-                print(f'Sum Array for {subsetMultiNetwork} is empty, removing from dictionary')
-                del subsetMultiNetworks[subsetMultiNetwork]
-                del self.sumArrays[subsetMultiNetwork]
+                # If so, then delete sumArray related to that group
+                print(f'Sum Array for {subset} is empty, removing from dictionary')
+                del self.sumArrays[subset]
 
             else:
-                logging.info(f'Created the subset sum array of {subsetMultiNetwork}')
+                logging.info(f'Created the subset sum array of {subset}')
+
+    def getSumArray (self, inputArray, sumValues):
+
+        """
+        Function that creates the square sum array (with axes [resi1, resi2]) from the sums of the networks of a MultiNetwork array,
+        with the residue axes of the MultiNetwork array (expanded to a square array if the MultiNetwork is stored with a condensed pair axis)
+        """
+
+        residueCoords = {name: coord for name, coord in inputArray.coords.items() if 'network' not in coord.dims}
+        return toSquare(xr.DataArray(sumValues, coords=residueCoords, dims=inputArray.dims[1:]))
 
     def calculateSum (self, inputArray):
 
@@ -82,25 +99,37 @@ class SumNetwork:
         """
 
         # Calculates the sum across the network dimension (i.e. for each i,j residue pair)
-        sumArray = inputArray.sum(dim="network")
+        # The sum is converted to a dense array if the MultiNetwork is stored as a sparse array
+        # Otherwise the networks are added one chunk at a time, so a MultiNetwork opened from a Zarr store is never loaded as a whole
+        if isSparse(inputArray):
+            sumArray = toSquare(toDense(inputArray.sum(dim="network")))
+        else:
+            sumArray = self.getSumArray(inputArray, getNetworkSum(inputArray))
+
+        return self.processSum(sumArray, inputArray.sizes['network'])
+
+    def processSum (self, sumArray, networkCount):
+
+        """
+        This function scales the sum array and removes its weak edges (if specified)
+
+        Inputs:
+        - sumArray: Two dimensional array with axes [resi1, resi2]
+        - networkCount: Number of networks that were summed
+        """
 
         # Tests if the sum of the entire sumArray = 0 (array is empty with no values)
         # If so, function ends and returns None
         if sumArray.sum() == 0:
             return None
 
-        # Scales the sum array to all be values between 0 and 20
-        # if self.args.no_scale_sum_network == False:
-        if self.args.scale_sum_network == 'max':
-            sumArray = self.scaleSumNetworkMax(sumArray)
-            logging.info(f'Scaled the Sum Network to values between 0 and 20')
-        elif self.args.scale_sum_network == 'struct':
-            sumArray = self.scaleSumNetworkStruct(sumArray, inputArray)
-            logging.info(f'Scaled the Sum Network by total number of structures')
-        elif self.args.scale_sum_network == 'none':
-            pass
-        else:
-            raise NameError("Scaling type not found")
+        # Scales the sum array (e.g. to all be values between 0 and 20)
+        # The scaling method (args.scale_sum_network) is found in the registry of sum network scalings (see Normalization.py)
+        scaling = getMethod(sumNetworkScalings, self.args.scale_sum_network)
+        sumArray = scaling.scale(sumArray, SumNetworkStatistics(sumArray, networkCount).calculate(scaling.statistics), self.args.sum_network_scaling_factor)
+
+        if scaling.message is not None:
+            logging.info(scaling.message)
 
         # Removes weak edges so that the network is easier to visualize
         if self.args.remove_weak_edges != None:
@@ -115,43 +144,14 @@ class SumNetwork:
 
         return sumArray
 
-    def scaleSumNetworkMax (self, sumArray):
-
-        """
-        Scales the Sum Network by the maximum value so max value is the scaling factor
-        """
-
-        # Gets maximum value across all dimensions
-        maxValue = sumArray.max(dim=['firstResi','secondResi']).item()
-
-        # Then divides each network by max value
-        # Scales to a set value (default 0 to 20)
-        sumArray = (sumArray / maxValue) * self.args.sum_network_scaling_factor
-
-        return sumArray
-    
-    def scaleSumNetworkStruct (self, sumArray, originalArray):
-
-        """
-        Scales the Sum Network by the number of total structures that were summed
-        """
-
-        # Gets total number of structures/networks
-        numberOfStructures = originalArray.sizes['network']
-        
-        # Then divides each network by total number of structures, also scales by scaling factor
-        sumArray = (sumArray / numberOfStructures) * self.args.sum_network_scaling_factor
-
-        return sumArray
-
     def removeWeakEdges (self, sumArray):
         
-        # Sorts the array and finds the maximum index to keep (by taking size of array * percent to cutoff)
-        # Then gets value at this index
-        sortedArray = np.sort(sumArray, axis=None)
-        sortedArray = sortedArray[sortedArray != 0]
-        maxIndex = round(sortedArray.size * (self.args.remove_weak_edges / 100))
-        cutoffValue = sortedArray[maxIndex]
+        # Finds the maximum index to keep among the non-zero values (by taking number of values * percent to cutoff)
+        # Then gets value at this index, by only partially sorting the non-zero values around the index
+        sumValues = sumArray.to_numpy()
+        nonzeroValues = sumValues[sumValues != 0]
+        maxIndex = round(nonzeroValues.size * (self.args.remove_weak_edges / 100))
+        cutoffValue = np.partition(nonzeroValues, maxIndex)[maxIndex]
 
         # Finds entries in the array where they are less than the cutoff threshold
         # Then it replaces them with 0.0
@@ -313,12 +313,15 @@ class SumNetwork:
         structName = self.args.seq_to_ref
         struct = Structure(structName, self.args)
         
+        # Gets the precomputed alignment index of the reference sequence
+        alignmentIndex = self.multinet.getAlignmentIndex(struct.name)
+
         # Iterates over each node in the graph
         # Then uses the AllToOne function to shift residue numbering back from the alignment positions to the reference sequence numbers
         mappingDict = {}
         for i in G.nodes:
 
-            newLabel = self.allToOne(self.multinet.seqaln, struct.name, struct.sequenceList, int(G.nodes[i]['label']))
+            newLabel = alignmentIndex.allToOne(struct.sequenceList, int(G.nodes[i]['label']))
             
             mappingDict[int(G.nodes[i]['label'])] = newLabel
             G.nodes[i]['label'] = newLabel
@@ -333,34 +336,6 @@ class SumNetwork:
 
         return G
 
-    def allToOne (self, seqaln, seqID, sequenceList, mainResidue):
-
-        mainCount = 0
-        seqIndex = 0
-        
-        # Iterates over each residue in the sequence of the structure being queried
-        for i in seqaln[seqID]:
-
-            # Increments the main count that counts the total number of positions it has passed on the alignment
-            mainCount = mainCount + 1
-
-            # If there is a residue present (not just a - used as a placeholder)
-            # Then increment the seq index that counts the total number of actual residue positions that have been passed
-            if i != '-':
-                seqIndex = seqIndex + 1
-                #print(seqIndex)
-
-            # Condition when it reaches the residue in question 
-            # (since seq index represents the position in the individual sequence and not the full alignment)
-            if mainCount == mainResidue:
-
-                if i == '-':
-                    return(f'NaN_{str(sequenceList[seqIndex])}_{str(mainCount)}')
-
-                else:
-                    # Returns the main count which is the position on the full alignment
-                    return(sequenceList[seqIndex])
-            
     def detectCommunities (self, G):
 
         # Community detection using the Girvan Newman method, returns a list of sets of communities for every k
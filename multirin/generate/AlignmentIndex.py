@@ -0,0 +1,82 @@
+class AlignmentIndex:
+
+    """
+    Precomputed index between the residue positions of one sequence and the columns of the full sequence alignment.
+    Built once per sequence so that converting residue numbers to alignment positions (and back) does not rescan the aligned sequence.
+
+    Alignment columns are numbered from 1 (the same numbering as the MultiNetwork array axes).
+    """
+
+    def __init__ (self, seqID, alignedSequence):
+
+        self.seqID = seqID
+
+        # Alignment column of each residue present in the sequence (i.e. not a - placeholder), in order
+        self.residueColumns = []
+
+        # For each alignment column, the number of residues passed up to and including that column and whether it is a - placeholder
+        # Index 0 is a placeholder so that the lists can be indexed by alignment column
+        self.columnResidueCounts = [0]
+        self.columnGaps = [True]
+
+        seqIndex = 0
+        for mainCount, i in enumerate(alignedSequence, start=1):
+
+            if i != '-':
+                seqIndex = seqIndex + 1
+                self.residueColumns.append(mainCount)
+
+            self.columnResidueCounts.append(seqIndex)
+            self.columnGaps.append(i == '-')
+
+        # Caches the residue number -> alignment column dictionary for each sequence list used
+        self.residueToColumnMaps = {}
+
+    def getResidueToColumnMap (self, sequenceList):
+
+        """
+        Function that returns a dictionary of residue number -> alignment column for a structure's sequence list (see Structure.getSequenceList)
+        """
+
+        sequenceKey = tuple(sequenceList)
+
+        if sequenceKey not in self.residueToColumnMaps:
+
+            # The nth residue in the sequence list is the nth residue present in the aligned sequence
+            self.residueToColumnMaps[sequenceKey] = dict(zip(sequenceList[1:], self.residueColumns))
+
+        return self.residueToColumnMaps[sequenceKey]
+
+    def oneToAll (self, sequenceList, seqResidue):
+
+        """
+        Function that converts a residue number of the structure into its position on the full alignment
+        """
+
+        residueToColumn = self.getResidueToColumnMap(sequenceList)
+
+        if int(seqResidue) not in residueToColumn:
+            raise KeyError(f'Residue {seqResidue} of {self.seqID} does not map to a position in the sequence alignment')
+
+        return residueToColumn[int(seqResidue)]
+
+    def allToOne (self, sequenceList, mainResidue):
+
+        """
+        Function that converts a position on the full alignment into the residue number of the structure.
+        Positions that are a - placeholder in this sequence are labelled as NaN_(previous residue)_(alignment position).
+        """
+
+        if (mainResidue < 1) or (mainResidue >= len(self.columnResidueCounts)):
+            raise KeyError(f'Position {mainResidue} is outside of the sequence alignment for {self.seqID}')
+
+        seqIndex = self.columnResidueCounts[mainResidue]
+
+        if seqIndex >= len(sequenceList):
+            raise KeyError(f'Position {mainResidue} of the sequence alignment does not map to a residue in {self.seqID}')
+
+        if self.columnGaps[mainResidue] == True:
+            return(f'NaN_{str(sequenceList[seqIndex])}_{str(mainResidue)}')
+
+        else:
+            return(sequenceList[seqIndex])
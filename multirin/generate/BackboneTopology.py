@@ -0,0 +1,118 @@
+import networkx as nx
+
+class BackboneTopology:
+
+    """
+    Immutable lookup version of the directed graph of backbone atoms that is searched for coupled backbone alt confs between adjacent residues.
+    Atom names are labelled _1 for the first residue and _2 for the second residue (e.g. C_1, N_2).
+
+    Has the same nodes and successors as the networkX graph it is created from, so it can be used in place of the graph in findBackboneConnections.
+    """
+
+    def __init__ (self, backboneGraph):
+
+        # Frozen set of atom names in the graph
+        self.nodes = frozenset(backboneGraph.nodes)
+
+        # Successors of each atom name, in the same order as in the graph
+        self.successorTable = {node: tuple(backboneGraph.successors(node)) for node in backboneGraph.nodes}
+
+        # Results of countConnections for each set of alt conf atom names that has been searched
+        # The same sets of alt conf atoms come up many times across residues and structures
+        self.connectionCounts = {}
+
+    def successors (self, node):
+        return self.successorTable[node]
+
+    def countConnections (self, altConfAtomNames, startingResidue='N_2'):
+
+        """
+        Function that counts the backbone atoms connected to the starting atom by a continuous path of alt conf atoms.
+        The count starts at 1 (the starting atom), and every successor with an alt conf that is reached adds 1.
+
+        Inputs:
+        - altConfAtomNames: Set of the labelled names (e.g. C_1, N_2) of the alt conf backbone atoms of both residues
+        - startingResidue: Atom name to start the search from
+        """
+
+        key = (startingResidue, frozenset(altConfAtomNames))
+
+        if key not in self.connectionCounts:
+
+            count = 1
+
+            # Searches from the starting atom, adding the successors that have alt confs to the stack of atoms to search from
+            searchStack = [startingResidue]
+            while searchStack:
+                for successor in self.successorTable[searchStack.pop()]:
+                    if successor in key[1]:
+                        count += 1
+                        searchStack.append(successor)
+
+            self.connectionCounts[key] = count
+
+        return self.connectionCounts[key]
+
+def getResidueType (resiName):
+
+    # Gets the type of residue that changes the backbone graph (PRO and GLY), all other residues are the same
+    if resiName in ('PRO', 'GLY'):
+        return resiName
+
+    return None
+
+def createBackboneGraph (firstResiType, secondResiType):
+
+    """
+    Function that creates the directed graph representing the path of search for backbone atoms in coupled backbone instances,
+    with the edges added or removed if either the first or second residue is a Proline or Glycine
+    """
+
+    backboneGraph = nx.DiGraph({'N_2': ['C_1','H_2','CA_2'],
+                                'CA_2': ['C_2','HA_2'],
+                                'C_2': ['O_2'],
+                                'C_1': ['O_1','CA_1'],
+                                'CA_1': ['HA_1','N_1'],
+                                'N_1': ['H_1']
+                                })
+
+    # Conditions to either add or remove edges if either first or second residue is a Proline or Glycine
+    if firstResiType == 'PRO':
+        backboneGraph.remove_edge('N_1','H_1')
+
+    if secondResiType == 'PRO':
+        backboneGraph.remove_edge('N_2','H_2')
+
+    if firstResiType == 'GLY':
+        backboneGraph.remove_edge('CA_1','HA_1')
+        backboneGraph.add_edge('CA_1','HA2_1')
+        backboneGraph.add_edge('CA_1','HA3_1')
+
+    if secondResiType == 'GLY':
+        backboneGraph.remove_edge('CA_2','HA_2')
+        backboneGraph.add_edge('CA_2','HA2_2')
+        backboneGraph.add_edge('CA_2','HA3_2')
+
+    return backboneGraph
+
+# Precompiles the backbone topology for every combination of residue types of the first and second residue
+backboneTopologies = {(firstResiType, secondResiType): BackboneTopology(createBackboneGraph(firstResiType, secondResiType))
+                      for firstResiType in (None, 'PRO', 'GLY') for secondResiType in (None, 'PRO', 'GLY')}
+
+def getBackboneTopology (firstResiName, secondResiName):
+
+    """
+    Function that returns the precompiled backbone topology for a pair of residues from their residue names (e.g. PRO, GLY, ALA)
+    """
+
+    return backboneTopologies[(getResidueType(firstResiName), getResidueType(secondResiName))]
+
+def getBackboneAtomNames (resiName):
+
+    """
+    Function that returns the (unlabelled) names of the atoms of a residue that are in the backbone graph.
+    These only depend on the residue's own type, and are the same whether it is the first (_1) or second (_2) residue of a pair.
+    """
+
+    resiType = getResidueType(resiName)
+    return frozenset(node[:-2] for node in backboneTopologies[(resiType, None)].nodes if node.endswith('_1'))
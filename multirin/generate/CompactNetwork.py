@@ -0,0 +1,55 @@
+import networkx as nx
+from pyvis.network import Network
+
+class CompactNetwork:
+
+    """
+    Lightweight record of a populated IndividualNetwork that holds only what is needed to build a MultiNetwork.
+    It does not keep the gemmi structure, so it is cheap to pass between processes and to store on disk.
+    """
+
+    def __init__ (self, name, sequenceList, adjacency, weightsRecord, distancesRecord, args):
+
+        self.name = name
+        self.sequenceList = sequenceList
+
+        # Dict of dicts representation of the network (same as IndividualNetwork.convertToAdjacency)
+        self.adjacency = adjacency
+
+        self.weightsRecord = weightsRecord
+        self.distancesRecord = distancesRecord
+
+        self.args = args
+
+    # Get functions
+
+    def getName (self):
+        return self.name
+
+    def getSequenceList (self):
+        return self.sequenceList
+
+    def convertToAdjacency (self):
+        return self.adjacency
+
+    def visualize (self):
+
+        # Rebuilds a networkX graph from the adjacency dict
+        # So any operations performed here do not affect the class object
+        visNetwork = nx.from_dict_of_dicts(self.adjacency)
+
+        # From VisArray function in postCONTACT script
+        visNetwork.remove_nodes_from(list(nx.isolates(visNetwork)))
+
+        #Converts node labels into strings
+        for i in visNetwork.nodes():
+            visNetwork.nodes[i]['label'] = str(i)
+
+        # Creates network object
+        # Notebook = true is for Jupyter Notebook (might need to remove later)
+        nts = Network(notebook=True)
+
+        # populates the nodes and edges data structures
+        nts.from_nx(visNetwork)
+        outputpath = f'{self.args.output}{self.name}.html'
+        nts.show(outputpath)
@@ -0,0 +1,110 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+def getAtomCoordinates (atomsDict):
+
+    """
+    Function that flattens a dictionary of residues -> gemmi atoms into coordinate and residue number arrays
+
+    Inputs:
+    - atomsDict: Dictionary with residue numbers as keys and lists of gemmi atoms as values
+
+    Outputs:
+    - coords: (N,3) array of atom coordinates
+    - resiNumbers: (N,) array of the residue number each atom belongs to
+    """
+
+    coords = []
+    resiNumbers = []
+
+    for resi in atomsDict:
+        for atom in atomsDict[resi]:
+            coords.append(atom.pos.tolist())
+            resiNumbers.append(resi)
+
+    return np.array(coords, dtype=np.float64).reshape(-1, 3), np.array(resiNumbers, dtype=np.int64)
+
+def findCandidatePairs (atomsDict, maxDist=4):
+
+    """
+    Function that uses a KD-tree over all atoms in atomsDict to find the pairs of residues with at least one atom-atom distance within maxDist.
+    Every other pair of residues cannot have any atom-atom connections, so they can be skipped without changing the network.
+
+    Inputs:
+    - atomsDict: Dictionary with residue numbers as keys and lists of gemmi atoms as values
+    - maxDist: Maximum distance cutoff value (A), same as in IndividualNetwork.findConnections
+
+    Outputs:
+    - candidatePairs: Set of (firstResi, secondResi) tuples where firstResi < secondResi
+    """
+
+    coords, resiNumbers = getAtomCoordinates(atomsDict)
+
+    if len(coords) == 0:
+        return set()
+
+    # Finds all atom pairs within maxDist, then converts these to pairs of residue numbers
+    tree = cKDTree(coords)
+    atomPairs = tree.query_pairs(r=maxDist, output_type='ndarray')
+
+    firstResis = resiNumbers[atomPairs[:, 0]]
+    secondResis = resiNumbers[atomPairs[:, 1]]
+
+    # Removes atom pairs within the same residue and orders each pair so that the smaller residue number is first
+    interResi = firstResis != secondResis
+    resiPairs = np.stack((np.minimum(firstResis, secondResis)[interResi], np.maximum(firstResis, secondResis)[interResi]), axis=1)
+    resiPairs = np.unique(resiPairs, axis=0)
+
+    return set(map(tuple, resiPairs.tolist()))
+
+def findResidueContacts (atomsDict, maxDist=4):
+
+    """
+    Function that finds the contact map of all residues in atomsDict in one pass, using a KD-tree over all of their atoms.
+    Two residues are in contact if at least one pair of their atoms is closer than maxDist.
+
+    This is the same as IndividualNetwork.findContactsROI, except that findContactsROI stops searching a pair of residues at the first pair of atoms
+    further than 25 A apart (tooFarCutoffValue), even if another pair of their atoms is in contact. Those pairs of residues (only possible for two
+    large, extended residues) are in contact here but not in findContactsROI, so ResiduesOfInterest can count a few more contacts than before.
+
+    Inputs:
+    - atomsDict: Dictionary with residue numbers as keys and lists of gemmi atoms as values (e.g. from IndividualNetwork.createAllResidueDict)
+    - maxDist: Contact distance cutoff (A)
+
+    Outputs:
+    - resis: List of the residue numbers, in the same order as the rows and columns of the adjacency matrix
+    - adjacency: Symmetric SciPy sparse (CSR) boolean matrix, which is True for every pair of different residues in contact
+    """
+
+    from scipy.sparse import csr_matrix
+
+    resis = list(atomsDict.keys())
+    resiIndex = {resi: index for index, resi in enumerate(resis)}
+
+    coords, resiNumbers = getAtomCoordinates(atomsDict)
+    atomResiIndices = np.array([resiIndex[resi] for resi in resiNumbers.tolist()], dtype=np.int64)
+
+    if len(coords) == 0:
+        return resis, csr_matrix((len(resis), len(resis)), dtype=bool)
+
+    # Finds all atom pairs within maxDist, then converts these to pairs of residue indices
+    # The KD-tree includes distances equal to maxDist, so these are removed to match the strict cutoff of the atom-atom search
+    tree = cKDTree(coords)
+    atomPairs = tree.query_pairs(r=maxDist, output_type='ndarray')
+
+    delta = coords[atomPairs[:, 0]] - coords[atomPairs[:, 1]]
+    atomPairs = atomPairs[np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1] + delta[:, 2] * delta[:, 2]) < maxDist]
+
+    firstResis = atomResiIndices[atomPairs[:, 0]]
+    secondResis = atomResiIndices[atomPairs[:, 1]]
+
+    # Removes atom pairs within the same residue and adds both orders of each pair of residues
+    interResi = firstResis != secondResis
+    rows = np.concatenate((firstResis[interResi], secondResis[interResi]))
+    cols = np.concatenate((secondResis[interResi], firstResis[interResi]))
+
+    # Duplicate atom pairs of the same residues are summed when converted to CSR, so the matrix is converted to boolean afterwards
+    adjacency = csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=(len(resis), len(resis)))
+    adjacency = adjacency.astype(bool)
+
+    return resis, adjacency
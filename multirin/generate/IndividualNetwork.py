@@ -3,10 +3,13 @@
 
 import gemmi
 import networkx as nx
-from pyvis.network import Network
-import copy
 import logging
 from multirin.generate.Structure import Structure
+from multirin.generate.ContactSearch import findCandidatePairs
+from multirin.generate.CompactNetwork import CompactNetwork
+from multirin.generate.BackboneTopology import getBackboneTopology
+from multirin.generate.ResidueRecord import ResidueRecord
+from multirin.generate.ResidueSpheres import ResidueSpheres, getAtomsCoordinates
 import numpy as np
 
 class IndividualNetwork:
@@ -80,15 +83,6 @@ class IndividualNetwork:
         atomsWithAltConfsDict, resToSeqPositionMap = self.findAltConfAtoms()
         amideHOnlyList = self.flagAmideHydrogenOnlyResidues(atomsWithAltConfsDict)
         
-        # Creates a directed graph representing the path of search for backbone atoms in coupled backbone instances
-        backboneGraph = nx.DiGraph({'N_2': ['C_1','H_2','CA_2'], 
-                                    'CA_2': ['C_2','HA_2'],
-                                    'C_2': ['O_2'],
-                                    'C_1': ['O_1','CA_1'],
-                                    'CA_1': ['HA_1','N_1'],
-                                    'N_1': ['H_1']
-                                    })
-
         # Creates lists for tracking the weights of all the following types of connections
         self.weightsRecord = {'adjResi': {'total': [], 'BB_BB': [], 'SC_BB': [], 'SC_SC': []},
                               'nonAdjResi': {'total': []}}
@@ -96,288 +90,247 @@ class IndividualNetwork:
         self.distancesRecord = {'adjResi': {'total': [], 'SC_BB': [], 'SC_SC': []},
                               'nonAdjResi': {'total': []}}
 
-        # Iterates over all pairs of residues that have alt-confs
-        for firstResi in atomsWithAltConfsDict:
-            for secondResi in atomsWithAltConfsDict:
+        # Classifies the alt conf atoms of each residue once (as arrays split into backbone vs sidechain atoms, and grouped by alt-loc)
+        # So that the pair search below only indexes into these records
+        residueRecords = {resi: ResidueRecord(atomsWithAltConfsDict[resi], self.struct.sequence[resi]['name']) for resi in atomsWithAltConfsDict}
+
+        # Uses a KD-tree to find the only pairs of residues that can have atom-atom connections (by default)
+        # Or checks every pair of residues with the bounding spheres of their alt conf atoms before searching atom by atom (spheres)
+        # Otherwise every pair of residues is searched atom by atom (all)
+        if self.args.contact_search == 'kdtree':
+            candidatePairs = findCandidatePairs(atomsWithAltConfsDict)
+        elif self.args.contact_search == 'spheres':
+            candidatePairs = ResidueSpheres({resi: residueRecords[resi].coords for resi in residueRecords}).findClosePairs(maxDist=4)
+        else:
+            candidatePairs = {(firstResi, secondResi) for firstResi in atomsWithAltConfsDict for secondResi in atomsWithAltConfsDict if firstResi < secondResi}
 
-                # Condition that satisfies both the fact that the first and second residues cannot be equal to each other
-                # And that we can prune duplicate connections by only looking at connection i,j and not j,i
-                if firstResi < secondResi:
+        # Pairs of residues to search: non-adjacent candidate pairs (which can have alt conf atoms within the distance cutoff), along with every pair of adjacent residues
+        # Adjacent residues are always searched since backbone connections do not depend on distance
+        # Only the pairs i,j with i < j are searched to prune duplicate connections, in the order of the residues in the structure
+        resiOrder = {resi: index for index, resi in enumerate(atomsWithAltConfsDict)}
+        adjacentPairs = {(resi, resi + 1) for resi in atomsWithAltConfsDict if (resi + 1) in atomsWithAltConfsDict}
+        searchPairs = sorted((pair for pair in candidatePairs | adjacentPairs if pair[0] < pair[1]), key=lambda pair: (resiOrder[pair[0]], resiOrder[pair[1]]))
 
-                    # Sets total connections
-                    totalConnections = 0
+        # Iterates over the pairs of residues that have alt-confs and can have connections
+        for firstResi, secondResi in searchPairs:
 
-                    # Sets the normalization factor
-                    normalizationFactor = (self.struct.sequence[firstResi]['atomcount'] + self.struct.sequence[secondResi]['atomcount']) / 10
+            # Sets total connections
+            totalConnections = 0
 
-                    # Condition to remove any cases of residues with amide H alt confs having connections with adjacent residues on the backbone
-                    if ((firstResi in amideHOnlyList) or (secondResi in amideHOnlyList)) and (firstResi + 1 == secondResi):
-                        #print("These residues' connections:", firstResi, secondResi, "are not being searched because they are adjacent and one has amide H's")
-                        continue
+            # Sets the normalization factor
+            normalizationFactor = (self.struct.sequence[firstResi]['atomcount'] + self.struct.sequence[secondResi]['atomcount']) / 10
 
-                    # Find backbone vs sidechain atoms
-                    backboneGraphCopy = copy.deepcopy(backboneGraph)
+            # Condition to remove any cases of residues with amide H alt confs having connections with adjacent residues on the backbone
+            if ((firstResi in amideHOnlyList) or (secondResi in amideHOnlyList)) and (firstResi + 1 == secondResi):
+                #print("These residues' connections:", firstResi, secondResi, "are not being searched because they are adjacent and one has amide H's")
+                continue
 
-                    # Conditions to either add or remove edges if either first or second residue is a Proline or Glycine
-                    if self.struct.sequence[firstResi]['name'] == 'PRO':
-                        backboneGraphCopy.remove_edge('N_1','H_1')
+            # Find backbone vs sidechain atoms
+            # Uses the precompiled backbone graph for the residue types (edges are different if either residue is a Proline or Glycine)
+            backboneTopology = getBackboneTopology(self.struct.sequence[firstResi]['name'], self.struct.sequence[secondResi]['name'])
 
-                    if self.struct.sequence[secondResi]['name'] == 'PRO':
-                        backboneGraphCopy.remove_edge('N_2','H_2')
+            # Uses the records of both residues, where the atoms are already split into backbone vs sidechain atoms and grouped by alt-loc
+            firstRecord, secondRecord = residueRecords[firstResi], residueRecords[secondResi]
 
-                    if self.struct.sequence[firstResi]['name'] == 'GLY':
-                        backboneGraphCopy.remove_edge('CA_1','HA_1')
-                        backboneGraphCopy.add_edge('CA_1','HA2_1')
-                        backboneGraphCopy.add_edge('CA_1','HA3_1')
+            # Remove backbone alt confs from calculation if specified (by default we do look at backbones and this is FALSE)
+            if self.args.only_sidechain == True:
 
-                    if self.struct.sequence[secondResi]['name'] == 'GLY':
-                        backboneGraphCopy.remove_edge('CA_2','HA_2')
-                        backboneGraphCopy.add_edge('CA_2','HA2_2')
-                        backboneGraphCopy.add_edge('CA_2','HA3_2')
+                # Finds connections only between sidechain atoms in first residue and second residue
+                totalConnections = self.findConnections(firstRecord.sidechainArrays, secondRecord.sidechainArrays)
 
-                    # Creates lists of backbone vs sidechain atoms for both residues, also creates the same list but just for the atom names
-                        
-                    backboneAtomsFirstResi, sidechainAtomsFirstResi, backboneAtomsSecondResi, sidechainAtomsSecondResi = [], [], [], []
-                    backboneAtomsFirstResiNames, sidechainAtomsFirstResiNames, backboneAtomsSecondResiNames, sidechainAtomsSecondResiNames = [], [], [], []
-                    backboneAtomsFirstResiGroupedByAltLoc, sidechainAtomsFirstResiGroupedByAltLoc, backboneAtomsSecondResiGroupedByAltLoc, sidechainAtomsSecondResiGroupedByAltLoc = {}, {}, {}, {}
-                    backboneAtomsFirstResiNamesGroupedByAltLoc, sidechainAtomsFirstResiNamesGroupedByAltLoc, backboneAtomsSecondResiNamesGroupedByAltLoc, sidechainAtomsSecondResiNamesGroupedByAltLoc = {}, {}, {}, {}
-
-                    # Iterates over each atom in the first residue, checks if atom name is in backbone graph, if so then adds to backbone atoms and if not adds to sidechain atoms
-                    for atom in atomsWithAltConfsDict[firstResi]:
-                        if f'{atom.name}_1' in backboneGraphCopy.nodes:
-                            backboneAtomsFirstResi.append(atom)
-                            backboneAtomsFirstResiNames.append(f'{atom.name}_1')
-
-                            if atom.altloc not in backboneAtomsFirstResiGroupedByAltLoc:
-                                backboneAtomsFirstResiGroupedByAltLoc[atom.altloc] = []
-                                backboneAtomsFirstResiNamesGroupedByAltLoc[atom.altloc] = []
-                            backboneAtomsFirstResiGroupedByAltLoc[atom.altloc].append(atom)
-                            backboneAtomsFirstResiNamesGroupedByAltLoc[atom.altloc].append(f'{atom.name}_1')
-                            
-                        else:
-                            sidechainAtomsFirstResi.append(atom)
-                            sidechainAtomsFirstResiNames.append(f'{atom.name}_1')
-
-                            if atom.altloc not in sidechainAtomsFirstResiGroupedByAltLoc:
-                                sidechainAtomsFirstResiGroupedByAltLoc[atom.altloc] = []
-                                sidechainAtomsFirstResiNamesGroupedByAltLoc[atom.altloc] = []
-                            sidechainAtomsFirstResiGroupedByAltLoc[atom.altloc].append(atom)
-                            sidechainAtomsFirstResiNamesGroupedByAltLoc[atom.altloc].append(f'{atom.name}_1')
-
-                    # Does the same but for the second residue
-                    for atom in atomsWithAltConfsDict[secondResi]:
-                        if f'{atom.name}_2' in backboneGraphCopy.nodes:
-                            backboneAtomsSecondResi.append(atom)
-                            backboneAtomsSecondResiNames.append(f'{atom.name}_2')
-
-                            if atom.altloc not in backboneAtomsSecondResiGroupedByAltLoc:
-                                backboneAtomsSecondResiGroupedByAltLoc[atom.altloc] = []
-                                backboneAtomsSecondResiNamesGroupedByAltLoc[atom.altloc] = []
-                            backboneAtomsSecondResiGroupedByAltLoc[atom.altloc].append(atom)
-                            backboneAtomsSecondResiNamesGroupedByAltLoc[atom.altloc].append(f'{atom.name}_2')
-
-                        else:
-                            sidechainAtomsSecondResi.append(atom)
-                            sidechainAtomsSecondResiNames.append(f'{atom.name}_2')
-
-                            if atom.altloc not in sidechainAtomsSecondResiGroupedByAltLoc:
-                                sidechainAtomsSecondResiGroupedByAltLoc[atom.altloc] = []
-                                sidechainAtomsSecondResiNamesGroupedByAltLoc[atom.altloc] = []
-                            sidechainAtomsSecondResiGroupedByAltLoc[atom.altloc].append(atom)
-                            sidechainAtomsSecondResiNamesGroupedByAltLoc[atom.altloc].append(f'{atom.name}_2')
-
-                    # Remove backbone alt confs from calculation if specified (by default we do look at backbones and this is FALSE)
-                    if self.args.only_sidechain == True:
-
-                        # Finds connections only between sidechain atoms in first residue and second residue
-                        totalConnections = self.findConnections(sidechainAtomsFirstResi, sidechainAtomsSecondResi)
-
-                    # Includes backbone alt confs (normal running scenario)
+            # Includes backbone alt confs (normal running scenario)
+            else:
+
+                # Case when these are adjacent residues
+                if (firstResi + 1 == secondResi):
+
+                    # STEP 1: Check backbone atoms for connections with other backbone atoms in continuous stretch of alt conf atoms
+                    
+                    # Checks if there are alt confs across the peptide bond (first residue has a carbonyl C alt-conf, second residue as a backbone amide N alt-conf)
+                    # If they don't then there are no backbone connections
+                    if (firstRecord.hasCarbonylC and secondRecord.hasAmideN) == False:
+                        BB_BB_Connections = 0
+
+                    # If they do both have alt confs, search the backbone graph to find number of connections
                     else:
+                        BB_BB_Connections = 0
 
-                        # Case when these are adjacent residues
-                        if (firstResi + 1 == secondResi):
+                        # Finds common alt-loc labels between the two residues
+                        altLocsInFirstResi = set(firstRecord.backboneNamesByAltLoc[1].keys())
+                        altLocsInSecondResi = set(secondRecord.backboneNamesByAltLoc[2].keys())
+                        altLocsInBoth = altLocsInFirstResi.intersection(altLocsInSecondResi)
 
-                            # STEP 1: Check backbone atoms for connections with other backbone atoms in continuous stretch of alt conf atoms
-                            
-                            # Checks if there are alt confs across the peptide bond (first residue has a carbonyl C alt-conf, second residue as a backbone amide N alt-conf)
-                            # If they don't then there are no backbone connections
-                            if (('C_1' in backboneAtomsFirstResiNames) and ('N_2' in backboneAtomsSecondResiNames)) == False:
-                                BB_BB_Connections = 0
+                        # For each common alt-loc, run the backbone search to find backbone connections across the two residues
+                        for altloc in altLocsInBoth:
+                            BB_BB_Connections += self.findBackboneConnections(firstRecord.backboneNamesByAltLoc[1][altloc], secondRecord.backboneNamesByAltLoc[2][altloc], backboneTopology)
+                        
+                        # Normalizes the number of connections by taking the connections and dividing by the number of alt conf atoms in both first and second residue (also scales by factor of 10 for visualization)
 
-                            # If they do both have alt confs, use recursive search to find number of connections
-                            else:
-                                BB_BB_Connections = 0
+                        # This allows us to normalize for both:
+                        # - Larger residues (eg. Trp) having more atoms that could bias the calculation to highlight larger residues
+                        # - Cases where there are a lot of alt confs for a given residue (eg. alt A,B,C,D) which would inflate the total number of atom-atom connections
+                        
+                        # Normally normalization is: ON, therefore this is FALSE
+                        if self.args.no_norm_resi == False:
+                            # backboneConnections = (backboneConnections / (len(set(backboneAtomsFirstResiNames)) + len(set(backboneAtomsSecondResiNames)))) * 10
+                            BB_BB_Connections = BB_BB_Connections / normalizationFactor
 
-                                # Finds common alt-loc labels between the two residues
-                                altLocsInFirstResi = set(backboneAtomsFirstResiGroupedByAltLoc.keys())
-                                altLocsInSecondResi = set(backboneAtomsSecondResiGroupedByAltLoc.keys())
-                                altLocsInBoth = altLocsInFirstResi.intersection(altLocsInSecondResi)
+                    # STEP 2: Check sidechain atoms for connections with other sidechain atoms in adjacent residue
 
-                                # For each common alt-loc, run the recursive backbone search to find backbone connections across the two residues
-                                for altloc in altLocsInBoth:
-                                    BB_BB_Connections += self.findBackboneConnections(backboneAtomsFirstResiNamesGroupedByAltLoc[altloc], backboneAtomsSecondResiNamesGroupedByAltLoc[altloc], backboneGraphCopy)
-                                
-                                # Normalizes the number of connections by taking the connections and dividing by the number of alt conf atoms in both first and second residue (also scales by factor of 10 for visualization)
+                    # If there are sidechain alt confs present
+                    if firstRecord.hasSidechain() or secondRecord.hasSidechain():
 
-                                # This allows us to normalize for both:
-                                # - Larger residues (eg. Trp) having more atoms that could bias the calculation to highlight larger residues
-                                # - Cases where there are a lot of alt confs for a given residue (eg. alt A,B,C,D) which would inflate the total number of atom-atom connections
-                                
-                                # Normally normalization is: ON, therefore this is FALSE
-                                if self.args.no_norm_resi == False:
-                                    # backboneConnections = (backboneConnections / (len(set(backboneAtomsFirstResiNames)) + len(set(backboneAtomsSecondResiNames)))) * 10
-                                    BB_BB_Connections = BB_BB_Connections / normalizationFactor
-
-                            # STEP 2: Check sidechain atoms for connections with other sidechain atoms in adjacent residue
-
-                            # If there are sidechain alt confs present
-                            if (len(sidechainAtomsFirstResi) + len(sidechainAtomsSecondResi)) > 0:
-                                SC_SC_Connections, SC_SC_distancesRecord = self.findConnections(sidechainAtomsFirstResi,sidechainAtomsSecondResi)
-                                SC_BB_Connections, SC_BB_distancesRecord = self.findConnections(sidechainAtomsFirstResi,backboneAtomsSecondResi, excludeAtoms=['CB','HB','HB2','HB3']) #, maxDist=3.0
-                                BB_SC_Connections, BB_SC_distancesRecord = self.findConnections(backboneAtomsFirstResi,sidechainAtomsSecondResi, excludeAtoms=['CB','HB','HB2','HB3']) #, maxDist=3.0
-                                
-                                # Updates distance records
-                                self.distancesRecord['adjResi']['SC_SC'] += SC_SC_distancesRecord
-                                self.distancesRecord['adjResi']['SC_BB'] += SC_BB_distancesRecord + BB_SC_distancesRecord
-                                self.distancesRecord['adjResi']['total'] += SC_SC_distancesRecord + SC_BB_distancesRecord + BB_SC_distancesRecord
+                        # Excludes the CB, HB, HB2, and HB3 atoms from backbone-sidechain connections (masks from the residue records)
+                        SC_SC_Connections, SC_SC_distancesRecord = self.findConnections(firstRecord.sidechainArrays, secondRecord.sidechainArrays)
+                        SC_BB_Connections, SC_BB_distancesRecord = self.findConnections(firstRecord.sidechainArrays, secondRecord.backboneArrays, firstExcluded=firstRecord.sidechainExcluded, secondExcluded=secondRecord.backboneExcluded) #, maxDist=3.0
+                        BB_SC_Connections, BB_SC_distancesRecord = self.findConnections(firstRecord.backboneArrays, secondRecord.sidechainArrays, firstExcluded=firstRecord.backboneExcluded, secondExcluded=secondRecord.sidechainExcluded) #, maxDist=3.0
+                        
+                        # Updates distance records
+                        self.distancesRecord['adjResi']['SC_SC'] += SC_SC_distancesRecord
+                        self.distancesRecord['adjResi']['SC_BB'] += SC_BB_distancesRecord + BB_SC_distancesRecord
+                        self.distancesRecord['adjResi']['total'] += SC_SC_distancesRecord + SC_BB_distancesRecord + BB_SC_distancesRecord
 
-                                # Same normalization as above
-                                if self.args.no_norm_resi == False:
-                                    SC_SC_Connections = SC_SC_Connections / normalizationFactor
-                                    SC_BB_Connections = SC_BB_Connections / normalizationFactor
-                                    BB_SC_Connections = BB_SC_Connections / normalizationFactor
+                        # Same normalization as above
+                        if self.args.no_norm_resi == False:
+                            SC_SC_Connections = SC_SC_Connections / normalizationFactor
+                            SC_BB_Connections = SC_BB_Connections / normalizationFactor
+                            BB_SC_Connections = BB_SC_Connections / normalizationFactor
 
-                            if BB_BB_Connections != 0:
-                                self.weightsRecord['adjResi']['BB_BB'].append(BB_BB_Connections)
-                            if (SC_BB_Connections + BB_SC_Connections) != 0:    
-                                self.weightsRecord['adjResi']['SC_BB'].append(SC_BB_Connections + BB_SC_Connections) # Since BB-SC and SC-BB are the same case just swapped in residue order
-                            if SC_SC_Connections != 0:
-                                self.weightsRecord['adjResi']['SC_SC'].append(SC_SC_Connections)
+                    if BB_BB_Connections != 0:
+                        self.weightsRecord['adjResi']['BB_BB'].append(BB_BB_Connections)
+                    if (SC_BB_Connections + BB_SC_Connections) != 0:    
+                        self.weightsRecord['adjResi']['SC_BB'].append(SC_BB_Connections + BB_SC_Connections) # Since BB-SC and SC-BB are the same case just swapped in residue order
+                    if SC_SC_Connections != 0:
+                        self.weightsRecord['adjResi']['SC_SC'].append(SC_SC_Connections)
 
-                            # Adds together the backbone and sidechain connections
-                            totalConnections = BB_BB_Connections + BB_SC_Connections + SC_BB_Connections + SC_SC_Connections
+                    # Adds together the backbone and sidechain connections
+                    totalConnections = BB_BB_Connections + BB_SC_Connections + SC_BB_Connections + SC_SC_Connections
 
-                            # Adds connection in the network between the two residues, with the weight being the total atom-atom connections
-                            if totalConnections != 0:
-                                self.network.add_edge(firstResi, secondResi, weight=totalConnections)
+                    # Adds connection in the network between the two residues, with the weight being the total atom-atom connections
+                    if totalConnections != 0:
+                        self.network.add_edge(firstResi, secondResi, weight=totalConnections)
 
-                                # Appends these weights to overall list of weights for tracking and subsequent plotting
-                                self.weightsRecord['adjResi']['total'].append(totalConnections)
+                        # Appends these weights to overall list of weights for tracking and subsequent plotting
+                        self.weightsRecord['adjResi']['total'].append(totalConnections)
 
-                        # Case when they are not adjacent residues
-                        else:
+                # Case when they are not adjacent residues
+                else:
 
-                            # Finds connections between all atoms regardless of whether it's a backbone or sidechain atom 
-                            totalConnections, nonAdj_distanceRecord = self.findConnections(atomsWithAltConfsDict[firstResi],atomsWithAltConfsDict[secondResi])
+                    # Finds connections between all atoms regardless of whether it's a backbone or sidechain atom 
+                    totalConnections, nonAdj_distanceRecord = self.findConnections(firstRecord.atomArrays, secondRecord.atomArrays)
 
-                            self.distancesRecord['nonAdjResi']['total'] += nonAdj_distanceRecord
+                    self.distancesRecord['nonAdjResi']['total'] += nonAdj_distanceRecord
 
-                            # Same normalization as above
-                            if self.args.no_norm_resi == False:
-                                totalConnections = totalConnections / normalizationFactor
+                    # Same normalization as above
+                    if self.args.no_norm_resi == False:
+                        totalConnections = totalConnections / normalizationFactor
 
-                            # Adds connection in the network between the two residues, with the weight being the total atom-atom connections
-                            if totalConnections != 0:
-                                self.network.add_edge(firstResi, secondResi, weight=totalConnections)
-                            
-                                # Appends this weight to tracking list
-                                self.weightsRecord['nonAdjResi']['total'].append(totalConnections)
+                    # Adds connection in the network between the two residues, with the weight being the total atom-atom connections
+                    if totalConnections != 0:
+                        self.network.add_edge(firstResi, secondResi, weight=totalConnections)
+                    
+                        # Appends this weight to tracking list
+                        self.weightsRecord['nonAdjResi']['total'].append(totalConnections)
 
         print(f"Average Adjacent Residue Total Weight for {self.struct.name}: {np.average(self.weightsRecord['adjResi']['total'])}")
         print(f"Average Non-Adjacent Residue Total Weight for {self.struct.name}: {np.average(self.weightsRecord['nonAdjResi']['total'])}")
     
-    def findConnections (self, firstResiAltConfAtoms, secondResiAltConfAtoms, minDist=0, maxDist=4, tooFarDist=25, excludeAtoms=[]):
+    def findConnections (self, firstResiAltConfAtoms, secondResiAltConfAtoms, minDist=0, maxDist=4, tooFarDist=25, excludeAtoms=[], firstExcluded=None, secondExcluded=None):
 
         """
         Function that finds distance connections between two residue's alt conf atoms.
+        All atom-atom distances between the two residues are computed at once as a distance block.
 
         Inputs:
-        - firstResiAltConfAtoms: List of alt conf atoms in first residue
+        - firstResiAltConfAtoms: Tuple of (coords, names, altlocs) arrays of alt conf atoms in first residue (e.g. ResidueRecord.atomArrays)
         - secondResiAltConfAtoms: Same but for second residue
         - minDist: Minimum distance cutoff value (A)
         - maxDist: Maximum distance cutoff value (A)
         - tooFarDist: Minimum distance (A) for two atoms and therefore residues to be considered as too far from each other
+        - excludeAtoms: List of atom names to not count in connections
+        - firstExcluded: Boolean mask of the first residue's atoms to not count in connections (e.g. from a ResidueRecord), used instead of excludeAtoms
+        - secondExcluded: Same but for second residue
         
         Outputs:
         - connections: Count of total number of connections
         - distancesRecord: List of the distances for each connection
         """
 
-        connections = 0
+        firstCoords, firstNames, firstAltlocs = firstResiAltConfAtoms
+        secondCoords, secondNames, secondAltlocs = secondResiAltConfAtoms
 
-        # List to keep track of distances
-        distancesRecord = []
+        # Checks the first pair of atoms before the whole distance block, since most pairs of residues are too far apart
+        if (len(firstCoords) > 0) and (len(secondCoords) > 0):
+            delta = firstCoords[0] - secondCoords[0]
+            if np.sqrt(delta[0] * delta[0] + delta[1] * delta[1] + delta[2] * delta[2]) > tooFarDist:
+                return 0, []
 
-        for firstAtom in firstResiAltConfAtoms:
-            for secondAtom in secondResiAltConfAtoms:
+        # Calculates the distance between every pair of atoms (rows are first residue atoms and columns are second residue atoms)
+        # Summed in the same order as the Gemmi dist() function so that distances are identical
+        delta = firstCoords[:, np.newaxis, :] - secondCoords[np.newaxis, :, :]
+        distances = np.sqrt(delta[:, :, 0] * delta[:, :, 0] + delta[:, :, 1] * delta[:, :, 1] + delta[:, :, 2] * delta[:, :, 2])
 
-                # If not, then calculate the distance between the two atoms
-                # Calculates distance between the two atoms using Gemmi dist() function
-                distance = firstAtom.pos.dist(secondAtom.pos)  
+        # Condition that checks if the distance between any atoms is greater than the threshold
+        # If it is, then they are considered to be too far to even both checking the rest of the residue
+        if np.any(distances > tooFarDist):
+            return 0, []
 
-                # Condition that checks if the distance between atoms is greater than the threshold
-                # If it is, then they are considered to be too far to even both checking the rest of the residue
-                if distance > tooFarDist:
-                    # print("These residues are too far to warrant a full atom-atom search: ", firstResi, secondResi, "checking next connection")
-                    return 0, []
-                
-                # Asks if the distance calculated between each atom pair is less than the maximum atomic distance the user specifies
-                elif (distance < maxDist) and (distance > minDist):
-                    if (firstAtom.name not in excludeAtoms) and (secondAtom.name not in excludeAtoms):
-                        
-                        connections += 1
-                        distancesRecord.append(distance)
-        
-        return connections, distancesRecord
+        # Asks if the distance calculated between each atom pair is within the distance cutoffs the user specifies
+        # And that neither of the atoms are excluded
+        connectionMask = (distances < maxDist) & (distances > minDist)
+        if firstExcluded is None:
+            firstExcluded = np.isin(firstNames, excludeAtoms)
+        if secondExcluded is None:
+            secondExcluded = np.isin(secondNames, excludeAtoms)
 
-    def findBackboneConnections (self, firstResiAltConfAtomNames, secondResiAltConfAtomNames, backboneGraph, startingResidue='N_2', count=1):
+        connectionMask &= ~firstExcluded[:, np.newaxis]
+        connectionMask &= ~secondExcluded[np.newaxis, :]
 
-        """
-        """
+        # Distances are kept in the same (row by row) order as the atom lists
+        connections = int(np.count_nonzero(connectionMask))
+        distancesRecord = distances[connectionMask].tolist()
 
-        # Iterates over each successor node in the backbone graph from the current residue
-        for successor in backboneGraph.successors(startingResidue):
+        return connections, distancesRecord
 
-            # If the successor has an alt-conf (present in either first residue or second residue alt conf names list)
-            if (successor in firstResiAltConfAtomNames) or (successor in secondResiAltConfAtomNames):
+    def findBackboneConnections (self, firstResiAltConfAtomNames, secondResiAltConfAtomNames, backboneTopology, startingResidue='N_2'):
 
-                # Updates the count by 1
-                newCount = count + 1
+        """
+        Function that counts the backbone connections between two adjacent residues for one alt-loc.
+        Searches the backbone graph from the starting atom through atoms that have an alt-conf in either the first or second residue.
 
-                # Recursively searches from the successor as the starting residue
-                count = self.findBackboneConnections(firstResiAltConfAtomNames, secondResiAltConfAtomNames, backboneGraph, startingResidue=successor, count=newCount)
+        Inputs:
+        - firstResiAltConfAtomNames: List of the backbone alt conf atom names of the first residue (labelled _1)
+        - secondResiAltConfAtomNames: Same but for the second residue (labelled _2)
+        - backboneTopology: Precompiled backbone graph for the pair of residues (see BackboneTopology)
+        - startingResidue: Atom name to start the search from
 
-        return count
+        Outputs:
+        - count: Number of connected backbone atoms, including the starting atom
+        """
+
+        return backboneTopology.countConnections(set(firstResiAltConfAtomNames).union(secondResiAltConfAtomNames), startingResidue)
     
     def visualize (self):
 
-        # Creates a deep copy of self.network
-        # So any operations performed here do not affect the class object
-        visNetwork = copy.deepcopy(self.network)
+        # Creates the pyvis visualization from the compact representation of the network
+        self.compact().visualize()
 
-        # From VisArray function in postCONTACT script
-        visNetwork.remove_nodes_from(list(nx.isolates(visNetwork)))
-        # nx.convert_node_labels_to_integers(visNetwork)
+    def getName (self):
+        return self.struct.getName()
 
-        #Converts node labels into strings
-        for i in visNetwork.nodes():
-            visNetwork.nodes[i]['label'] = str(i)
+    def getSequenceList (self):
+        return self.struct.getSequenceList()
 
-        # Gets weights of network
-        #widths = nx.get_edge_attributes(self.network, 'weight')
+    def convertToAdjacency (self):
+        return nx.to_dict_of_dicts(self.network)
 
-        # Creates network object
-        # Notebook = true is for Jupyter Notebook (might need to remove later)
-        nts = Network(notebook=True)
+    def compact (self):
 
-        # populates the nodes and edges data structures
-        nts.from_nx(visNetwork)
-        outputpath = f'{self.args.output}{self.struct.name}.html'
-        nts.show(outputpath)
+        """
+        Function that returns a CompactNetwork with the adjacency and weight/distance records of this network, without the gemmi structure
+        """
 
-    def convertToAdjacency (self):
-        return nx.to_dict_of_dicts(self.network)
+        return CompactNetwork(self.getName(), self.getSequenceList(), self.convertToAdjacency(), self.weightsRecord, self.distancesRecord, self.args)
 
 ### Functions used by Resi of Interest calculation only
 ### Not used by default Individual Network calculation for creating MultiNetworks
@@ -426,11 +379,19 @@ class IndividualNetwork:
         Only used in Residue of Interest calculation to find adjacent / all network residues
         """
 
+        # Finds the pairs of residues whose bounding spheres are within the contact cutoff, since no other pairs can have any contacts
+        firstResiSpheres = ResidueSpheres(getAtomsCoordinates(firstResiDict))
+        if secondResiDict is firstResiDict:
+            closePairs = firstResiSpheres.findClosePairs(contactCutoffValue)
+        else:
+            closePairs = firstResiSpheres.findClosePairs(contactCutoffValue, ResidueSpheres(getAtomsCoordinates(secondResiDict)))
+
         for firstResi in firstResiDict:
             for secondResi in secondResiDict:
 
                 # Condition that satisfies both the fact that the first and second residues cannot be equal to each other
-                if firstResi != secondResi:
+                # And skips pairs of residues that are too far apart to have any contacts
+                if (firstResi != secondResi) and ((firstResi, secondResi) in closePairs):
 
                     tooFarFlag = False
                     
@@ -1,8 +1,14 @@
 import argparse
 import os
-from .Structure import Structure
+import itertools
+import logging
+import collections
+from concurrent.futures import ProcessPoolExecutor
+from .Structure import Structure, getNameFromPath
 from .IndividualNetwork import IndividualNetwork
 from .MultiNetwork import MultiNetwork
+from .NetworkCache import NetworkCache
+from .MultiNetworkStore import openStore, appendStore, updateStoreAttributes, createStore, writeStoreRegion
 
 def setupArguments (multiFlag):
 
@@ -56,7 +62,7 @@ def setupArguments (multiFlag):
         parser.add_argument( 
             '--norm_type', 
             default='log',
-            help="Can choose the normalization of structures method (either log, total, etc.)"
+            help="Can choose the normalization of structures method (either log, total, max, or clip, see the registry in Normalization.py)"
         )
 
         parser.add_argument( 
@@ -105,6 +111,49 @@ def setupArguments (multiFlag):
             help='Option to remove weak edges by a percent cutoff factor specified'
         )
 
+        parser.add_argument( 
+            '--sparse', 
+            default=False,
+            action='store_true', 
+            help="Stores the MultiNetwork array as a sparse array so that memory scales with the number of edges (requires the sparse package)"
+        )
+
+        parser.add_argument( 
+            '--compact', 
+            default=False,
+            action='store_true', 
+            help="Stores each residue pair once (upper triangle) in the MultiNetwork array instead of as a square, the square form is created when needed"
+        )
+
+        parser.add_argument( 
+            '--compact_dtype', 
+            default='float32',
+            type=str, 
+            help="Data type of the edge weights when using --compact (default float32)"
+        )
+
+        parser.add_argument( 
+            '--output_format', 
+            default='pickle',
+            type=str, 
+            choices=['pickle', 'zarr'],
+            help="Format of the MultiNetwork output. Either pickle (default, MultiNetwork.pkl) or zarr (MultiNetwork.zarr, a chunked store that the analysis scripts open lazily)"
+        )
+
+        parser.add_argument( 
+            '--append', 
+            default=None,
+            type=str, 
+            help="Existing MultiNetwork Zarr store (.zarr) to append to. Only the structures that are not already in the store are calculated and added to it, then the normalization steps that depend on all structures are recalculated"
+        )
+
+        parser.add_argument( 
+            '--chunk_size', 
+            default=16,
+            type=int, 
+            help="Number of networks in each chunk of the Zarr store (default 16)"
+        )
+
         parser.add_argument( 
             '--output_info', 
             default=False,
@@ -134,6 +183,46 @@ def setupArguments (multiFlag):
         help="Turns off the normalization of each residue-residue pair in the network by the size of the residue"
     )
 
+    parser.add_argument(
+        '--contact_search',
+        default='kdtree',
+        choices=['kdtree', 'spheres', 'all'],
+        help="Method to find residue pairs to search for atom-atom connections. Either uses a KD-tree to only search pairs within the distance cutoff (kdtree, default), checks the bounding spheres of every pair of residues before searching them atom by atom (spheres), or searches every pair of residues atom by atom (all)"
+    )
+
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        default=1,
+        type=int,
+        help="Number of worker processes used to generate the individual networks in parallel"
+    )
+
+    parser.add_argument(
+        '--cache_dir',
+        help="Directory to cache the individual networks in, so structures that have not changed are not recalculated in later runs"
+    )
+
+    parser.add_argument(
+        '--cache_size',
+        default=1024,
+        type=int,
+        help="Maximum size of the network cache (MB). The least recently used networks are removed first"
+    )
+
+    parser.add_argument(
+        '--render',
+        default='all',
+        choices=['all', 'background', 'none'],
+        help="How the .html visualization of each individual network is created, always after the networks (and MultiNetwork) are written. Either one by one (all, default), in a pool of --jobs worker processes (background), or not at all (none). \n The networks that are visualized are kept in memory until then, so visualizing every structure uses memory that grows with the number of structures. Use --render none or --render_structures to keep memory bounded for large ensembles"
+    )
+
+    parser.add_argument(
+        '--render_structures',
+        nargs='+',
+        help="Names of the structures (file names without the extension) to create the .html visualization for, instead of all structures"
+    )
+
     parser.add_argument(
         '-a', 
         '--add_adjacent_residues', 
@@ -155,6 +244,10 @@ def setupArguments (multiFlag):
         if args.metadata != None:
             checkExtension(args.metadata, '.csv', "Labels file must be in .csv format")
 
+        # Checks only if the user wants to append to an existing MultiNetwork
+        if args.append != None:
+            checkExtension(args.append, '.zarr', "MultiNetwork to append to must be a .zarr store")
+
     # For single model inputs
     else:
         checkExtension(args.structureFile, '.pdb', "Structure file must be in .pdb format")
@@ -162,10 +255,14 @@ def setupArguments (multiFlag):
     return args
 
 def checkExtension (file, extension, errorMessage):
-    fileSplit = os.path.splitext(file)
+    fileSplit = os.path.splitext(os.path.normpath(file))
     fileExt = fileSplit[1]
 
-    if fileExt != extension:
+    # Allows either a single extension or a list of extensions
+    if isinstance(extension, str):
+        extension = [extension]
+
+    if fileExt not in extension:
         raise argparse.ArgumentTypeError(errorMessage)
     
 def readFile (multiFlag, args):
@@ -189,41 +286,279 @@ def readFile (multiFlag, args):
     
     return fileList
 
-def generateIndividualNetworks (fileList, args):
+def generateIndividualNetwork (structName, args):
+
+    """
+    Function that generates the network for a single structure.
+    Returns a CompactNetwork so that the gemmi structure is not kept (or sent back from a worker process).
+    """
+
+    # Uses the cached network if this structure has already been calculated with the same options
+    if args.cache_dir is not None:
+        cache = NetworkCache(args.cache_dir, args.cache_size)
+        cacheKey = cache.getKey(structName, args)
 
-    networkList = []
+        cachedNet = cache.load(cacheKey, args)
+        if cachedNet is not None:
+            logging.info(f'Loaded network from cache: {structName}')
+            return cachedNet
 
-    # Loops over every pathname in the structure pathname list
-    for structName in fileList:
-        
-        # Creates a structure object from the structure in pathname
-        struct = Structure(structName, args)
+    # Creates a structure object from the structure in pathname
+    struct = Structure(structName, args)
 
-        # Creates an individual network object from the structure object and then populates the network
-        net = IndividualNetwork(struct, args)
-        net.populateNetwork()
+    # Creates an individual network object from the structure object and then populates the network
+    net = IndividualNetwork(struct, args)
+    net.populateNetwork()
 
-        if args.add_adjacent_residues == True:
-            net.addAdjacentResidues()
+    if args.add_adjacent_residues == True:
+        net.addAdjacentResidues()
 
-        # Appends this to the list of networks
-        networkList.append(net)
+    compactNet = net.compact()
 
-        # Creates the pyvis visualization (as an .html output)
-        net.visualize()
+    if args.cache_dir is not None:
+        cache.save(cacheKey, compactNet)
+
+    return compactNet
+
+def iterateIndividualNetworks (fileList, args):
+
+    """
+    Generator that calculates the network of each structure in fileList in order, only as it is needed.
+    Each network can be added to the MultiNetwork and dropped before the next ones are calculated, so memory does not grow with the number of structures.
+    """
+
+    # Generates the networks in a pool of worker processes if specified
+    # Only a limited number of structures are submitted ahead of the network being used, so finished networks do not pile up in memory
+    if args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+
+            structNames = iter(fileList)
+            futures = collections.deque(executor.submit(generateIndividualNetwork, structName, args) for structName in itertools.islice(structNames, args.jobs * 2))
+
+            while futures:
+                net = futures.popleft().result()
+
+                for structName in itertools.islice(structNames, 1):
+                    futures.append(executor.submit(generateIndividualNetwork, structName, args))
+
+                yield net
+
+    # Otherwise loops over every pathname in the structure pathname list
+    else:
+        for structName in fileList:
+            yield generateIndividualNetwork(structName, args)
+
+def evictCache (args):
+
+    # Removes the least recently used networks if the cache is over its maximum size
+    # Called once the networks have been used, since a generator of networks (see iterateIndividualNetworks) is not always run past its last network
+    if args.cache_dir is not None:
+        NetworkCache(args.cache_dir, args.cache_size).evict()
+
+def generateIndividualNetworks (fileList, args):
+
+    # Generates the networks of all structures as a list (in the same order as the structure pathname list)
+    networkList = list(iterateIndividualNetworks(fileList, args))
+    evictCache(args)
 
     return networkList
 
-def generateMultiNetwork (networkList, args):
-    
+def isRendered (net, args):
+
+    # Checks whether the visualization of a network is created (see renderNetworks)
+    return (args.render != 'none') and ((args.render_structures is None) or (net.getName() in args.render_structures))
+
+def keepRenderedNetworks (networkList, args, renderList):
+
+    """
+    Generator that passes on each network of networkList, while keeping the networks that are visualized (see renderNetworks) in renderList.
+    Only the selected networks (args.render and args.render_structures) are kept, every other network can be dropped once it is added to the MultiNetwork.
+    Since the networks are visualized after the MultiNetwork is written, visualizing all structures (the default) keeps every network in memory until then.
+    """
+
+    for net in networkList:
+
+        if isRendered(net, args):
+            renderList.append(net)
+
+        yield net
+
+def renderNetwork (net):
+
+    # Creates the pyvis visualization (as an .html output) of a single network
+    net.visualize()
+
+def renderNetworks (networkList, args):
+
+    """
+    Function that creates the pyvis visualizations (as .html outputs) of the individual networks.
+    Called after the networks (and MultiNetwork) have been written, so the numerical outputs never wait on the visualizations.
+
+    Inputs:
+    - networkList: List of CompactNetwork objects
+    - args: Uses args.render (all, background, or none), args.render_structures (names of the structures to render, or None for all), and args.jobs
+    """
+
+    # Only renders the selected structures if specified
+    networkList = [net for net in networkList if isRendered(net, args)]
+
+    if networkList == []:
+        return
+
+    # Renders the networks in a pool of worker processes
+    if args.render == 'background':
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            list(executor.map(renderNetwork, networkList))
+
+    # Otherwise renders the networks one by one
+    else:
+        for net in networkList:
+            renderNetwork(net)
+
+def generateMultiNetwork (networkList, args, structList=None):
+
+    """
+    Function that creates the MultiNetwork from the networks and exports it as a Zarr store or a pickle file.
+
+    Networks are added one at a time, so networkList can be a generator that calculates each network as it is needed (see iterateIndividualNetworks),
+    as long as structList (the names of all structures in the same order) is given.
+    For a Zarr store, the networks are written into the store one chunk at a time, so the whole array is never created in memory.
+    """
+
     # Initializes an empty multi-network object 
     multi = MultiNetwork(args=args)
 
     # Adds networks from the list of individual networks
-    multi.addNetworks(networkList)
-
-    # Exports MultiNetwork object as a pickle file for further analysis
-    multi.exportPickle()
+    # Then exports MultiNetwork object as a Zarr store or a pickle file for further analysis
+    try:
+        if args.output_format == 'zarr':
+            streamStore(multi, networkList, structList, f'{args.output}MultiNetwork.zarr')
+        else:
+            multi.addNetworks(networkList, structList)
+            multi.exportPickle()
+
+    # The networks that were calculated are in the cache even if the MultiNetwork could not be created
+    finally:
+        evictCache(args)
 
     return multi
-    
+
+def streamStore (multi, networkList, structList, path):
+
+    """
+    Function that adds the networks to a MultiNetwork Zarr store one chunk of networks at a time.
+    Each chunk is locally normalized and written into the store, then the global normalization steps are calculated from the store.
+    """
+
+    if structList is None:
+        networkList = list(networkList)
+        structList = [net.getName() for net in networkList]
+
+    networkList = iter(networkList)
+    chunkSize = multi.args.chunk_size
+    records = []
+
+    for start in range(0, len(structList), chunkSize):
+
+        # Creates the locally normalized array of the next chunk of networks
+        records += multi.populateArray(itertools.islice(networkList, chunkSize), structList[start:start + chunkSize])
+
+        # Creates the store (sized for all structures) from the first chunk, then writes each chunk into it
+        if start == 0:
+            createStore(multi, structList, path, chunkSize=chunkSize)
+
+        writeStoreRegion(multi.array, path, start)
+        logging.info(f'Wrote networks {start} to {start + multi.array.sizes["network"]} to {path}')
+
+    # Runs a generator of networks to its end, so that it finishes (e.g. shuts down its pool of worker processes) once the last network is taken
+    # Each chunk only takes as many networks as there are structures, so a generator is not asked for a network after the last one otherwise
+    if next(networkList, None) is not None:
+        raise ValueError(f'There are more networks than structures ({len(structList)})')
+
+    updateGlobalNorm(multi, path)
+
+    logging.info(f'Finished adding networks to MultiNetwork object')
+
+    # Gets info about edges in MultiNetwork
+    if multi.args.output_info == True:
+        multi.getInfo(records)
+
+def updateGlobalNorm (multi, path):
+
+    """
+    Function that calculates the global normalization steps across all networks of a Zarr store (read from the store chunk by chunk),
+    and updates the attributes of the store with them
+    """
+
+    multi.array = openStore(path).localArray
+    multi.globalNorm = multi.getGlobalNorm()
+
+    multi.localArray = multi.array
+    multi.array = multi.applyGlobalNorm(multi.localArray, multi.globalNorm).fillna(0)
+
+    updateStoreAttributes(multi, path)
+    logging.info(f'Updated the normalization of {path}')
+
+# Options of a MultiNetwork that the networks appended to it must use
+appendOptions = ['only_sidechain', 'no_norm_resi', 'add_adjacent_residues', 'no_norm_struct', 'norm_type', 'log_norm_threshold',
+                 'clip_norm_threshold', 'scale_multinet', 'multinet_scale', 'compact', 'compact_dtype']
+
+def appendMultiNetwork (fileList, args):
+
+    """
+    Function that appends the networks of new structures to an existing MultiNetwork Zarr store (args.append).
+    Only the structures that are not already in the store are calculated, and only their locally normalized networks are written to the store.
+    The statistics of the normalization steps that depend on all networks are then recalculated, which are applied when the store is opened.
+    Returns the appended MultiNetwork and the list of networks of the new structures that are visualized (see renderNetworks).
+    """
+
+    storedMulti = openStore(args.append)
+
+    if storedMulti.localArray is None:
+        raise ValueError(f'{args.append} does not have a locally normalized array to append to (it was not created by generate_multi)')
+
+    # Uses the same options as the stored MultiNetwork for everything that changes the networks or their normalization
+    for option in appendOptions:
+        storedValue = getattr(storedMulti.args, option)
+        if getattr(args, option) != storedValue:
+            logging.warning(f'Using --{option} {storedValue} of the MultiNetwork being appended to')
+            setattr(args, option, storedValue)
+
+    # Only keeps the structures that are not already in the MultiNetwork
+    storedStructs = set(storedMulti.localArray.get_index('network').to_list())
+    newFileList = [structName for structName in fileList if getNameFromPath(structName) not in storedStructs]
+
+    if newFileList == []:
+        logging.info(f'No new structures to append to {args.append}')
+        return storedMulti, []
+
+    # Keeps only the networks that are visualized afterwards
+    renderList = []
+    networkList = keepRenderedNetworks(iterateIndividualNetworks(newFileList, args), args, renderList)
+
+    # Creates the locally normalized array of the new networks
+    # Uses the sequence alignment (which must include the new structures) and metadata given with this run
+    multi = MultiNetwork(args=args)
+    if multi.size != storedMulti.size:
+        raise ValueError(f'The sequence alignment length ({multi.size - 1}) is different from the MultiNetwork being appended to ({storedMulti.size - 1})')
+
+    if multi.metadata is None:
+        multi.metadata = storedMulti.metadata
+
+    try:
+        records = multi.populateArray(networkList, [getNameFromPath(structName) for structName in newFileList])
+    finally:
+        evictCache(args)
+
+    # Adds the new networks to the store
+    appendStore(multi.array, args.append)
+    logging.info(f'Appended {len(newFileList)} networks to {args.append}')
+
+    # Recalculates the global normalization steps across all networks (read from the store chunk by chunk)
+    updateGlobalNorm(multi, args.append)
+
+    # Gets info about edges in MultiNetwork (the individual network info only covers the appended structures)
+    if args.output_info == True:
+        multi.getInfo(records)
+
+    return multi, renderList
@@ -5,6 +5,92 @@ from Bio import SeqIO
 import pickle
 import logging
 import statistics
+from multirin.generate.AlignmentIndex import AlignmentIndex
+from multirin.generate.CompactNetwork import CompactNetwork
+from multirin.generate.NetworkBlocks import isInMemory, iterateStoredBlocks, getBlockTotals
+from multirin.generate.Normalization import structNormalizations, multinetScalings, getMethod, NetworkStatistics
+
+def isSparse (array):
+
+    # Tests whether an XArray object is backed by a sparse (pydata/sparse) array instead of a NumPy array
+    return hasattr(array.data, 'todense')
+
+def toDense (array):
+
+    """
+    Function that converts an XArray object backed by a sparse array or a lazily loaded (dask) array into one backed by a NumPy array.
+    Should only be used on reduced arrays (e.g. after summing over the network axis), a lazily loaded array is computed chunk by chunk.
+    """
+
+    if hasattr(array.data, 'compute'):
+        array = array.compute()
+
+    if isSparse(array):
+        return array.copy(data=array.data.todense())
+
+    return array
+
+def isCondensed (array):
+
+    # Tests whether an XArray object stores residue pairs on a single condensed (upper triangle) pair axis instead of as a square
+    return 'pair' in array.dims
+
+def getPairIndices (firstPositions, secondPositions, size):
+
+    """
+    Function that converts pairs of alignment positions into indices on the condensed pair axis.
+    The pair axis holds the upper triangle (i < j) of the square array in row-major order, the order of the two positions does not matter.
+    """
+
+    firstPositions, secondPositions = np.minimum(firstPositions, secondPositions), np.maximum(firstPositions, secondPositions)
+    return firstPositions * (2 * size - firstPositions - 1) // 2 + (secondPositions - firstPositions - 1)
+
+def getCondensedSize (array):
+
+    # Gets the length of the square residue axes that a condensed pair axis was created from
+    secondPositions = array['secondResi'].values
+    return int(secondPositions.max()) + 1 if len(secondPositions) > 0 else 0
+
+def toSquare (array):
+
+    """
+    Function that expands an XArray object with a condensed pair axis into square form with firstResi and secondResi axes.
+    Each pair is written to both (i, j) and (j, i), and the diagonal is zero. Arrays already in square form are returned as they are.
+    """
+
+    if not isCondensed(array):
+        return array
+
+    # Moves the pair axis to the end so that the other axes are kept in front of the square axes
+    array = array.transpose(..., 'pair')
+    otherDims = array.dims[:-1]
+
+    firstPositions = array['firstResi'].values
+    secondPositions = array['secondResi'].values
+    size = getCondensedSize(array)
+    shape = array.shape[:-1] + (size, size)
+
+    if isSparse(array):
+        import sparse
+
+        # Writes each stored pair to both sides of the diagonal
+        otherCoords = array.data.coords[:-1]
+        pairIndices = array.data.coords[-1]
+        coords = np.concatenate((
+            np.vstack((otherCoords, firstPositions[pairIndices], secondPositions[pairIndices])),
+            np.vstack((otherCoords, secondPositions[pairIndices], firstPositions[pairIndices]))
+        ), axis=1)
+        squareData = sparse.COO(coords, np.concatenate((array.data.data, array.data.data)), shape=shape, fill_value=0)
+
+    else:
+        squareData = np.zeros(shape, dtype=array.dtype)
+        squareData[..., firstPositions, secondPositions] = array.data
+        squareData[..., secondPositions, firstPositions] = array.data
+
+    coords = {dim: array[dim].values for dim in otherDims if dim in array.coords}
+    coords.update(firstResi=range(size), secondResi=range(size))
+
+    return xr.DataArray(squareData, coords=coords, dims=otherDims + ('firstResi', 'secondResi'))
 
 class MultiNetwork:
     
@@ -35,6 +121,7 @@ class MultiNetwork:
         # Tests whether alignment is already provided or not
         if seqaln is not None:
             self.seqaln = seqaln
+            self.setAlignmentIndex()
 
         # Condition if alignment file is provided in args
         elif args.alignmentFile is not None:
@@ -55,6 +142,11 @@ class MultiNetwork:
         else:
             self.metadata = None
 
+        # Locally normalized array (before the global normalization steps) and the statistics used by the global steps
+        # Only kept when needed to append networks later (see getGlobalNorm and applyGlobalNorm)
+        self.localArray = None
+        self.globalNorm = {}
+
     # Set functions
 
     def setSeqAlignment (self, alignmentPath):
@@ -73,6 +165,19 @@ class MultiNetwork:
         # Increments by one due to how indexing starts at 0 but residue numbering starts at 1
         self.size += 1
 
+        self.setAlignmentIndex()
+
+    def setAlignmentIndex (self):
+
+        """
+        Function that precomputes the index between residue numbers and alignment positions for every sequence in the alignment
+        """
+
+        self.alignmentIndex = {}
+
+        for pdbid in self.seqaln:
+            self.alignmentIndex[pdbid] = AlignmentIndex(pdbid, self.seqaln[pdbid])
+
     def setMetaData (self, csvFile):
 
         """
@@ -99,149 +204,526 @@ class MultiNetwork:
             kwargs = {metadataColumn : self.metadata[metadataColumn].str.split('; ')}
             self.metadata = self.metadata.assign(**kwargs)
 
+    def getAlignmentIndex (self, seqID):
+
+        # Builds the index if it is not present (e.g. MultiNetwork objects pickled before the index existed)
+        if not hasattr(self, 'alignmentIndex'):
+            self.setAlignmentIndex()
+
+        if seqID not in self.alignmentIndex:
+            raise KeyError(f'{seqID} is not in the sequence alignment')
+
+        return self.alignmentIndex[seqID]
+
     def oneToAll (self, seqID, sequenceList, seqResidue):
-        
-        mainCount = 0
-        seqIndex = 0
-     
-        # Iterates over each residue in the sequence of the structure being queried
-        for i in self.seqaln[seqID]:
-
-            # Increments the main count that counts the total number of positions it has passed on the alignment
-            mainCount = mainCount + 1
-
-            # If there is a residue present (not just a - used as a placeholder)
-            # Then increment the seq index that counts the total number of actual residue positions that have been passed
-            if i != '-':
-                seqIndex = seqIndex + 1
-
-            # Condition when it reaches the residue in question 
-            # (since seq index represents the position in the individual sequence and not the full alignment)
-            if sequenceList[seqIndex] == int(seqResidue) and i != '-':
-                
-                logging.debug(f'Final Main count: {mainCount} Seq count: {sequenceList[seqIndex]} Resi: {i}')
 
-                # Returns the main count which is the position on the full alignment
-                return(mainCount)
+        # Looks up the position on the full alignment of the residue in the structure being queried
+        return self.getAlignmentIndex(seqID).oneToAll(sequenceList, seqResidue)
 
-            logging.debug(f'Main count: {mainCount} Seq count: {sequenceList[seqIndex]} Resi: {i}')
+    def getEdgeArrays (self, inputAdjacencyDict, inputStructName, inputSequenceList):
 
-    def add (self, inputAdjacencyDict, inputStructName, inputSequenceList):
+        """
+        Function that converts an adjacency dict of dicts into arrays of alignment positions and edge weights
+
+        Outputs:
+        - firstPositions, secondPositions: Arrays of the alignment positions of each pair of residues
+        - weights: Array of the edge weight of each pair
+        """
 
-        # Loops through all pairings                
+        # Gets the residue number -> alignment position mapping of this structure
+        alignmentIndex = self.getAlignmentIndex(inputStructName)
+
+        firstPositions, secondPositions, weights = [], [], []
+
+        # Loops through all pairings
         for firstResi in inputAdjacencyDict:
             for secondResi in inputAdjacencyDict[firstResi]:
-                
-                #print(f"Before conversion: {firstResi} {secondResi}")
 
-                # Uses the OneToAll conversion function to map individual resi # to sequence alignment #
-                updatedFirstResi = self.oneToAll(inputStructName, inputSequenceList, firstResi)
-                updatedSecondResi = self.oneToAll(inputStructName, inputSequenceList, secondResi)
+                # Uses the OneToAll conversion to map individual resi # to sequence alignment #
+                firstPositions.append(alignmentIndex.oneToAll(inputSequenceList, firstResi))
+                secondPositions.append(alignmentIndex.oneToAll(inputSequenceList, secondResi))
+                weights.append(inputAdjacencyDict[firstResi][secondResi]['weight'])
 
-                #print(f"After conversion: {updatedFirstResi} {updatedSecondResi}")
+        return np.array(firstPositions, dtype=np.int64), np.array(secondPositions, dtype=np.int64), np.array(weights, dtype=np.float64)
 
-                logging.debug(f'Adding network pair: ({firstResi},{secondResi}) as ({updatedFirstResi},{updatedSecondResi})')
-                # Adds pairing to the array along with the weight
-                self.array.loc[inputStructName, updatedFirstResi, updatedSecondResi] = inputAdjacencyDict[firstResi][secondResi]['weight']
+    def getArrayIndices (self, inputStructName, firstPositions, secondPositions, weights):
 
-    # TODO: Update unit test to make sure this function works
-    def normalizeStruct (self):
+        """
+        Function that finds the indices of a structure and its alignment positions on the axes of the MultiNetwork array
+
+        Outputs:
+        - networkIndex: Index of the structure on the network axis
+        - indices: Tuple of the indices of each pair on the residue axes (firstResi, secondResi) or the condensed pair axis
+        - weights: Edge weight of each pair (for the condensed pair axis, only one direction of each pair is kept)
+        """
+
+        networkIndex = self.array.get_index('network').get_loc(inputStructName)
+
+        if isCondensed(self.array):
+
+            if np.any(firstPositions < 0) or np.any(firstPositions >= self.size) or np.any(secondPositions < 0) or np.any(secondPositions >= self.size):
+                raise KeyError(f'Alignment positions of {inputStructName} are outside of the MultiNetwork array')
+
+            # Keeps each pair only once since the pair axis only holds the upper triangle
+            upperTriangle = firstPositions < secondPositions
+            indices = (getPairIndices(firstPositions[upperTriangle], secondPositions[upperTriangle], self.size),)
+
+            return networkIndex, indices, weights[upperTriangle]
+
+        firstIndices = self.array.get_index('firstResi').get_indexer(firstPositions)
+        secondIndices = self.array.get_index('secondResi').get_indexer(secondPositions)
+
+        if np.any(firstIndices == -1) or np.any(secondIndices == -1):
+            raise KeyError(f'Alignment positions of {inputStructName} are outside of the MultiNetwork array')
+
+        return networkIndex, (firstIndices, secondIndices), weights
+
+    def add (self, inputAdjacencyDict, inputStructName, inputSequenceList):
+
+        firstPositions, secondPositions, weights = self.getEdgeArrays(inputAdjacencyDict, inputStructName, inputSequenceList)
+        logging.debug(f'Adding {len(weights)} network pairs for {inputStructName}')
+
+        # Finds the indices of the structure and the alignment positions on the array axes
+        networkIndex, indices, weights = self.getArrayIndices(inputStructName, firstPositions, secondPositions, weights)
+
+        # Adds all pairings to the array along with their weights in one operation
+        self.array.data[(networkIndex,) + indices] = weights
+
+    def addSparse (self, networkList):
+
+        """
+        Function that adds all networks to an empty sparse MultiNetwork array in one operation.
+        Only the edges of each network are stored, so memory scales with the number of edges instead of the alignment length squared.
+        """
+
+        import sparse
+
+        coords, weights = [], []
+
+        # Collects the indices and weights of every edge across all networks
+        for net in networkList:
+            logging.info(f'Adding network: {net.getName()}')
+
+            firstPositions, secondPositions, netWeights = self.getEdgeArrays(net.convertToAdjacency(), net.getName(), net.getSequenceList())
+            networkIndex, indices, netWeights = self.getArrayIndices(net.getName(), firstPositions, secondPositions, netWeights)
+
+            coords.append(np.vstack((np.full(len(netWeights), networkIndex),) + indices))
+            weights.append(netWeights)
+
+        coords = np.concatenate(coords, axis=1).astype(np.int64)
+        sparseArray = sparse.COO(coords, np.concatenate(weights).astype(self.array.dtype), shape=self.array.shape, fill_value=0)
+
+        self.array = self.array.copy(data=sparseArray)
+
+    def getStoredValues (self):
+
+        """
+        Function that returns the stored values of the array along with the index of the network each value belongs to.
+        For a dense array this is the whole 3D array (with network indices that broadcast against it), for a sparse array only the edges are stored.
+        """
+
+        if isSparse(self.array):
+            return self.array.data.data, self.array.data.coords[0]
+
+        else:
+            return self.array.data, np.arange(self.array.sizes['network']).reshape((-1,) + (1,) * (self.array.ndim - 1))
+
+    def setStoredValues (self, values):
+
+        """
+        Function that replaces the stored values of the array (in the same layout as returned by getStoredValues)
+        """
+
+        # Keeps the data type of the array (e.g. float32 for the compact layout)
+        values = values.astype(self.array.dtype, copy=False)
+
+        if isSparse(self.array):
+            import sparse
+            self.array = self.array.copy(data=sparse.COO(self.array.data.coords, values, shape=self.array.shape, fill_value=0))
+
+        else:
+            self.array = self.array.copy(data=values)
+
+    def updateStoredValues (self, function):
+
+        """
+        Function that replaces the stored values of the array (see getStoredValues) with the result of a function of the values and their network indices.
+        An array held in memory (dense or sparse) is updated in place one block at a time (see iterateStoredBlocks), so no copy of the whole array is made.
+        """
+
+        # A lazily loaded array is not changed in place, the function is applied lazily instead
+        if hasattr(self.array.data, 'compute'):
+            values, networkIndices = self.getStoredValues()
+            self.setStoredValues(function(values, networkIndices))
+            return
+
+        for values, networkIndices in iterateStoredBlocks(self.array):
+            values[...] = function(values, networkIndices)
+
+    def getResidueDims (self):
+
+        # Gets the axes of the array that hold residue pairs (either the square residue axes or the condensed pair axis)
+        if isCondensed(self.array):
+            return ['pair']
+
+        return ['firstResi','secondResi']
+
+    def getNonzeroValues (self):
+
+        # Gets all edge weights in the array that are above zero as a 1D array
+        values, networkIndices = self.getStoredValues()
+        values = values[values > 0]
+
+        # Reads the values if the array is lazily loaded
+        if hasattr(values, 'compute'):
+            values = values.compute()
+
+        # Each pair on the condensed pair axis stands for both (i, j) and (j, i) of the square array
+        if isCondensed(self.array):
+            values = np.repeat(values, 2)
+
+        return values
+
+    def getNetworkTotals (self):
 
         # Sums across both residue axes to get the sum value for each network
-        totalValues = self.array.sum(dim=['firstResi','secondResi'])
+        # A dense array held in memory is summed one block of networks at a time
+        if isInMemory(self.array):
+            totalValues = self.array.isel({dim: 0 for dim in self.getResidueDims()}, drop=True).copy(data=getBlockTotals(self.array))
+        else:
+            totalValues = toDense(self.array.sum(dim=self.getResidueDims()))
+
+        # Each pair on the condensed pair axis stands for both (i, j) and (j, i) of the square array
+        if isCondensed(self.array):
+            totalValues = totalValues * 2
+
+        return totalValues
+
+    def getNetworkMaxima (self):
+
+        # Creates a vector of maximum values across the first and second residue
+        # Essentially a maximum value for each network
+        return toDense(self.array.max(dim=self.getResidueDims()))
+
+    def normalizeLocal (self):
 
-        if self.args.norm_type == 'log':
+        """
+        Function that does the steps of the structure normalization that only depend on each network itself.
+        The steps that depend on statistics across all networks are done by getGlobalNorm and applyGlobalNorm.
+        The normalization method (args.norm_type) is found in the registry of structure normalizations (see Normalization.py).
+        """
+
+        normalization = getMethod(structNormalizations, self.args.norm_type)
+        normalization.normalizeLocal(self, NetworkStatistics(self).calculate(normalization.localStatistics))
+
+    def getStructGlobalNorm (self, statistics=None):
+
+        """
+        Function that calculates the statistics across all networks used by the global steps of the structure normalization.
+        Should be run on the array after normalizeLocal.
+
+        Inputs:
+        - statistics: NetworkStatistics of the array, which can be shared with the scaling steps (created if None)
+        """
+
+        if statistics is None:
+            statistics = NetworkStatistics(self)
+
+        normalization = getMethod(structNormalizations, self.args.norm_type)
+        return normalization.getGlobalNorm(self, statistics.calculate(normalization.globalStatistics))
+
+    def getGlobalNorm (self):
+
+        """
+        Function that calculates the statistics across all networks used by the global normalization and scaling steps.
+        Should be run on the array after normalizeLocal (if the structures are normalized).
+        The statistics of the array are shared by the normalization and scaling methods, so each is only calculated once.
+
+        Output:
+        - globalNorm: Dictionary of the statistics, only with the keys of the steps that are used
+            - clipValue: Value to clip the edge weights by (log normalization)
+            - clipNormNetworks, clipNormFactors: Networks with non-zero values and the factor to scale each by (clip normalization)
+            - maxValue, multinetScale: Maximum value of the normalized array and the value to scale it to (scale_multinet)
+        """
+
+        globalNorm = {}
+        statistics = NetworkStatistics(self, globalNorm)
+
+        if self.args.no_norm_struct == False:
+            globalNorm.update(self.getStructGlobalNorm(statistics))
+
+        if self.args.scale_multinet == True:
+
+            # Gets maximum value across all dimensions after the global normalization steps
+            scaling = getMethod(multinetScalings, 'max')
+            globalNorm.update(scaling.getGlobalNorm(self, statistics.calculate(scaling.globalStatistics)))
+
+        return globalNorm
+
+    def getNormalizedMax (self, globalNorm):
+
+        """
+        Function that gets the maximum value of the array after the global normalization steps (see applyGlobalNorm)
+        """
+
+        # A dense array held in memory is normalized one block of networks at a time, so the normalized array is never held as a whole
+        if isInMemory(self.array):
+            return self.getGlobalNormMax(globalNorm)
+
+        normArray = self.applyGlobalNorm(self.array, globalNorm)
+        return toDense(normArray.max()).item()
+
+    def applyGlobalNorm (self, array, globalNorm):
+
+        """
+        Function that applies the global normalization and scaling steps (see getGlobalNorm) to a locally normalized array and returns the result.
+        Only elementwise operations are used, so a lazily loaded array stays lazy.
+        """
+
+        if 'clipNormNetworks' in globalNorm:
+
+            scaleFactors = xr.DataArray(globalNorm['clipNormFactors'], coords=dict(network=globalNorm['clipNormNetworks']), dims='network')
+
+            # Only keeps the networks with non-zero values
+            array = array.sel(network=scaleFactors.get_index('network'))
+
+            # Then clips the array accordingly
+            array = (array * scaleFactors).astype(array.dtype)
+
+        if 'clipValue' in globalNorm:
+            array = array.clip(max=globalNorm['clipValue'])
+
+        if 'maxValue' in globalNorm:
+
+            # Then divides each network by max value
+            # Scales to a set value (default 0 to 20)
+            array = (array / globalNorm['maxValue']) * globalNorm['multinetScale']
+
+        return array
+
+    def getClipNormFactors (self, globalNorm):
+
+        """
+        Function that gets the clip normalization factor of each network of the array (see getGlobalNorm) as an array along the network axis,
+        along with a mask of the networks that are kept (the networks with non-zero values). Returns None for both if clip normalization is not used.
+        """
+
+        if 'clipNormNetworks' not in globalNorm:
+            return None, None
+
+        networkIndices = self.array.get_index('network').get_indexer(globalNorm['clipNormNetworks'])
+
+        scaleFactors = np.ones(self.array.sizes['network'])
+        scaleFactors[networkIndices] = globalNorm['clipNormFactors']
+
+        keepNetworks = np.zeros(self.array.sizes['network'], dtype=bool)
+        keepNetworks[networkIndices] = True
+
+        return scaleFactors, keepNetworks
+
+    def applyGlobalNormBlock (self, values, networkIndices, globalNorm, scaleFactors):
+
+        """
+        Function that applies the global normalization and scaling steps to a block of values of the array (see iterateStoredBlocks),
+        with the same operations as applyGlobalNorm. The clip normalization factors of each network are given by getClipNormFactors.
+        """
+
+        if scaleFactors is not None:
+            values = (values * scaleFactors[networkIndices]).astype(values.dtype)
+
+        if 'clipValue' in globalNorm:
+            values = np.clip(values, None, globalNorm['clipValue'])
+
+        if 'maxValue' in globalNorm:
+            values = (values / globalNorm['maxValue']) * globalNorm['multinetScale']
+
+        return values
 
-            # Does log normalization
-            totalValuesLogNorm = np.log(totalValues + 1) * 100
-            self.array = self.array * (totalValuesLogNorm[:] / totalValues[:])
+    def getGlobalNormMax (self, globalNorm):
 
-            # Clips edge weights by the xth (default 99th) percentile
-            stackedArray = self.array.stack(allDims=[...])
-            stackedArray = stackedArray.where(stackedArray > 0, drop=True)
-            maxValue = np.percentile(stackedArray, self.args.log_norm_threshold)
-            self.array = self.array.clip(max=maxValue)
+        """
+        Function that gets the maximum value of a dense array held in memory after the global normalization steps, one block of networks at a time.
+        Values that are NaN are skipped (as when taking the maximum of the XArray object).
+        """
+
+        scaleFactors, keepNetworks = self.getClipNormFactors(globalNorm)
+        maxValue = np.nan
+
+        for values, networkIndices in iterateStoredBlocks(self.array):
+            values = self.applyGlobalNormBlock(values, networkIndices, globalNorm, scaleFactors)
 
-        elif self.args.norm_type == 'total':
+            # Only looks at the networks that are kept by the clip normalization
+            if keepNetworks is not None:
+                values = values[keepNetworks[networkIndices.reshape(-1)]]
 
-            self.array = (self.array / totalValues[:]) * 1000
+            if values.size > 0:
+                maxValue = np.fmax(maxValue, np.fmax.reduce(values, axis=None))
 
-        elif self.args.norm_type == 'clip':
+        return float(maxValue)
 
-            # Only looks at non-zero values
-            totalValues = totalValues.where(totalValues > 0, drop=True)
+    def applyGlobalNormInPlace (self, globalNorm):
+
+        """
+        Function that applies the global normalization and scaling steps (see getGlobalNorm) to a dense array held in memory, and replaces NaN values with zeroes.
+        Gives the same array as applyGlobalNorm followed by fillna, but the values are changed in place one block of networks at a time.
+        """
 
-            # Gets xth (default 90th) percentile of values and sets that as the clip value
-            maxValue = np.percentile(totalValues, self.args.clip_norm_threshold)
+        scaleFactors, keepNetworks = self.getClipNormFactors(globalNorm)
 
-            # Then clips self.array accordingly
-            clipTotalValues = totalValues.clip(max=maxValue)
-            self.array = self.array * (clipTotalValues[:] / totalValues[:])
+        for values, networkIndices in iterateStoredBlocks(self.array):
+            values[...] = self.applyGlobalNormBlock(values, networkIndices, globalNorm, scaleFactors)
+            values[np.isnan(values)] = 0
 
-        elif self.args.norm_type == 'max':
+        # Only keeps the networks with non-zero values
+        if keepNetworks is not None and not keepNetworks.all():
+            self.array = self.array.sel(network=globalNorm['clipNormNetworks'])
 
-            # Creates a vector of maximum values across the first and second residue
-            # Essentially a maximum value for each network
-            maxValues = self.array.max(dim=['firstResi','secondResi'])
+    # TODO: Update unit test to make sure this function works
+    def normalizeStruct (self):
 
-            # Then divides each network by the corresponding value in the vector of max values
-            # Scales from 0 - 10
-            self.array = (self.array / maxValues[:]) * 10
+        # Does the normalization steps for each network, and then the steps across all networks
+        self.normalizeLocal()
+        self.array = self.applyGlobalNorm(self.array, self.getStructGlobalNorm())
 
     def scaleMultiNet (self):
 
         # Gets maximum value across all dimensions
-        maxValue = self.array.max(dim=['network','firstResi','secondResi']).item()
+        maxValue = toDense(self.array.max()).item()
 
         # Then divides each network by max value
         # Scales to a set value (default 0 to 20)
         self.array = (self.array / maxValue) * self.args.multinet_scale
-    
+
+    def createArray (self, structList):
+
+        """
+        Function that creates the blank MultiNetwork array
+
+        By default the array is 3D and of size (number of structures x length of seq x length of seq).
+        With the compact layout, the array is 2D and of size (number of structures x number of residue pairs),
+        where the pair axis only holds the upper triangle (i < j) of each network since the networks are symmetric.
+        """
+
+        if self.args.compact == True:
+
+            # Alignment positions of each pair on the condensed pair axis
+            firstPositions, secondPositions = np.triu_indices(self.size, k=1)
+
+            shape = (len(structList), len(firstPositions))
+            dtype = np.dtype(self.args.compact_dtype)
+            coords = dict(network=structList, firstResi=('pair', firstPositions), secondResi=('pair', secondPositions))
+            dims = ("network", "pair")
+
+        else:
+            shape = (len(structList), self.size, self.size)
+            dtype = np.dtype('float64')
+            coords = dict(network=structList, firstResi=range(self.size), secondResi=range(self.size))
+            dims = ("network", "firstResi", "secondResi")
+
+        # Only creates the sparse array structure (without any values) if a sparse array is used
+        if self.args.sparse == True:
+            import sparse
+            data = sparse.zeros(shape, dtype=dtype, format='coo')
+
+        else:
+            data = np.zeros(shape, dtype=dtype)
+
+        self.array = xr.DataArray(data, coords=coords, dims=dims)
+
     # TODO: Update unit test to make sure this function works
-    def addNetworks (self, networkList):
+    def populateArray (self, networkList, structList=None):
+
+        """
+        Function that creates the array, adds the networks to it, and does the normalization steps that only depend on each network
+
+        Networks are added one at a time, so networkList can be a generator that only calculates each network when it is added
+        (as long as structList is given, since the array is created before any networks are added).
+
+        Inputs:
+        - networkList: Iterable of networks (IndividualNetwork or CompactNetwork objects)
+        - structList: Names of all of the structures in networkList, in the same order (found from networkList if None)
+
+        Outputs:
+        - records: List of the networks with only their weight and distance records (used by getInfo), only kept if args.output_info
+        """
 
         # Creates list to represent all the structures
-        structList = []
-        for net in networkList:
-            structList.append(net.struct.getName())
+        if structList is None:
+            structList = []
+            for net in networkList:
+                structList.append(net.getName())
 
         print(structList)
 
-        # Creates new blank 3D array that is of size (number of structures x length of seq x length of seq)
-        self.array = xr.DataArray(
-            0.0, 
-            coords=dict(network=structList, firstResi=range(self.size), secondResi=range(self.size)), 
-            dims=("network", "firstResi", "secondResi")
-        )
+        # Creates new blank array to hold all networks
+        self.createArray(structList)
 
-        # Iterates over the network list and adds values from each adjacency matrix
-        for net in networkList:
-            logging.info(f'Adding network: {net.struct.getName()}')
-            self.add(
-                net.convertToAdjacency(), 
-                net.struct.getName(), 
-                net.struct.getSequenceList()
-            )
+        records = []
+        networkList = self.recordNetworks(networkList, records)
+
+        # Adds all networks at once into a sparse array if specified
+        if self.args.sparse == True:
+            self.addSparse(networkList)
+
+        # Otherwise iterates over the network list and adds values from each adjacency matrix
+        else:
+            for net in networkList:
+                logging.info(f'Adding network: {net.getName()}')
+                self.add(
+                    net.convertToAdjacency(), 
+                    net.getName(), 
+                    net.getSequenceList()
+                )
 
         # Normalization of edge weights relative to the whole structure being added
-        # All values are scaled from (0) to the max edge weight present (10)
         if self.args.no_norm_struct == False:
-            self.normalizeStruct()
+            self.normalizeLocal()
+
+        return records
+
+    def recordNetworks (self, networkList, records):
+
+        """
+        Generator that passes on each network of networkList, while keeping only its weight and distance records (without its adjacency) in records.
+        The records are only kept if they are needed by getInfo (args.output_info).
+        """
+
+        for net in networkList:
+
+            if getattr(self.args, 'output_info', False) == True:
+                records.append(CompactNetwork(net.getName(), None, None, net.weightsRecord, net.distancesRecord, None))
+
+            yield net
+
+    def addNetworks (self, networkList, structList=None):
+
+        records = self.populateArray(networkList, structList)
+
+        # Calculates the normalization and scaling steps that depend on all networks
+        self.globalNorm = self.getGlobalNorm()
+
+        # Keeps the locally normalized array if it is written to a Zarr store (so that networks can be appended to it later)
+        if self.args.output_format == 'zarr':
+            self.localArray = self.array
+
+        # Then applies the global steps and replaces NaN values with zeroes
+        # A dense array is changed in place (unless the locally normalized array is kept)
+        if self.localArray is None and isInMemory(self.array):
+            self.applyGlobalNormInPlace(self.globalNorm)
+        else:
+            self.array = self.applyGlobalNorm(self.array, self.globalNorm).fillna(0)
+
+        if self.args.no_norm_struct == False:
             logging.info(f'Normalized all individual structures')
 
-        # Scales the entire MultiNetwork to be between values 0 and 10
         if self.args.scale_multinet == True:
-            self.scaleMultiNet()
             logging.info(f'Scaled the MultiNetwork to values between 0 and 10')
 
-        # Replaces NaN values with zeroes
-        self.array = self.array.fillna(0)
-
         logging.info(f'Finished adding networks to MultiNetwork object')
         
         # Gets info about edges in MultiNetwork
         if self.args.output_info == True:
-            self.getInfo(networkList)
+            self.getInfo(records)
 
     def getInfo (self, networkList):
 
@@ -345,8 +827,7 @@ class MultiNetwork:
         import matplotlib.pyplot as plt
 
         # Gets array into 1D list-like form, and then removes instances where's there's no value (0)
-        stackedArray = self.array.stack(allDims=[...])
-        stackedArray = stackedArray.where(stackedArray > 0, drop=True)
+        stackedArray = xr.DataArray(self.getNonzeroValues(), dims='allDims')
 
         minValue = stackedArray.min().values
         maxValue = stackedArray.max().values
@@ -366,7 +847,7 @@ class MultiNetwork:
         import matplotlib.pyplot as plt
 
         # Sums across both residue axes to get the sum value for each network
-        summedArray = self.array.sum(dim=['firstResi','secondResi'])
+        summedArray = self.getNetworkTotals()
 
         minValue = summedArray.min().values
         maxValue = summedArray.max().values
@@ -394,4 +875,10 @@ class MultiNetwork:
         
         # Creates new pickle (.pkl) file and then dumps the entire class object into the pickle file
         with open(f'{self.args.output}MultiNetwork.pkl', 'wb') as pickleFile:
-            pickle.dump(self, pickleFile)
\ No newline at end of file
+            pickle.dump(self, pickleFile)
+
+    def exportStore (self):
+
+        # Creates a chunked Zarr store (.zarr) of the MultiNetwork object that can be opened lazily for further analysis
+        from multirin.generate.MultiNetworkStore import exportStore
+        exportStore(self, f'{self.args.output}MultiNetwork.zarr', chunkSize=self.args.chunk_size)
\ No newline at end of file
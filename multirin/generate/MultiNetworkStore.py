@@ -0,0 +1,232 @@
+import xarray as xr
+import numpy as np
+import pandas as pd
+import pickle
+import json
+import os
+from io import StringIO
+from argparse import Namespace
+from Bio.Seq import Seq
+from multirin.generate.MultiNetwork import MultiNetwork, isSparse
+
+def isStore (path):
+
+    # Tests whether a path is a Zarr store of a MultiNetwork (a .zarr directory) instead of a pickle file
+    return os.path.splitext(os.path.normpath(path))[1] == '.zarr'
+
+def getChunkedArray (array, networkChunks):
+
+    """
+    Function that wraps the data of an XArray object into a dask array that is chunked along the network axis.
+    A sparse array is only converted to a dense array one chunk at a time (e.g. while it is written).
+
+    Inputs:
+    - array: XArray object with a network axis as its first axis
+    - networkChunks: Number of networks in each chunk, or a tuple of the size of each chunk
+    """
+
+    import dask.array as da
+
+    chunks = (networkChunks,) + array.shape[1:]
+
+    if isinstance(array.data, da.Array):
+        data = array.data.rechunk(chunks)
+    elif isSparse(array):
+        data = da.from_array(array.data, chunks=chunks, asarray=False)
+        data = data.map_blocks(lambda block: block.todense(), dtype=array.dtype, meta=np.empty((0,) * array.ndim, dtype=array.dtype))
+    else:
+        data = da.from_array(array.data, chunks=chunks)
+
+    return array.copy(data=data)
+
+def getStoreAttributes (multinet):
+
+    """
+    Function that gets the parts of a MultiNetwork object other than the array, to be stored as attributes of the Zarr store
+    """
+
+    attributes = {}
+    attributes['seqaln'] = json.dumps({seqID: str(seq) for seqID, seq in multinet.seqaln.items()})
+
+    if multinet.metadata is not None:
+        attributes['metadata'] = multinet.metadata.to_json(orient='split')
+
+    if multinet.args is not None:
+        attributes['args'] = json.dumps(vars(multinet.args), default=str)
+
+    if hasattr(multinet, 'size'):
+        attributes['size'] = multinet.size
+
+    # The global normalization steps are only stored along with the locally normalized array
+    if getattr(multinet, 'localArray', None) is not None:
+        attributes['globalNorm'] = json.dumps(multinet.globalNorm)
+
+    return attributes
+
+def exportStore (multinet, path, chunkSize=16):
+
+    """
+    Function that writes a MultiNetwork object to a chunked Zarr store.
+    The array is chunked along the network axis, so it is written (and later read) one chunk of networks at a time.
+    The sequence alignment, metadata and args are stored as attributes alongside the array.
+
+    If the MultiNetwork has its locally normalized array (see MultiNetwork.addNetworks), that array is stored along with the statistics
+    of the global normalization steps, which are applied when the store is opened. This allows networks to be appended (see appendStore).
+
+    Inputs:
+    - multinet: MultiNetwork object
+    - path: Path of the Zarr store to create (overwritten if it exists)
+    - chunkSize: Number of networks in each chunk
+    """
+
+    if getattr(multinet, 'localArray', None) is not None:
+        array = multinet.localArray
+    else:
+        array = multinet.array
+
+    dataset = xr.Dataset({'edges': getChunkedArray(array, chunkSize)})
+    dataset.attrs.update(getStoreAttributes(multinet))
+
+    dataset.to_zarr(path, mode='w')
+
+def createStore (multinet, structList, path, chunkSize=16):
+
+    """
+    Function that creates an empty Zarr store sized for all structures, so that the networks can be written into it a chunk at a time (see writeStoreRegion).
+    Only the metadata of the store is written, the array is not created in memory.
+    The networks written should be locally normalized (see MultiNetwork.populateArray).
+
+    Inputs:
+    - multinet: MultiNetwork object with the array of the first chunk of networks (used for the residue axes and data type of the store)
+    - structList: Names of all of the structures, in the order they are written
+    - path: Path of the Zarr store to create (overwritten if it exists)
+    - chunkSize: Number of networks in each chunk
+    """
+
+    import dask.array as da
+
+    blockArray = multinet.array
+
+    # Uses the residue axes of the first chunk of networks, along with the network axis of all structures
+    coords = {name: coord for name, coord in blockArray.coords.items() if 'network' not in coord.dims}
+    coords['network'] = structList
+
+    data = da.zeros((len(structList),) + blockArray.shape[1:], chunks=(chunkSize,) + blockArray.shape[1:], dtype=blockArray.dtype)
+
+    dataset = xr.Dataset({'edges': xr.DataArray(data, coords=coords, dims=blockArray.dims)})
+    dataset.attrs.update(getStoreAttributes(multinet))
+
+    # The store holds the locally normalized networks, the global normalization steps are added once all networks are written (see updateStoreAttributes)
+    dataset.attrs['globalNorm'] = json.dumps({})
+
+    dataset.to_zarr(path, mode='w', compute=False)
+
+def writeStoreRegion (array, path, start):
+
+    """
+    Function that writes the networks of an array into an existing Zarr store (see createStore), starting at a position on the network axis.
+    The start should be at the beginning of a chunk of the store, so that chunks are not shared between writes.
+    """
+
+    storedArray = xr.open_zarr(path)['edges']
+    chunkSize = storedArray.encoding['chunks'][0]
+
+    # Only the values along the network axis are written
+    dataset = xr.Dataset({'edges': getChunkedArray(array, chunkSize)})
+    dataset = dataset.drop_vars([name for name in dataset.coords if 'network' not in dataset[name].dims])
+
+    dataset.to_zarr(path, region={'network': slice(start, start + array.sizes['network'])})
+
+def openStore (path):
+
+    """
+    Function that opens a MultiNetwork object from a Zarr store (see exportStore).
+    The array is opened lazily as a dask array, so values are only read from disk chunk by chunk when they are used.
+    """
+
+    dataset = xr.open_zarr(path)
+
+    seqaln = {seqID: Seq(seq) for seqID, seq in json.loads(dataset.attrs['seqaln']).items()}
+
+    if 'metadata' in dataset.attrs:
+        metadata = pd.read_json(StringIO(dataset.attrs['metadata']), orient='split', dtype=False)
+    else:
+        metadata = None
+
+    if 'args' in dataset.attrs:
+        args = Namespace(**json.loads(dataset.attrs['args']))
+    else:
+        args = Namespace(alignmentFile=None)
+
+    # The metadata is taken from the store instead of the original metadata file
+    args.metadata = None
+
+    multinet = MultiNetwork(args=args, array=dataset['edges'], seqaln=seqaln, metadata=metadata)
+
+    if 'size' in dataset.attrs:
+        multinet.size = dataset.attrs['size']
+
+    # Applies the global normalization steps (lazily) to the locally normalized array
+    if 'globalNorm' in dataset.attrs:
+        multinet.localArray = multinet.array
+        multinet.globalNorm = json.loads(dataset.attrs['globalNorm'])
+        multinet.array = multinet.applyGlobalNorm(multinet.localArray, multinet.globalNorm).fillna(0)
+
+    return multinet
+
+def appendStore (array, path):
+
+    """
+    Function that appends the networks of an array to the end of the network axis of an existing Zarr store.
+    The array must have the same residue axes as the store (and be locally normalized if the store holds a locally normalized array).
+    """
+
+    storedDataset = xr.open_zarr(path)
+    storedArray = storedDataset['edges']
+    chunkSize = storedArray.encoding['chunks'][0]
+
+    # The first chunk fills up the last (partial) chunk of the store, so that every chunk is only written once
+    firstChunk = min((-storedArray.sizes['network']) % chunkSize, array.sizes['network'])
+    remaining = array.sizes['network'] - firstChunk
+    networkChunks = ((firstChunk,) if firstChunk > 0 else ()) + (chunkSize,) * (remaining // chunkSize) + ((remaining % chunkSize,) if remaining % chunkSize > 0 else ())
+
+    # Only the network axis (and variables along it) are appended
+    dataset = xr.Dataset({'edges': getChunkedArray(array, networkChunks)})
+    dataset = dataset.drop_vars([name for name in dataset.coords if 'network' not in dataset[name].dims])
+
+    # Keeps the attributes of the store (which are otherwise replaced by those of the appended dataset)
+    dataset.attrs.update(storedDataset.attrs)
+
+    dataset.to_zarr(path, append_dim='network')
+
+def updateStoreAttributes (multinet, path):
+
+    """
+    Function that replaces the attributes of an existing Zarr store with those of a MultiNetwork object (see getStoreAttributes)
+    """
+
+    import zarr
+
+    group = zarr.open_group(path, mode='a')
+    group.attrs.update(getStoreAttributes(multinet))
+
+    # Updates the consolidated metadata that xarray reads when opening the store
+    zarr.consolidate_metadata(path)
+
+def readMultiNetwork (path):
+
+    """
+    Function that opens a MultiNetwork object from either a pickle file, a Zarr store, or a subset manifest (see Subset.exportManifest)
+    """
+
+    if isStore(path):
+        return openStore(path)
+
+    # Opens the subset of the parent MultiNetwork that the manifest stands for
+    from multirin.generate.Subset import isManifest, openManifest
+    if isManifest(path):
+        return openManifest(path)
+
+    # Opens pickle file
+    with open(path, 'rb') as pickleFile:
+        return pickle.load(pickleFile)
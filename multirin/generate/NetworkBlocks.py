@@ -0,0 +1,281 @@
+import numpy as np
+
+# Number of values in each block of networks that is read (and normalized) at a time, so that temporary arrays stay small compared to the whole array
+# Also the largest number of values collected to select a percentile from (see selectNonzeroRanks)
+blockElements = 2 ** 22
+
+# Number of bits of each value used as the bucket at each level of the histograms in getNonzeroPercentile and selectNonzeroRanks
+bucketBits = 16
+
+def isInMemory (array):
+
+    # Tests whether the values of an XArray object are held in memory as a dense NumPy array (instead of a sparse or lazily loaded array)
+    return isinstance(array.data, np.ndarray)
+
+def iterateStoredBlocks (array):
+
+    """
+    Generator that goes through the stored values of a MultiNetwork array one block at a time, along with the index of the network of each value.
+    Values of an array held in memory are yielded as views, so they can be changed in place. Values of a lazily loaded (dask) array are read one chunk at a time.
+
+    Inputs:
+    - array: XArray object with a network axis as its first axis
+
+    Outputs (yielded):
+    - values: Values of the block (whole networks of a dense array, or a part of the edges of a sparse array)
+    - networkIndices: Network index of each value (broadcasts against the values of a dense array)
+    """
+
+    data = array.data
+
+    # A sparse array only stores its edges, which are read in blocks of values
+    if hasattr(data, 'todense'):
+        for start in range(0, len(data.data), blockElements):
+            yield data.data[start:start + blockElements], data.coords[0][start:start + blockElements]
+        return
+
+    networkSize = int(np.prod(data.shape[1:]))
+
+    # Lazily loaded arrays are read along their chunks, otherwise blocks of networks are taken
+    if hasattr(data, 'compute'):
+        blockSizes = data.chunks[0]
+    else:
+        blockSize = max(1, blockElements // max(networkSize, 1))
+        blockSizes = [min(blockSize, data.shape[0] - start) for start in range(0, data.shape[0], blockSize)]
+
+    start = 0
+    for blockSize in blockSizes:
+        values = data[start:start + blockSize]
+
+        if hasattr(values, 'compute'):
+            values = values.compute()
+
+        yield values, np.arange(start, start + blockSize).reshape((-1,) + (1,) * (data.ndim - 1))
+        start += blockSize
+
+def getBlockTotals (array):
+
+    """
+    Function that sums each network of a dense array held in memory, one block of networks at a time.
+    Gives the same sums as summing the XArray object across its residue axes, without making a copy of the whole array.
+    """
+
+    residueAxes = tuple(range(1, array.ndim))
+    totals = [np.nansum(values, axis=residueAxes) for values, networkIndices in iterateStoredBlocks(array)]
+
+    if len(totals) == 0:
+        return np.zeros(0, dtype=array.dtype)
+
+    return np.concatenate(totals)
+
+def getNetworkSum (array):
+
+    """
+    Function that sums the networks of a dense or lazily loaded MultiNetwork array (across the network axis) one block of networks at a time, skipping NaN values.
+    A lazily loaded array (e.g. from a Zarr store) is read one chunk at a time, so only one chunk of networks and the sum are held in memory.
+    The networks are added in order, which gives the same sum as summing a dense array held in memory across the network axis.
+    """
+
+    sumValues = np.zeros(array.shape[1:], dtype=array.dtype)
+
+    for values, networkIndices in iterateStoredBlocks(array):
+        for networkValues in values:
+            np.add(sumValues, networkValues, out=sumValues, where=~np.isnan(networkValues))
+
+    return sumValues
+
+def getGroupIndicators (groupIndices, networkCount):
+
+    """
+    Function that creates the sparse indicator matrix of groups of networks, with a row for each group and a column for each network.
+    An entry is 1 if the network is in the group, a network can be in any number of groups.
+
+    Inputs:
+    - groupIndices: List of the network indices in each group
+    - networkCount: Number of networks (length of the network axis)
+    """
+
+    from scipy.sparse import csr_matrix
+
+    groupRows = np.concatenate([np.full(len(indices), group, dtype=np.intp) for group, indices in enumerate(groupIndices)] + [np.zeros(0, dtype=np.intp)])
+    networkColumns = np.concatenate([np.asarray(indices, dtype=np.intp) for indices in groupIndices] + [np.zeros(0, dtype=np.intp)])
+
+    return csr_matrix((np.ones(len(groupRows)), (groupRows, networkColumns)), shape=(len(groupIndices), networkCount))
+
+def getGroupSums (array, groupIndices):
+
+    """
+    Function that sums the networks of each group (across the network axis) for all groups in a single pass through the array, skipping NaN values.
+    Each block of networks (see iterateStoredBlocks) is multiplied by the columns of the group indicator matrix (see getGroupIndicators) of its networks,
+    so the networks of each group are never copied into a separate array.
+
+    Inputs:
+    - array: XArray object of a MultiNetwork (dense, sparse, or lazily loaded)
+    - groupIndices: List of the network indices in each group
+
+    Outputs:
+    - groupSums: Array with the sum of each group along the first axis, and the residue axes of the array
+    """
+
+    groupIndicators = getGroupIndicators(groupIndices, array.shape[0])
+    residueShape = array.shape[1:]
+    residueSize = int(np.prod(residueShape))
+
+    data = array.data
+
+    # A sparse array is multiplied as a sparse matrix of its edges (networks x residue pairs)
+    if hasattr(data, 'todense'):
+        from scipy.sparse import csr_matrix
+
+        values = np.where(np.isnan(data.data), 0, data.data)
+        residuePositions = np.ravel_multi_index(tuple(data.coords[1:]), residueShape) if len(data.data) > 0 else np.zeros(0, dtype=np.intp)
+        edgeMatrix = csr_matrix((values, (data.coords[0], residuePositions)), shape=(array.shape[0], residueSize))
+
+        groupSums = (groupIndicators @ edgeMatrix).toarray()
+
+    else:
+        groupSums = np.zeros((len(groupIndices), residueSize), dtype=np.result_type(array.dtype, np.float64))
+
+        for values, networkIndices in iterateStoredBlocks(array):
+            values = values.reshape(len(values), residueSize)
+
+            if np.isnan(values).any():
+                values = np.where(np.isnan(values), 0, values)
+
+            groupSums += groupIndicators[:, networkIndices.reshape(-1)] @ values
+
+    return groupSums.astype(array.dtype, copy=False).reshape((len(groupIndices),) + residueShape)
+
+def getBits (values):
+
+    # The bit patterns of positive floats (as unsigned integers) are in the same order as the floats themselves
+    return values.view(np.dtype(f'u{values.dtype.itemsize}'))
+
+def getBuckets (bits, level):
+
+    # Bucket of each value at a level of the search, from the next bucketBits bits after the leading bits of the levels before
+    totalBits = 8 * bits.dtype.itemsize
+    return ((bits >> (totalBits - (level + 1) * bucketBits)) & ((1 << bucketBits) - 1)).astype(np.intp)
+
+def getPrefixMask (bits, level, prefix):
+
+    # Mask of the values whose leading bits (of the levels before) are prefix
+    if level == 0:
+        return np.ones(len(bits), dtype=bool)
+
+    totalBits = 8 * bits.dtype.itemsize
+    return (bits >> (totalBits - level * bucketBits)) == prefix
+
+def selectNonzeroRanks (array, ranks, counts):
+
+    """
+    Function that finds the values at ranks (in sorted order) of the values above zero of a MultiNetwork array, without collecting all of the values.
+
+    Each rank is found by narrowing down the bucket (range of leading bits) that holds it, one pass through the blocks per level of bucketBits bits.
+    Once the bucket of a rank holds at most blockElements values, they are collected and the value is selected from them.
+    A bucket that still holds more values once every bit is used only holds copies of the same value (e.g. repeated identical weights), which is then known from its bits.
+    At most two buckets of blockElements values are held in memory at a time.
+
+    Inputs:
+    - array: XArray object (see iterateStoredBlocks)
+    - ranks: Ranks of the values to find (among the stored values above zero)
+    - counts: Number of values above zero in each bucket of the first level (see getNonzeroPercentile)
+
+    Outputs:
+    - values: Dictionary with the ranks as keys and the values at the ranks as values
+    """
+
+    dtype = array.dtype
+    totalLevels = 8 * dtype.itemsize // bucketBits
+
+    # The search of each rank is at a level (with the leading bits found so far as its prefix), along with its rank within the values with that prefix
+    searches = {}
+    for rank in set(ranks):
+        cumulativeCounts = np.cumsum(counts)
+        bucket = int(np.searchsorted(cumulativeCounts, rank, side='right'))
+        offset = int(cumulativeCounts[bucket - 1]) if bucket > 0 else 0
+        searches[rank] = {'level': 1, 'prefix': bucket, 'rank': rank - offset, 'count': int(counts[bucket])}
+
+    values = {}
+    while len(values) < len(searches):
+
+        # Once every bit is used, the bucket only holds copies of the same value, which is given by the bits of the bucket
+        for rank, search in searches.items():
+            if (rank not in values) and (search['level'] == totalLevels) and (search['count'] > blockElements):
+                values[rank] = np.array([search['prefix']], dtype=f'u{dtype.itemsize}').view(dtype)[0]
+
+        # Searches that are narrowed down further (by counting their next level of buckets) or that collect their values, during the next pass through the blocks
+        pending = {rank: search for rank, search in searches.items() if rank not in values}
+        for search in pending.values():
+            search['collect'] = search['count'] <= blockElements
+            search['found'] = [] if search['collect'] else np.zeros(2 ** bucketBits, dtype=np.int64)
+
+        for blockValues, networkIndices in iterateStoredBlocks(array):
+            blockValues = blockValues[blockValues > 0]
+            bits = getBits(blockValues)
+
+            for search in pending.values():
+                mask = getPrefixMask(bits, search['level'], search['prefix'])
+
+                if search['collect']:
+                    search['found'].append(blockValues[mask])
+                else:
+                    search['found'] += np.bincount(getBuckets(bits[mask], search['level']), minlength=2 ** bucketBits)
+
+        for rank, search in pending.items():
+
+            if search['collect']:
+                found = np.concatenate(search['found'])
+                found.partition(search['rank'])
+                values[rank] = found[search['rank']]
+
+            else:
+                cumulativeCounts = np.cumsum(search['found'])
+                bucket = int(np.searchsorted(cumulativeCounts, search['rank'], side='right'))
+                search['rank'] -= int(cumulativeCounts[bucket - 1]) if bucket > 0 else 0
+                search['count'] = int(search['found'][bucket])
+                search['prefix'] = (search['prefix'] << bucketBits) | bucket
+                search['level'] += 1
+
+    return values
+
+def getNonzeroPercentile (array, percentile, repeats=1):
+
+    """
+    Function that calculates a percentile of the values above zero of a MultiNetwork array, without collecting all of the values.
+    Uses the linear method of np.percentile, and gives the same result as np.percentile of the values above zero up to rounding in the interpolation
+    (within a relative tolerance of 1e-12 of the difference between the two values around the percentile).
+
+    The first pass through the blocks counts the values above zero in buckets (by their leading bits), which finds the buckets that hold the
+    two values around the percentile. These are then selected from the values of their buckets (see selectNonzeroRanks).
+
+    Inputs:
+    - array: XArray object (see iterateStoredBlocks)
+    - percentile: Percentile to calculate (0 - 100)
+    - repeats: Number of times each stored value is counted (2 for the condensed pair axis, which stands for both sides of the square array)
+    """
+
+    dtype = array.dtype
+    counts = np.zeros(2 ** bucketBits, dtype=np.int64)
+
+    for values, networkIndices in iterateStoredBlocks(array):
+        values = values[values > 0]
+        counts += np.bincount(getBuckets(getBits(values), 0), minlength=len(counts))
+
+    valueCount = int(counts.sum()) * repeats
+
+    # Same error as np.percentile if there are no values above zero
+    if valueCount == 0:
+        return np.percentile(np.zeros(0, dtype=dtype), percentile)
+
+    # Position of the percentile in the sorted values (the virtual index of the linear method of np.percentile)
+    virtualIndex = min(max((valueCount - 1) * (percentile / 100), 0), valueCount - 1)
+    lowerRank = int(np.floor(virtualIndex))
+    upperRank = min(lowerRank + 1, valueCount - 1)
+
+    # Ranks among the stored values (each of which is counted repeats times)
+    values = selectNonzeroRanks(array, [lowerRank // repeats, upperRank // repeats], counts)
+    lower, upper = values[lowerRank // repeats], values[upperRank // repeats]
+
+    # Interpolates between the two values around the percentile with np.percentile
+    return np.percentile(np.array([lower, upper], dtype=dtype), (virtualIndex - lowerRank) * 100)
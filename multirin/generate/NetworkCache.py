@@ -0,0 +1,124 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+class NetworkCache:
+
+    """
+    On-disk cache of CompactNetwork objects so that structures do not need to be parsed and searched again between runs.
+
+    Each network is stored as a pickle file named by a key made from the hash of the structure file contents and the options that change the network.
+    The cache is limited to a maximum size, with the least recently used networks removed first.
+    """
+
+    # Increment if the network calculation changes so that older cached networks are not used
+    version = 1
+
+    def __init__ (self, cacheDir, maxSize):
+
+        """
+        Inputs:
+        - cacheDir: Directory to store the cached networks in (created if it does not exist)
+        - maxSize: Maximum total size of the cache (MB)
+        """
+
+        self.cacheDir = cacheDir
+        self.maxSize = maxSize * 1024 * 1024
+
+        os.makedirs(self.cacheDir, exist_ok=True)
+
+    def getKey (self, pathname, args):
+
+        """
+        Function that creates the cache key of a structure from the contents of the structure file and the options that change its network
+        """
+
+        fileHash = hashlib.sha256()
+
+        # Reads the structure file in blocks to hash the contents
+        with open(pathname, 'rb') as structFile:
+            for block in iter(lambda: structFile.read(1024 * 1024), b''):
+                fileHash.update(block)
+
+        # Adds the name of the structure (since it is stored in the network) and the options that affect the network
+        options = f'{self.version}|{os.path.basename(pathname)}|{args.only_sidechain}|{args.no_norm_resi}|{args.add_adjacent_residues}'
+        fileHash.update(options.encode())
+
+        return fileHash.hexdigest()
+
+    def getPath (self, key):
+        return os.path.join(self.cacheDir, f'{key}.pkl')
+
+    def load (self, key, args):
+
+        """
+        Function that returns the cached CompactNetwork for a key, or None if it is not in the cache
+        """
+
+        path = self.getPath(key)
+
+        # Networks that cannot be read (e.g. partially written, or pickled with an older layout of the classes or modules, which raises AttributeError or ModuleNotFoundError) are treated as not cached
+        try:
+            with open(path, 'rb') as pickleFile:
+                net = pickle.load(pickleFile)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+        # Updates the modification time of the file so that it is marked as recently used
+        os.utime(path)
+
+        # Sets the args of the current run (used for output paths)
+        net.args = args
+
+        return net
+
+    def save (self, key, net):
+
+        """
+        Function that stores a CompactNetwork in the cache
+        """
+
+        # The args are not stored since they belong to the run that created the network
+        args = net.args
+        net.args = None
+
+        # Writes to a temporary file first and then renames it, so that other processes never read a partially written file
+        # The temporary file is removed if the network cannot be written, so it is never left in the cache directory
+        tempPath = None
+        try:
+            with tempfile.NamedTemporaryFile(dir=self.cacheDir, suffix='.tmp', delete=False) as tempFile:
+                tempPath = tempFile.name
+                pickle.dump(net, tempFile)
+            os.replace(tempPath, self.getPath(key))
+        except BaseException:
+            if (tempPath is not None) and os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+        finally:
+            net.args = args
+
+    def evict (self):
+
+        """
+        Function that removes the least recently used networks until the cache is under the maximum size
+        """
+
+        cachedFiles = []
+        for filename in os.listdir(self.cacheDir):
+            if filename.endswith('.pkl'):
+                path = os.path.join(self.cacheDir, filename)
+                fileStat = os.stat(path)
+                cachedFiles.append((fileStat.st_mtime, fileStat.st_size, path))
+
+        totalSize = sum(size for mtime, size, path in cachedFiles)
+
+        # Removes the oldest files first
+        for mtime, size, path in sorted(cachedFiles):
+            if totalSize <= self.maxSize:
+                break
+
+            os.remove(path)
+            totalSize -= size
+            logging.info(f'Removed network from cache: {path}')
@@ -0,0 +1,303 @@
+import numpy as np
+from multirin.generate.NetworkBlocks import getNonzeroPercentile
+
+# Registries of the normalization and scaling methods, with the name used in args as the key and the class of the method as the value
+structNormalizations = {}
+multinetScalings = {}
+sumNetworkScalings = {}
+
+def register (registry):
+
+    """
+    Decorator that adds a normalization or scaling class to a registry under its name, so that a new method only needs to be defined (and registered) here
+    """
+
+    def addMethod (methodClass):
+        registry[methodClass.name] = methodClass
+        return methodClass
+
+    return addMethod
+
+def getMethod (registry, name):
+
+    """
+    Function that creates the normalization or scaling method registered under a name (e.g. args.norm_type)
+    """
+
+    if name not in registry:
+        raise NameError(f"Normalization or scaling type not found: {name} (can be either {', '.join(registry)})")
+
+    return registry[name]()
+
+class Statistics:
+
+    """
+    Statistics used by the normalization and scaling methods. Each method declares the statistics it needs by name,
+    and each statistic is only calculated once (when first needed) and shared by all methods that use the same Statistics object.
+    The statistics are calculated by the methods of subclasses with the same names.
+    """
+
+    def __init__ (self):
+        self.values = {}
+
+    def get (self, name):
+
+        if name not in self.values:
+
+            if not hasattr(self, name):
+                raise NameError(f"Statistic not found: {name}")
+
+            self.values[name] = getattr(self, name)()
+
+        return self.values[name]
+
+    def calculate (self, names):
+
+        # Calculates all of the statistics (that are not calculated yet) declared by a method
+        for name in names:
+            self.get(name)
+
+        return self
+
+class NetworkStatistics (Statistics):
+
+    """
+    Statistics of the array of a MultiNetwork object. The statistics are of the array at the time they are calculated,
+    so a new NetworkStatistics object is used after the array is changed (e.g. after the local normalization steps).
+    """
+
+    def __init__ (self, multinet, globalNorm=None):
+
+        """
+        Inputs:
+        - multinet: MultiNetwork object
+        - globalNorm: Global normalization steps found so far (see MultiNetwork.getGlobalNorm), used by statistics of the globally normalized array
+        """
+
+        super().__init__()
+        self.multinet = multinet
+        self.globalNorm = globalNorm if globalNorm is not None else {}
+
+    def networkTotals (self):
+
+        # Sum of the edge weights of each network (as an XArray object along the network axis)
+        return self.multinet.getNetworkTotals()
+
+    def networkMaxima (self):
+
+        # Maximum edge weight of each network (as an XArray object along the network axis)
+        return self.multinet.getNetworkMaxima()
+
+    def edgePercentile (self):
+
+        # xth (default 99th) percentile (args.log_norm_threshold) of the edge weights above zero
+        # Each pair on the condensed pair axis stands for both (i, j) and (j, i) of the square array
+        repeats = 2 if self.multinet.getResidueDims() == ['pair'] else 1
+        return float(getNonzeroPercentile(self.multinet.array, self.multinet.args.log_norm_threshold, repeats=repeats))
+
+    def normalizedMax (self):
+
+        # Maximum edge weight of the array after the global normalization steps found so far
+        return self.multinet.getNormalizedMax(self.globalNorm)
+
+class SumNetworkStatistics (Statistics):
+
+    """
+    Statistics of a sum network and the number of networks that were summed
+    """
+
+    def __init__ (self, sumArray, networkCount):
+        super().__init__()
+        self.sumArray = sumArray
+        self.count = networkCount
+
+    def sumMax (self):
+
+        # Maximum value of the sum network
+        return self.sumArray.max(dim=['firstResi','secondResi']).item()
+
+    def networkCount (self):
+
+        # Total number of structures/networks that were summed
+        return self.count
+
+class StructNormalization:
+
+    """
+    Base class of the methods of normalizing each structure's network in relation to the others (args.norm_type).
+    The normalization is split into local steps that only depend on each network itself (normalizeLocal),
+    and global steps that depend on statistics across all networks (getGlobalNorm), which are applied by MultiNetwork.applyGlobalNorm.
+
+    Class attributes:
+    - name: Name of the method in args.norm_type
+    - localStatistics: Statistics (see NetworkStatistics) of the array before the local steps that are used by normalizeLocal
+    - globalStatistics: Statistics of the array after the local steps that are used by getGlobalNorm
+    """
+
+    name = None
+    localStatistics = ()
+    globalStatistics = ()
+
+    def normalizeLocal (self, multinet, statistics):
+
+        # By default there are no local steps
+        pass
+
+    def getGlobalNorm (self, multinet, statistics):
+
+        # By default there are no global steps
+        return {}
+
+@register(structNormalizations)
+class LogNormalization (StructNormalization):
+
+    """
+    Scales each network so that its sum is the log of its sum (x100), and then clips edge weights by the xth (default 99th) percentile across all networks
+    """
+
+    name = 'log'
+    localStatistics = ('networkTotals',)
+    globalStatistics = ('edgePercentile',)
+
+    def normalizeLocal (self, multinet, statistics):
+
+        totalValues = statistics.get('networkTotals')
+
+        # Does log normalization
+        totalValuesLogNorm = np.log(totalValues + 1) * 100
+        scaleFactors = (totalValuesLogNorm / totalValues).values
+
+        multinet.updateStoredValues(lambda values, networkIndices: values * scaleFactors[networkIndices])
+
+    def getGlobalNorm (self, multinet, statistics):
+
+        # Clips edge weights by the xth (default 99th) percentile
+        return {'clipValue': statistics.get('edgePercentile')}
+
+@register(structNormalizations)
+class TotalNormalization (StructNormalization):
+
+    """
+    Divides each network by its sum (scaled to a sum of 1000)
+    """
+
+    name = 'total'
+    localStatistics = ('networkTotals',)
+
+    def normalizeLocal (self, multinet, statistics):
+
+        totalValues = statistics.get('networkTotals').values
+        multinet.updateStoredValues(lambda values, networkIndices: (values / totalValues[networkIndices]) * 1000)
+
+@register(structNormalizations)
+class MaxNormalization (StructNormalization):
+
+    """
+    Divides each network by its maximum value (scaled from 0 - 10)
+    """
+
+    name = 'max'
+    localStatistics = ('networkMaxima',)
+
+    def normalizeLocal (self, multinet, statistics):
+
+        # Then divides each network by the corresponding value in the vector of max values
+        maxValues = statistics.get('networkMaxima').values
+        multinet.updateStoredValues(lambda values, networkIndices: (values / maxValues[networkIndices]) * 10)
+
+@register(structNormalizations)
+class ClipNormalization (StructNormalization):
+
+    """
+    Scales down the networks with a sum above the xth (default 90th) percentile of the sums across all networks, so that their sum is the percentile
+    """
+
+    name = 'clip'
+    globalStatistics = ('networkTotals',)
+
+    def getGlobalNorm (self, multinet, statistics):
+
+        # Sums across both residue axes to get the sum value for each network
+        totalValues = statistics.get('networkTotals')
+
+        # Only looks at non-zero values
+        totalValues = totalValues.where(totalValues > 0, drop=True)
+
+        # Gets xth (default 90th) percentile of values and sets that as the clip value
+        maxValue = np.percentile(totalValues, multinet.args.clip_norm_threshold)
+
+        # Then gets the factor that clips the sum value of each network accordingly
+        clipTotalValues = totalValues.clip(max=maxValue)
+        scaleFactors = clipTotalValues / totalValues
+
+        return {'clipNormNetworks': scaleFactors.get_index('network').to_list(), 'clipNormFactors': scaleFactors.values.tolist()}
+
+@register(multinetScalings)
+class MultiNetScaleMax:
+
+    """
+    Scales the MultiNetwork (after the structure normalization) so that its maximum value is args.multinet_scale (args.scale_multinet)
+    """
+
+    name = 'max'
+    globalStatistics = ('normalizedMax',)
+
+    def getGlobalNorm (self, multinet, statistics):
+        return {'maxValue': statistics.get('normalizedMax'), 'multinetScale': multinet.args.multinet_scale}
+
+class SumNetworkScaling:
+
+    """
+    Base class of the methods of scaling the sum network (args.scale_sum_network)
+
+    Class attributes:
+    - name: Name of the method in args.scale_sum_network
+    - statistics: Statistics (see SumNetworkStatistics) that are used by scale
+    - message: Message that is logged after scaling
+    """
+
+    name = None
+    statistics = ()
+    message = None
+
+    def scale (self, sumArray, statistics, scalingFactor):
+        return sumArray
+
+@register(sumNetworkScalings)
+class SumNetworkScaleMax (SumNetworkScaling):
+
+    """
+    Scales the Sum Network by the maximum value so max value is the scaling factor
+    """
+
+    name = 'max'
+    statistics = ('sumMax',)
+    message = 'Scaled the Sum Network to values between 0 and 20'
+
+    def scale (self, sumArray, statistics, scalingFactor):
+
+        # Then divides each network by max value
+        # Scales to a set value (default 0 to 20)
+        return (sumArray / statistics.get('sumMax')) * scalingFactor
+
+@register(sumNetworkScalings)
+class SumNetworkScaleStruct (SumNetworkScaling):
+
+    """
+    Scales the Sum Network by the number of total structures that were summed
+    """
+
+    name = 'struct'
+    statistics = ('networkCount',)
+    message = 'Scaled the Sum Network by total number of structures'
+
+    def scale (self, sumArray, statistics, scalingFactor):
+
+        # Then divides each network by total number of structures, also scales by scaling factor
+        return (sumArray / statistics.get('networkCount')) * scalingFactor
+
+@register(sumNetworkScalings)
+class SumNetworkScaleNone (SumNetworkScaling):
+
+    # Keeps the Sum Network as it is
+    name = 'none'
@@ -0,0 +1,56 @@
+import numpy as np
+from multirin.generate.BackboneTopology import getBackboneAtomNames
+
+class ResidueRecord:
+
+    """
+    Compact record of the alt conf atoms of one residue, classified once per structure for the residue pair search in IndividualNetwork.populateNetwork.
+    Holds the atoms as arrays (in the same order as the gemmi atoms), with masks for the backbone and excluded atoms,
+    so that each pair of residues only indexes into the records of the two residues.
+    """
+
+    def __init__ (self, atoms, resiName, excludeAtoms=('CB','HB','HB2','HB3')):
+
+        """
+        Inputs:
+        - atoms: List of gemmi alt conf atoms of the residue
+        - resiName: Residue name (e.g. PRO, GLY, ALA), which determines the atoms that are in the backbone graph
+        - excludeAtoms: Atom names that are not counted in backbone-sidechain connections of adjacent residues
+        """
+
+        self.coords = np.array([atom.pos.tolist() for atom in atoms], dtype=np.float64).reshape(-1, 3)
+        self.names = np.array([atom.name for atom in atoms], dtype=str)
+        self.altlocs = np.array([atom.altloc for atom in atoms], dtype=str)
+
+        # Masks of atoms that are in the backbone graph, and atoms that are excluded from backbone-sidechain connections
+        self.backboneMask = np.isin(self.names, list(getBackboneAtomNames(resiName)))
+        self.excludedMask = np.isin(self.names, list(excludeAtoms))
+
+        # Atom arrays (coords, names, altlocs) of all, backbone, and sidechain atoms, as used by IndividualNetwork.findConnections
+        self.atomArrays = (self.coords, self.names, self.altlocs)
+        self.backboneArrays = self.getAtomArrays(self.backboneMask)
+        self.sidechainArrays = self.getAtomArrays(~self.backboneMask)
+        self.backboneExcluded = self.excludedMask[self.backboneMask]
+        self.sidechainExcluded = self.excludedMask[~self.backboneMask]
+
+        # Whether the residue has a carbonyl C or amide N alt conf (needed for backbone connections across the peptide bond)
+        backboneNames = set(self.backboneArrays[1].tolist())
+        self.hasCarbonylC = 'C' in backboneNames
+        self.hasAmideN = 'N' in backboneNames
+
+        # Backbone atom names grouped by alt-loc, labelled as the first (_1) and second (_2) residue of a pair for the backbone search
+        self.backboneNamesByAltLoc = {1: {}, 2: {}}
+        for name, altloc in zip(self.backboneArrays[1].tolist(), self.backboneArrays[2].tolist()):
+            for position in (1, 2):
+                self.backboneNamesByAltLoc[position].setdefault(altloc, set()).add(f'{name}_{position}')
+
+        self.backboneNamesByAltLoc = {position: {altloc: frozenset(names) for altloc, names in namesByAltLoc.items()}
+                                      for position, namesByAltLoc in self.backboneNamesByAltLoc.items()}
+
+    def getAtomArrays (self, mask):
+
+        # Selects the atoms in the mask from each of the atom arrays
+        return self.coords[mask], self.names[mask], self.altlocs[mask]
+
+    def hasSidechain (self):
+        return len(self.sidechainArrays[0]) > 0
@@ -0,0 +1,90 @@
+import numpy as np
+
+class ResidueSpheres:
+
+    """
+    Bounding spheres (centroid and radius) of the atoms of each residue, used to discard pairs of residues before any atom-level distances are calculated.
+    If the gap between two spheres is larger than a distance cutoff, then every atom-atom distance between the two residues is also larger than the cutoff,
+    so these pairs cannot have any connections (or contacts) and skipping them does not change the network.
+    """
+
+    # Margin (A) added to the cutoff so that rounding in the sphere gaps never discards a pair that has an atom-atom distance within the cutoff
+    tolerance = 1e-6
+
+    def __init__ (self, coordsDict):
+
+        """
+        Inputs:
+        - coordsDict: Dictionary with residue numbers as keys and (N,3) arrays of atom coordinates as values
+        """
+
+        self.resis = list(coordsDict.keys())
+        self.resiIndex = {resi: index for index, resi in enumerate(self.resis)}
+
+        self.centroids = np.zeros((len(self.resis), 3), dtype=np.float64)
+        self.radii = np.zeros(len(self.resis), dtype=np.float64)
+
+        # Residues without any atoms cannot have any connections, so they are never close to another residue
+        self.empty = np.zeros(len(self.resis), dtype=bool)
+
+        for index, resi in enumerate(self.resis):
+            coords = np.asarray(coordsDict[resi], dtype=np.float64).reshape(-1, 3)
+
+            if len(coords) == 0:
+                self.empty[index] = True
+                continue
+
+            self.centroids[index] = coords.mean(axis=0)
+            self.radii[index] = np.sqrt(((coords - self.centroids[index]) ** 2).sum(axis=1)).max()
+
+    def getGaps (self, other=None):
+
+        """
+        Function that calculates the gap between the spheres of every pair of residues (the distance between centroids minus both radii)
+
+        Inputs:
+        - other: ResidueSpheres of the second residues of each pair (same as this one if None)
+
+        Outputs:
+        - gaps: (len(self.resis), len(other.resis)) array, which is infinite for pairs including a residue without atoms
+        """
+
+        if other is None:
+            other = self
+
+        centroidDistances = np.sqrt(((self.centroids[:, np.newaxis, :] - other.centroids[np.newaxis, :, :]) ** 2).sum(axis=2))
+        gaps = centroidDistances - self.radii[:, np.newaxis] - other.radii[np.newaxis, :]
+
+        gaps[self.empty, :] = np.inf
+        gaps[:, other.empty] = np.inf
+
+        return gaps
+
+    def findClosePairs (self, maxDist, other=None):
+
+        """
+        Function that finds the pairs of residues whose spheres are within maxDist of each other.
+        All other pairs of residues have no atom-atom distances within maxDist.
+
+        Inputs:
+        - maxDist: Distance cutoff (A)
+        - other: ResidueSpheres of the second residues of each pair (same as this one if None)
+
+        Outputs:
+        - closePairs: Set of (firstResi, secondResi) tuples (in both orders if other is None)
+        """
+
+        if other is None:
+            other = self
+
+        firstIndices, secondIndices = np.nonzero(self.getGaps(other) <= maxDist + self.tolerance)
+
+        return {(self.resis[first], other.resis[second]) for first, second in zip(firstIndices.tolist(), secondIndices.tolist())}
+
+def getAtomsCoordinates (atomsDict):
+
+    """
+    Function that converts a dictionary of residues -> gemmi atoms into a dictionary of residues -> (N,3) coordinate arrays (e.g. for ResidueSpheres)
+    """
+
+    return {resi: np.array([atom.pos.tolist() for atom in atomsDict[resi]], dtype=np.float64).reshape(-1, 3) for resi in atomsDict}
@@ -2,6 +2,13 @@ import gemmi
 import os
 import logging
 
+def getNameFromPath (pathname):
+
+    # Gets the name of a structure from its pathname (the filename without its extension)
+    filename = os.path.basename(pathname)
+    filename = filename[:filename.rindex('.')]
+    return filename
+
 class Structure:
     def __init__ (self, pathname, args):
         
@@ -25,9 +32,7 @@ class Structure:
 
     def setName (self, pathname):
         # Sets the name of the structure to be the filename
-        filename = os.path.basename(pathname)
-        filename = filename[:filename.rindex('.')]
-        self.name = filename
+        self.name = getNameFromPath(pathname)
 
     def setSequence (self):
         self.sequence = {}
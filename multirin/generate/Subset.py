@@ -2,28 +2,30 @@ import xarray as xr
 import numpy as np
 import pandas as pd
 import pickle
+import json
+import os
 from multirin.generate.MultiNetwork import MultiNetwork
+from multirin.generate.MultiNetworkStore import readMultiNetwork, exportStore as exportMultiNetworkStore
 
 def readPickle (inputFile):
     
     """
-    Function that opens MultiNetwork pickle file and returns it as object
+    Function that opens MultiNetwork pickle file (or Zarr store) and returns it as object
     """
         
-    # Opens pickle file
-    with open(inputFile, 'rb') as pickleFile:
-        multinet = pickle.load(pickleFile)
+    # Opens pickle file or Zarr store (which is opened lazily)
+    multinet = readMultiNetwork(inputFile)
 
     if multinet.metadata is None:
         raise FileNotFoundError('Must have metadata associated with MultiNetwork!')
 
     return multinet
 
-def generateSubsets (multinet, classifier, groupName=None, makeDiscreteValue=None):
+def getSubsetStructs (multinet, classifier, groupName=None, makeDiscreteValue=None):
 
     """
-    Function that takes in a MultiNetwork object and splits them into subsets based on the classifier (column from metadata)
-    
+    Function that finds the structures of the MultiNetwork in each group of the classifier (column from metadata)
+
     Inputs: 
     multinet – MultiNetwork object
     classifier – Label of column in the MultiNetwork metadata .csv that you want to group by
@@ -31,11 +33,10 @@ def generateSubsets (multinet, classifier, groupName=None, makeDiscreteValue=Non
     makeDiscreteValue – List of parameters specifying how you want to split up a continuous variable into discrete bins (optional argument)
 
     Output:
-    subsetArrays – Dictionary of subset arrays with keys as groups
+    subsetStructs – Dictionary of lists of structures (in the order of the network axis of the MultiNetwork) with keys as groups
     """
 
-    # Initializes dictionary of arrays that hold each subset array
-    subsetMultiNetworks = {}
+    subsetStructs = {}
 
     # Condition when there is a specified group within the classifier column that is of interest
     if groupName != None:
@@ -71,39 +72,166 @@ def generateSubsets (multinet, classifier, groupName=None, makeDiscreteValue=Non
         groups = dict(list(dfGrouped))
 
     # Gets list of structures in the MultiNetwork
-    structsInMultiNet = set(multinet.array.get_index('network').to_list())
+    structsInMultiNet = multinet.array.get_index('network').to_list()
 
     # Iterates over each group
     for group in groups:
 
         # Gets list of structures in the group, flattens it using list comprehension
         structsInGroup = groups[group]['ID'].to_list()
-        structsInGroup = [item for subList in structsInGroup for item in subList]
+        structsInGroup = set(item for subList in structsInGroup for item in subList)
 
         # Then finds intersection of this with MultiNetwork structures
-        interStructs = list(set(structsInMultiNet).intersection(set(structsInGroup)))
+        interStructs = [struct for struct in structsInMultiNet if struct in structsInGroup]
 
         # Checks if intersection is empty or not
         if interStructs != []:
-            
-            # Selects subset of structures in group from the MultiNetwork object to create a smaller MultiNetwork array
-            subsetArray = multinet.array.loc[interStructs, :, :]
+            subsetStructs[group] = interStructs
 
-            # Selects subset of metadata
-            subsetMetadata = multinet.metadata.loc[multinet.metadata['ID'].isin(interStructs)]
+        else:
+            print(f"No structures in MultiNetwork for group: {group}")
 
-            # Selects subset of sequence alignment
-            subsetSeqAln = {k: multinet.seqaln[k] for k in interStructs}
+    return subsetStructs
 
-            # Combines the subset array, metadata, and sequence alignment into a new MultiNetwork object
-            # Puts this in a dictionary of MultiNetworks
-            subsetMultiNetworks[group] = MultiNetwork(array=subsetArray, seqaln=subsetSeqAln, metadata=subsetMetadata)
+def getSubsetIndices (multinet, classifier, groupName=None, makeDiscreteValue=None):
 
-        else:
-            print(f"No structures in MultiNetwork for group: {group}")
+    """
+    Function that finds the indices on the network axis of the MultiNetwork array of the structures in each group of the classifier (see getSubsetStructs)
+    """
+
+    networkIndex = multinet.array.get_index('network')
+    return {group: networkIndex.get_indexer(structs) for group, structs in getSubsetStructs(multinet, classifier, groupName, makeDiscreteValue).items()}
+
+def generateSubsets (multinet, classifier, groupName=None, makeDiscreteValue=None):
+
+    """
+    Function that takes in a MultiNetwork object and splits them into subsets based on the classifier (column from metadata)
+    
+    Inputs: 
+    multinet – MultiNetwork object
+    classifier – Label of column in the MultiNetwork metadata .csv that you want to group by
+    groupName – Specific group within the column that is of interest (optional argument)
+    makeDiscreteValue – List of parameters specifying how you want to split up a continuous variable into discrete bins (optional argument)
+
+    Output:
+    subsetArrays – Dictionary of subset arrays with keys as groups
+    """
+
+    # Initializes dictionary of arrays that hold each subset array
+    subsetMultiNetworks = {}
+
+    for group, networkIndices in getSubsetIndices(multinet, classifier, groupName, makeDiscreteValue).items():
+
+        # Selects the subset of structures in group from the MultiNetwork object (along with its metadata and sequence alignment)
+        # Puts this in a dictionary of MultiNetworks
+        subsetMultiNetworks[group] = getSubsetView(multinet, networkIndices)
 
     return subsetMultiNetworks
 
+def getNetworkSelection (networkIndices):
+
+    # Selects consecutive networks with a slice, which selects a view of the array (instead of a copy) if the array is held in memory
+    networkIndices = np.asarray(networkIndices, dtype=np.intp)
+
+    if len(networkIndices) > 0 and np.array_equal(networkIndices, np.arange(networkIndices[0], networkIndices[0] + len(networkIndices))):
+        return slice(int(networkIndices[0]), int(networkIndices[0]) + len(networkIndices))
+
+    return networkIndices
+
+def getSubsetView (multinet, networkIndices):
+
+    """
+    Function that creates a MultiNetwork object of a subset of the networks of a MultiNetwork object (e.g. a group from getSubsetIndices).
+    The array is selected lazily if the MultiNetwork is lazily loaded (e.g. from a Zarr store), so no values are read or copied until they are used.
+
+    Inputs:
+    multinet – MultiNetwork object
+    networkIndices – Indices of the networks of the subset on the network axis of the MultiNetwork array
+    """
+
+    # Selects subset of structures from the MultiNetwork array
+    subsetArray = multinet.array.isel(network=getNetworkSelection(networkIndices))
+    subsetStructs = subsetArray.get_index('network').to_list()
+
+    # Selects subset of metadata
+    subsetMetadata = multinet.metadata.loc[multinet.metadata['ID'].isin(subsetStructs)]
+
+    # Selects subset of sequence alignment
+    subsetSeqAln = {k: multinet.seqaln[k] for k in subsetStructs}
+
+    # Combines the subset array, metadata, and sequence alignment into a new MultiNetwork object
+    return MultiNetwork(array=subsetArray, seqaln=subsetSeqAln, metadata=subsetMetadata)
+
+def isManifest (path):
+
+    # Tests whether a path is a subset manifest (a .json file) instead of a MultiNetwork pickle file or Zarr store
+    return os.path.splitext(os.path.normpath(path))[1] == '.json'
+
+def exportManifest (multinet, parentPath, networkIndices, subsetFilter, path):
+
+    """
+    Function that writes a subset manifest, a small .json file that stands for a subset of the networks of a MultiNetwork instead of a copy of them.
+    The manifest holds the path of the parent MultiNetwork (pickle file, Zarr store, or manifest), the indices and names of the networks of the subset,
+    and the metadata filter that selected them. The subset is only created when the manifest is opened (see openManifest).
+
+    Inputs:
+    multinet – Parent MultiNetwork object (opened from parentPath)
+    parentPath – Path of the parent MultiNetwork
+    networkIndices – Indices of the networks of the subset on the network axis of the parent MultiNetwork array
+    subsetFilter – Dictionary of the metadata filter (e.g. the classifier and group) that selected the networks
+    path – Path of the manifest to create
+    """
+
+    # The parent is stored relative to the manifest, so that they can be moved together
+    parentPath = os.path.relpath(os.path.abspath(parentPath), os.path.dirname(os.path.abspath(path)))
+
+    manifest = {
+        'parent': parentPath,
+        'indices': [int(index) for index in networkIndices],
+        'networks': multinet.array.get_index('network')[networkIndices].to_list(),
+        'filter': subsetFilter
+    }
+
+    with open(path, 'w') as manifestFile:
+        json.dump(manifest, manifestFile, indent=1)
+
+def openManifest (path):
+
+    """
+    Function that opens the subset of a MultiNetwork that a subset manifest stands for (see exportManifest).
+    The parent MultiNetwork is opened (lazily if it is a Zarr store), and the subset is a view of its networks (see getSubsetView).
+    """
+
+    with open(path, 'r') as manifestFile:
+        manifest = json.load(manifestFile)
+
+    parentPath = os.path.join(os.path.dirname(os.path.abspath(path)), manifest['parent'])
+    multinet = readMultiNetwork(parentPath)
+
+    # Checks that the networks of the parent have not changed since the manifest was written
+    networkIndex = multinet.array.get_index('network')
+    if max(manifest['indices'], default=-1) >= len(networkIndex) or networkIndex[manifest['indices']].to_list() != manifest['networks']:
+        raise ValueError(f'Networks of the subset manifest {path} are not in the same positions in the parent MultiNetwork {parentPath}')
+
+    return getSubsetView(multinet, manifest['indices'])
+
+def getSubsetString (subset):
+
+    # String formatting for proper output file name
+    return str(subset).replace(', ','-').replace('(','').replace(']','')
+
+def exportManifests (multinet, parentPath, subsetIndices, classifier, outputname, makeDiscreteValue=None):
+
+    """
+    Function that creates a subset manifest (see exportManifest) for each subset, instead of a copy of each subset array
+    """
+
+    # Loops through each subset
+    for subset in subsetIndices:
+
+        subsetFilter = {'classifier': classifier, 'group': str(subset), 'make_discrete': makeDiscreteValue}
+        exportManifest(multinet, parentPath, subsetIndices[subset], subsetFilter, f'{outputname}_{classifier}_{getSubsetString(subset)}.json')
+
 def exportPickle (subsetMultiNetworks, classifier, outputname):
 
     """
@@ -114,8 +242,23 @@ def exportPickle (subsetMultiNetworks, classifier, outputname):
     for subset in subsetMultiNetworks:
 
         # String formatting for proper output file name
-        subsetString = str(subset).replace(', ','-').replace('(','').replace(']','')
+        subsetString = getSubsetString(subset)
 
         # Creates new pickle (.pkl) file and then dumps the entire class object into the pickle file
         with open(f'{outputname}_{classifier}_{subsetString}.pkl', 'wb') as pickleFile:
-            pickle.dump(subsetMultiNetworks[subset], pickleFile)
\ No newline at end of file
+            pickle.dump(subsetMultiNetworks[subset], pickleFile)
+
+def exportStore (subsetMultiNetworks, classifier, outputname):
+
+    """
+    Function that creates a Zarr store for each subset array
+    """
+
+    # Loops through each subset array
+    for subset in subsetMultiNetworks:
+
+        # String formatting for proper output file name
+        subsetString = getSubsetString(subset)
+
+        # Creates new Zarr store (.zarr) of the subset MultiNetwork
+        exportMultiNetworkStore(subsetMultiNetworks[subset], f'{outputname}_{classifier}_{subsetString}.zarr')
@@ -13,7 +13,7 @@ def setupArguments ():
 
     parser.add_argument(
         'filename', 
-        help='Pickle (.pkl) file of the MultiNetwork object' 
+        help='Pickle (.pkl) file, Zarr store (.zarr), or subset manifest (.json) of the MultiNetwork object' 
     )
 
     parser.add_argument(
@@ -36,7 +36,7 @@ def setupArguments ():
     )
 
     args = parser.parse_args()
-    checkExtension(args.filename, '.pkl', "Input file must be in .pkl format")
+    checkExtension(args.filename, ['.pkl', '.zarr', '.json'], "Input file must be in .pkl, .zarr or .json format")
 
     return args
 
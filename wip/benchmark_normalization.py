@@ -0,0 +1,164 @@
+from multirin.generate.MultiNetwork import MultiNetwork
+from multirin.generate.Normalization import structNormalizations, sumNetworkScalings
+from multirin.analysis.SumNetwork import SumNetwork
+from argparse import Namespace
+import argparse
+import tracemalloc
+import time
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+def setupArguments ():
+
+    # Creates argument parser object
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the time and peak memory of each registered normalization and scaling method on synthetic ensembles of growing size',
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+
+    parser.add_argument(
+        '--sizes',
+        nargs='+',
+        default=[10, 50, 100, 200],
+        type=int,
+        help='Number of networks in each synthetic ensemble'
+    )
+
+    parser.add_argument(
+        '--residues',
+        default=300,
+        type=int,
+        help='Length of the alignment (number of residues) of the synthetic networks'
+    )
+
+    parser.add_argument(
+        '--density',
+        default=0.02,
+        type=float,
+        help='Fraction of residue pairs with an edge in each synthetic network'
+    )
+
+    parser.add_argument(
+        '--repeats',
+        default=3,
+        type=int,
+        help='Number of times each method is run (the fastest time is reported)'
+    )
+
+    parser.add_argument(
+        '--seed',
+        default=0,
+        type=int,
+        help='Seed of the random synthetic networks'
+    )
+
+    parser.add_argument(
+        '-o',
+        '--output',
+        help='Path of a .csv file to write the results to'
+    )
+
+    return parser.parse_args()
+
+def createEnsemble (networkCount, size, density, rng):
+
+    """
+    Function that creates the array of a synthetic ensemble of symmetric networks with random edge weights (with the axes of a MultiNetwork array)
+    """
+
+    data = np.zeros((networkCount, size, size))
+    firstPositions, secondPositions = np.triu_indices(size, k=1)
+
+    # Adds random edges to the upper triangle of each network, and then mirrors them to the lower triangle
+    for networkIndex in range(networkCount):
+        edges = rng.random(len(firstPositions)) < density
+        weights = rng.random(edges.sum()) * 10
+        data[networkIndex, firstPositions[edges], secondPositions[edges]] = weights
+        data[networkIndex, secondPositions[edges], firstPositions[edges]] = weights
+
+    coords = dict(network=[f'struct{index}' for index in range(networkCount)], firstResi=range(size), secondResi=range(size))
+    return xr.DataArray(data, coords=coords, dims=("network", "firstResi", "secondResi"))
+
+def measure (function, repeats):
+
+    """
+    Function that runs a function a number of times, and gets the fastest time (s) and the largest peak of the memory allocated (MB) while it runs.
+    The function returns the function to time, so that the inputs of each run are created before it is timed.
+    """
+
+    times, peaks = [], []
+
+    for run in range(repeats):
+        timedFunction = function()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        timedFunction()
+        times.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1e6)
+        tracemalloc.stop()
+
+    return min(times), max(peaks)
+
+def benchmarkStructNormalization (normType, array, repeats):
+
+    args = Namespace(alignmentFile=None, metadata=None, no_norm_struct=False, norm_type=normType, log_norm_threshold=99, clip_norm_threshold=90,
+                     scale_multinet=True, multinet_scale=10)
+
+    def setup ():
+
+        # Each run normalizes a new copy of the array in place
+        multinet = MultiNetwork(args=args, array=array.copy(deep=True))
+
+        def normalize ():
+            multinet.normalizeLocal()
+            multinet.applyGlobalNormInPlace(multinet.getGlobalNorm())
+
+        return normalize
+
+    return measure(setup, repeats)
+
+def benchmarkSumNetworkScaling (scaleType, array, repeats):
+
+    args = Namespace(scale_sum_network=scaleType, sum_network_scaling_factor=20, remove_weak_edges=None)
+
+    def setup ():
+        sumNetwork = SumNetwork(args)
+        return lambda: sumNetwork.calculateSum(array)
+
+    return measure(setup, repeats)
+
+def main ():
+
+    args = setupArguments()
+    rng = np.random.default_rng(args.seed)
+
+    results = []
+    for networkCount in args.sizes:
+
+        array = createEnsemble(networkCount, args.residues, args.density, rng)
+        arraySize = array.nbytes / 1e6
+
+        # Structure normalizations (along with the scaling of the MultiNetwork)
+        for normType in structNormalizations:
+            seconds, peak = benchmarkStructNormalization(normType, array, args.repeats)
+            results.append(['struct_norm', normType, networkCount, args.residues, arraySize, seconds, peak])
+
+        # Sum network scalings (along with the sum over all networks)
+        for scaleType in sumNetworkScalings:
+            seconds, peak = benchmarkSumNetworkScaling(scaleType, array, args.repeats)
+            results.append(['sum_network_scaling', scaleType, networkCount, args.residues, arraySize, seconds, peak])
+
+    results = pd.DataFrame(results, columns=['kind', 'method', 'networks', 'residues', 'array_MB', 'seconds', 'peak_MB'])
+
+    # Peak memory allocated while running the method, relative to the size of the array
+    results['peak_per_array'] = results['peak_MB'] / results['array_MB']
+
+    print(results.to_string(index=False))
+
+    if args.output is not None:
+        results.to_csv(args.output, index=False)
+
+if __name__ == "__main__":
+    main()
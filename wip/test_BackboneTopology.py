@@ -0,0 +1,88 @@
+from multirin.generate.BackboneTopology import getBackboneTopology, createBackboneGraph, getResidueType
+from multirin.generate.IndividualNetwork import IndividualNetwork
+from argparse import Namespace
+import itertools
+import networkx as nx
+import unittest
+
+def findBackboneConnectionsRecursive (firstResiAltConfAtomNames, secondResiAltConfAtomNames, backboneGraph, startingResidue='N_2', count=1):
+
+    # Reference version of the backbone search (recursive search of the networkX graph with list membership)
+    for successor in backboneGraph.successors(startingResidue):
+        if (successor in firstResiAltConfAtomNames) or (successor in secondResiAltConfAtomNames):
+            newCount = count + 1
+            count = findBackboneConnectionsRecursive(firstResiAltConfAtomNames, secondResiAltConfAtomNames, backboneGraph, startingResidue=successor, count=newCount)
+
+    return count
+
+# Define class to test the program
+class testBackboneTopology (unittest.TestCase):
+
+    resiNames = ['ALA', 'PRO', 'GLY']
+
+    def test_backboneTopology (self):
+
+        # Tests that the precompiled backbone topologies have the same nodes and successors as the backbone graph edited for Proline and Glycine
+        for firstResiName in self.resiNames:
+            for secondResiName in self.resiNames:
+
+                backboneGraph = nx.DiGraph({'N_2': ['C_1','H_2','CA_2'], 'CA_2': ['C_2','HA_2'], 'C_2': ['O_2'], 'C_1': ['O_1','CA_1'], 'CA_1': ['HA_1','N_1'], 'N_1': ['H_1']})
+
+                if firstResiName == 'PRO':
+                    backboneGraph.remove_edge('N_1','H_1')
+                if secondResiName == 'PRO':
+                    backboneGraph.remove_edge('N_2','H_2')
+                if firstResiName == 'GLY':
+                    backboneGraph.remove_edge('CA_1','HA_1')
+                    backboneGraph.add_edges_from([('CA_1','HA2_1'), ('CA_1','HA3_1')])
+                if secondResiName == 'GLY':
+                    backboneGraph.remove_edge('CA_2','HA_2')
+                    backboneGraph.add_edges_from([('CA_2','HA2_2'), ('CA_2','HA3_2')])
+
+                backboneTopology = getBackboneTopology(firstResiName, secondResiName)
+
+                self.assertEqual(backboneTopology.nodes, set(backboneGraph.nodes))
+                for node in backboneGraph.nodes:
+                    self.assertEqual(list(backboneTopology.successors(node)), list(backboneGraph.successors(node)))
+
+    def test_countConnections_allAltConfs (self):
+
+        # Tests that the count is the same as the recursive search for every possible set of alt conf backbone atoms
+        for firstResiName in self.resiNames:
+            for secondResiName in self.resiNames:
+
+                backboneGraph = createBackboneGraph(getResidueType(firstResiName), getResidueType(secondResiName))
+                backboneTopology = getBackboneTopology(firstResiName, secondResiName)
+                nodes = sorted(backboneGraph.nodes)
+
+                for nodeCount in range(len(nodes) + 1):
+                    for altConfAtomNames in itertools.combinations(nodes, nodeCount):
+
+                        # Splits the atom names into the first and second residue
+                        firstResiAltConfAtomNames = [name for name in altConfAtomNames if name.endswith('_1')]
+                        secondResiAltConfAtomNames = [name for name in altConfAtomNames if name.endswith('_2')]
+
+                        self.assertEqual(
+                            backboneTopology.countConnections(set(altConfAtomNames)),
+                            findBackboneConnectionsRecursive(firstResiAltConfAtomNames, secondResiAltConfAtomNames, backboneGraph)
+                        )
+
+    def test_findBackboneConnections (self):
+
+        net1 = IndividualNetwork(None, Namespace())
+        backboneGraph = createBackboneGraph(None, 'GLY')
+        backboneTopology = getBackboneTopology('ALA', 'GLY')
+
+        # Continuous stretch of alt confs N_2 -> C_1 -> O_1 and N_2 -> CA_2 -> HA2_2
+        # HA_1 is not connected since CA_1 has no alt conf, and HA_2 is not connected to CA_2 for a Glycine
+        firstResiAltConfAtomNames = ['C_1', 'O_1', 'HA_1']
+        secondResiAltConfAtomNames = ['N_2', 'CA_2', 'HA2_2', 'HA_2']
+
+        # Tests the count, and that repeated searches (from the stored counts) are the same
+        for i in range(2):
+            self.assertEqual(net1.findBackboneConnections(firstResiAltConfAtomNames, secondResiAltConfAtomNames, backboneTopology), 5)
+            self.assertEqual(net1.findBackboneConnections(firstResiAltConfAtomNames, secondResiAltConfAtomNames, backboneTopology),
+                             findBackboneConnectionsRecursive(firstResiAltConfAtomNames, secondResiAltConfAtomNames, backboneGraph))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+from multirin.generate.Structure import Structure
+from multirin.generate.IndividualNetwork import IndividualNetwork
+from multirin.generate.ContactSearch import findResidueContacts
+from argparse import Namespace
+import unittest
+
+# Define class to test the program
+class testContactSearch (unittest.TestCase):
+
+    def test_findResidueContacts (self):
+
+        struct1 = Structure('tests/data/synth_structs/1111_Test.pdb', None)
+        net1 = IndividualNetwork(struct1, Namespace(no_norm_resi=False))
+
+        # Finds the contacts between all residues with the atom by atom search
+        net1.addAllResidues()
+        contacts = {frozenset(edge) for edge in net1.network.edges}
+
+        # Tests that the contact map has the same pairs of residues in contact (in both orders)
+        resis, adjacency = findResidueContacts(net1.createAllResidueDict(struct1))
+        rows, cols = adjacency.nonzero()
+
+        self.assertEqual({frozenset((resis[row], resis[col])) for row, col in zip(rows, cols)}, contacts)
+        self.assertEqual((adjacency != adjacency.T).nnz, 0)
+
+    def test_findResidueContacts_structure (self):
+
+        struct2 = Structure('tests/data/sum_net_test/6B8Z_qFit_chainA.pdb', None)
+        net2 = IndividualNetwork(struct2, Namespace(no_norm_resi=False))
+
+        # Finds the contacts between all residues with the atom by atom search, and with the contact map
+        net2.addAllResidues()
+        contacts = {frozenset(edge) for edge in net2.network.edges}
+
+        allResisDict = net2.createAllResidueDict(struct2)
+        resis, adjacency = findResidueContacts(allResisDict)
+        rows, cols = adjacency.nonzero()
+        mapContacts = {frozenset((resis[row], resis[col])) for row, col in zip(rows, cols)}
+
+        # The atom by atom search stops at the first pair of atoms further than 25 A apart, so it can only miss pairs of residues (see findResidueContacts)
+        # Tests that the contact map has every contact of the atom by atom search, and that there are no extra pairs of residues for this structure
+        self.assertLessEqual(contacts, mapContacts)
+        self.assertEqual(mapContacts - contacts, set())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
 from multirin.generate.Structure import Structure
 from multirin.generate.IndividualNetwork import IndividualNetwork
+from multirin.generate.ResidueRecord import ResidueRecord
 from argparse import Namespace
 import gemmi
+import numpy as np
 import unittest
 
 # Define class to test the program
@@ -66,6 +68,62 @@ class testIndividualNetwork (unittest.TestCase):
     # TODO:
     # def test_populateNetwork (self):
 
+    def test_findConnections (self):
+
+        args1 = Namespace(no_norm_resi=False)
+        net1 = IndividualNetwork(self.struct1, args1)
+
+        # Creates two residues with atoms placed along the x axis
+        firstResiArrays = (np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0]]), np.array(['CB', 'CG']), np.array(['A', 'A']))
+        secondResiArrays = (np.array([[3.0, 0.0, 0.0], [6.0, 0.0, 0.0]]), np.array(['N', 'CA']), np.array(['A', 'A']))
+
+        # Only the CB-N (3A) and CG-N (2A) atom pairs are within the 4A cutoff
+        self.assertEqual(net1.findConnections(firstResiArrays, secondResiArrays), (2, [3.0, 2.0]))
+
+        # Excluding the CB atom removes its connection
+        self.assertEqual(net1.findConnections(firstResiArrays, secondResiArrays, excludeAtoms=['CB']), (1, [2.0]))
+
+        # If any atom pair is further than tooFarDist, then there are no connections at all
+        self.assertEqual(net1.findConnections(firstResiArrays, secondResiArrays, tooFarDist=5.5), (0, []))
+
+    def test_residueRecord (self):
+
+        args1 = Namespace(no_norm_resi=False)
+        net1 = IndividualNetwork(self.struct1, args1)
+        atomsWithAltConfsDict, resToSeqPositionMap = net1.findAltConfAtoms()
+
+        # Classifies the alt conf atoms of residue 1 (ASP with alt confs A and B)
+        record = ResidueRecord(atomsWithAltConfsDict[1], self.struct1.sequence[1]['name'])
+
+        # Tests that the backbone and sidechain atoms are split in the same order as the gemmi atoms
+        self.assertEqual(record.backboneArrays[1].tolist(), ['N', 'CA', 'C', 'O', 'HA'] * 2)
+        self.assertEqual(len(record.backboneArrays[1]) + len(record.sidechainArrays[1]), 28)
+        self.assertEqual(record.sidechainArrays[1][record.sidechainExcluded].tolist(), ['CB', 'HB2', 'HB3'] * 2)
+
+        # Tests the backbone atom names grouped by alt-loc and labelled as the first and second residue
+        self.assertEqual(record.backboneNamesByAltLoc[1]['A'], {'N_1', 'CA_1', 'C_1', 'O_1', 'HA_1'})
+        self.assertEqual(record.backboneNamesByAltLoc[2]['B'], {'N_2', 'CA_2', 'C_2', 'O_2', 'HA_2'})
+        self.assertTrue(record.hasCarbonylC and record.hasAmideN)
+
+    def test_populateNetwork_contactSearch (self):
+
+        # Populates the same network by searching all residue pairs (without any prefilter), which is the reference for the other searches
+        struct2 = Structure('tests/data/sum_net_test/6B8Z_qFit_chainA.pdb', None)
+
+        argsAll = Namespace(only_sidechain=False, no_norm_resi=False, contact_search='all')
+        netAll = IndividualNetwork(struct2, argsAll)
+        netAll.populateNetwork()
+
+        # Tests that the KD-tree candidate pairs and the bounding-sphere prefilter give the same edges, weights, and distances as searching all pairs
+        for contactSearch in ['kdtree', 'spheres']:
+            args = Namespace(only_sidechain=False, no_norm_resi=False, contact_search=contactSearch)
+            net = IndividualNetwork(struct2, args)
+            net.populateNetwork()
+
+            self.assertEqual(netAll.convertToAdjacency(), net.convertToAdjacency())
+            self.assertEqual(netAll.weightsRecord, net.weightsRecord)
+            self.assertEqual(netAll.distancesRecord, net.distancesRecord)
+
     def test_convertToAdjacency (self):
 
         # Creates network that's the same as previous functions
@@ -85,5 +143,21 @@ class testIndividualNetwork (unittest.TestCase):
 
         self.assertEqual(net1.convertToAdjacency(), compareDict)
 
+    def test_compact (self):
+
+        # Creates network from the reference structure
+        struct2 = Structure('tests/data/sum_net_test/6B8Z_qFit_chainA.pdb', None)
+        args1 = Namespace(only_sidechain=False, no_norm_resi=False, contact_search='kdtree')
+        net1 = IndividualNetwork(struct2, args1)
+        net1.populateNetwork()
+
+        # Tests that the compact network has the same information as the full network
+        compactNet1 = net1.compact()
+        self.assertEqual(compactNet1.getName(), '6B8Z_qFit_chainA')
+        self.assertEqual(compactNet1.getSequenceList(), struct2.getSequenceList())
+        self.assertEqual(compactNet1.convertToAdjacency(), net1.convertToAdjacency())
+        self.assertEqual(compactNet1.weightsRecord, net1.weightsRecord)
+        self.assertFalse(hasattr(compactNet1, 'struct'))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
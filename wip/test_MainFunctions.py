@@ -0,0 +1,42 @@
+from multirin.generate.MainFunctions import renderNetworks, keepRenderedNetworks
+from multirin.generate.CompactNetwork import CompactNetwork
+from argparse import Namespace
+import os
+import tempfile
+import unittest
+
+# Define class to test the program
+class testMainFunctions (unittest.TestCase):
+
+    def test_renderNetworks (self):
+
+        with tempfile.TemporaryDirectory() as tempDir:
+
+            # Creates three small networks that are written to the temporary directory
+            args = Namespace(output=f'{tempDir}/', render='all', render_structures=['struct2'], jobs=1)
+            networkList = [CompactNetwork(f'struct{i}', [], {1: {2: {'weight': 1.0}}, 2: {1: {'weight': 1.0}}}, {}, {}, args) for i in range(3)]
+
+            # Tests that only the selected structure is rendered
+            renderNetworks(networkList, args)
+            self.assertEqual([name for name in os.listdir(tempDir) if name.endswith('.html')], ['struct2.html'])
+
+            # Tests that no structures are rendered if turned off
+            args.render, args.render_structures = 'none', None
+            renderNetworks(networkList, args)
+            self.assertEqual([name for name in os.listdir(tempDir) if name.endswith('.html')], ['struct2.html'])
+
+    def test_keepRenderedNetworks (self):
+
+        args = Namespace(output='', render='all', render_structures=['struct2'], jobs=1)
+        networkList = [CompactNetwork(f'struct{i}', [], {}, {}, {}, args) for i in range(3)]
+
+        # Tests that every network is passed on, but only the networks that are visualized afterwards are kept
+        for render, renderStructures, keptNames in [('all', ['struct2'], ['struct2']), ('none', None, []), ('all', None, ['struct0', 'struct1', 'struct2'])]:
+            args.render, args.render_structures = render, renderStructures
+            renderList = []
+
+            self.assertEqual(list(keepRenderedNetworks(iter(networkList), args, renderList)), networkList)
+            self.assertEqual([net.getName() for net in renderList], keptNames)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,19 @@
-from multirin.generate.MultiNetwork import MultiNetwork 
+from multirin.generate.MultiNetwork import MultiNetwork, toDense, toSquare
+from multirin.generate.CompactNetwork import CompactNetwork
+from multirin.generate.MultiNetworkStore import readMultiNetwork, openStore, appendStore
+from multirin.generate.MainFunctions import streamStore, generateMultiNetwork
+from multirin.generate.Subset import getSubsetIndices, exportManifests
+from multirin.generate import NetworkBlocks
+from multirin.generate.Normalization import structNormalizations, StructNormalization, NetworkStatistics, register
 from argparse import Namespace
+from unittest import mock
 import unittest
 import numpy as np
 import xarray as xr
+import pandas as pd
 import pickle
 import os
+import shutil
 
 # Define class to test the program
 class testMultiNetwork (unittest.TestCase):
@@ -33,6 +42,24 @@ class testMultiNetwork (unittest.TestCase):
             221: {220: {'weight': 0.4}}
         }
 
+    def getArgs (self, **options):
+
+        # Creates the args used to add networks to a MultiNetwork (and normalize it), with the options that are different in each test
+        args = Namespace(alignmentFile='tests/data/multi_net_test/PTP-KDY.fa', metadata=None, output='tests/data/multi_net_test/', chunk_size=1, 
+                         sparse=False, compact=False, no_norm_struct=False, norm_type='log', log_norm_threshold=50, clip_norm_threshold=50, scale_multinet=True, 
+                         multinet_scale=20, output_format='zarr', output_info=False)
+        vars(args).update(options)
+
+        return args
+
+    def getNetworks (self, args):
+
+        # Creates the networks of 2SHV and 2SJR
+        seqList1 = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        seqList3 = [0, 211, 212, 213, 214, 215, 216, 217, 218, 219, 220, 221, 222]
+
+        return CompactNetwork("2SHV", seqList1, self.Dict_2SHV, None, None, args), CompactNetwork("2SJR", seqList3, self.Dict_2SJR, None, None, args)
+
     # Function to test residue conversion function
     def test_oneToAll (self):
 
@@ -54,6 +81,29 @@ class testMultiNetwork (unittest.TestCase):
         self.assertEqual(result2, 7)
         self.assertEqual(result3, 7)
 
+    def test_alignmentIndex (self):
+
+        args = Namespace(alignmentFile='tests/data/multi_net_test/PTP-KDY.fa', metadata=None)
+        multi = MultiNetwork(args)
+
+        seqList1 = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        seqList2 = [0, 1, 2, 3]
+
+        # Converts residue numbers to alignment positions and back
+        self.assertEqual(multi.getAlignmentIndex('1ALI').oneToAll(seqList1, 5), 7)
+        self.assertEqual(multi.getAlignmentIndex('1ALI').allToOne(seqList1, 7), 5)
+
+        # Alignment positions with a - placeholder are labelled with the previous residue
+        self.assertEqual(multi.getAlignmentIndex('1ALI').allToOne(seqList1, 4), 'NaN_3_4')
+
+        # Residues and sequences that are not in the alignment are reported instead of returning None
+        with self.assertRaises(KeyError):
+            multi.getAlignmentIndex('1SML').oneToAll(seqList2, 4)
+        with self.assertRaises(KeyError):
+            multi.getAlignmentIndex('1ALI').oneToAll(seqList1, 13)
+        with self.assertRaises(KeyError):
+            multi.getAlignmentIndex('4ABC')
+
     def test_add_withoutNorm (self):
 
         args = Namespace(alignmentFile='tests/data/multi_net_test/PTP-KDY.fa', no_norm_struct=True)
@@ -86,6 +136,105 @@ class testMultiNetwork (unittest.TestCase):
         self.assertEqual(multi.array.loc["2SJR", 6, 1].item(), 0.1)
         self.assertEqual(multi.array.loc["2SJR", 1, 3].item(), 0.2)
 
+    def test_add_allPairs (self):
+
+        args = Namespace(alignmentFile='tests/data/multi_net_test/PTP-KDY.fa', metadata=None)
+        multi = MultiNetwork(args)
+        structList = ["2SHV","1ALI","2SJR"]
+
+        multi.array = xr.DataArray(
+            0.0, 
+            coords=dict(network=structList, firstResi=range(multi.size), secondResi=range(multi.size)), 
+            dims=("network", "firstResi", "secondResi")
+        )
+
+        seqList1 = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        seqList3 = [0, 211, 212, 213, 214, 215, 216, 217, 218, 219, 220, 221, 222]
+
+        multi.add(self.Dict_2SHV, "2SHV", seqList1)
+        multi.add(self.Dict_2SJR, "2SJR", seqList3)
+
+        # Tests that every pair (in both directions) was added and nothing else
+        self.assertEqual(multi.array.loc["2SHV", 1, 6].item(), 0.1)
+        self.assertEqual(multi.array.loc["2SHV", 3, 1].item(), 0.2)
+        self.assertEqual(multi.array.loc["2SJR", 12, 13].item(), 0.4)
+        self.assertEqual(multi.array.loc["2SJR", 13, 12].item(), 0.4)
+        self.assertEqual(np.count_nonzero(multi.array.loc["2SHV"].values), 4)
+        self.assertEqual(np.count_nonzero(multi.array.loc["2SJR"].values), 6)
+        self.assertEqual(np.count_nonzero(multi.array.loc["1ALI"].values), 0)
+
+    def test_addSparse (self):
+
+        args = Namespace(alignmentFile='tests/data/multi_net_test/PTP-KDY.fa', metadata=None, norm_type='total')
+        structList = ["2SHV","1ALI","2SJR"]
+
+        seqList1 = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        seqList3 = [0, 211, 212, 213, 214, 215, 216, 217, 218, 219, 220, 221, 222]
+        networkList = [
+            CompactNetwork("2SHV", seqList1, self.Dict_2SHV, None, None, args),
+            CompactNetwork("2SJR", seqList3, self.Dict_2SJR, None, None, args)
+        ]
+
+        # Creates the same MultiNetwork as a dense and as a sparse array
+        multiDense = MultiNetwork(args)
+        multiSparse = MultiNetwork(args)
+        for multi in [multiDense, multiSparse]:
+            multi.array = xr.DataArray(
+                0.0, 
+                coords=dict(network=structList, firstResi=range(multi.size), secondResi=range(multi.size)), 
+                dims=("network", "firstResi", "secondResi")
+            )
+
+        for net in networkList:
+            multiDense.add(net.convertToAdjacency(), net.getName(), net.getSequenceList())
+        multiSparse.addSparse(networkList)
+
+        # Tests that the arrays are the same before and after normalization (1ALI has no edges)
+        self.assertTrue(np.array_equal(multiSparse.array.data.todense(), multiDense.array.values))
+
+        multiDense.normalizeStruct()
+        multiSparse.normalizeStruct()
+        multiDense.array = multiDense.array.fillna(0)
+        multiSparse.array = multiSparse.array.fillna(0)
+
+        self.assertTrue(np.allclose(multiSparse.array.data.todense(), multiDense.array.values))
+        self.assertTrue(toDense(multiSparse.getNetworkTotals()).equals(multiDense.getNetworkTotals()))
+
+    def test_add_compact (self):
+
+        args = Namespace(alignmentFile='tests/data/multi_net_test/PTP-KDY.fa', metadata=None, sparse=False, compact=False, compact_dtype='float64', norm_type='log', log_norm_threshold=99)
+        structList = ["2SHV","1ALI","2SJR"]
+
+        seqList1 = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+        seqList3 = [0, 211, 212, 213, 214, 215, 216, 217, 218, 219, 220, 221, 222]
+
+        # Creates the same MultiNetwork with square residue axes and with a condensed pair axis
+        multiSquare = MultiNetwork(args)
+        multiSquare.createArray(structList)
+
+        args = Namespace(**vars(args))
+        args.compact = True
+        multiCompact = MultiNetwork(args)
+        multiCompact.createArray(structList)
+
+        self.assertEqual(multiCompact.array.dims, ("network", "pair"))
+        self.assertEqual(multiCompact.array.sizes['pair'], multiCompact.size * (multiCompact.size - 1) // 2)
+
+        for multi in [multiSquare, multiCompact]:
+            multi.add(self.Dict_2SHV, "2SHV", seqList1)
+            multi.add(self.Dict_2SJR, "2SJR", seqList3)
+
+        # Each pair is stored once, and the square form is the same as adding to the square array
+        self.assertEqual(np.count_nonzero(multiCompact.array.loc["2SJR"].values), 3)
+        self.assertTrue(toSquare(multiCompact.array).equals(multiSquare.array))
+
+        # The totals and normalization treat each stored pair as both (i, j) and (j, i)
+        self.assertTrue(np.allclose(multiCompact.getNetworkTotals(), multiSquare.getNetworkTotals()))
+
+        multiSquare.normalizeStruct()
+        multiCompact.normalizeStruct()
+        self.assertTrue(np.allclose(toSquare(multiCompact.array.fillna(0)), multiSquare.array.fillna(0)))
+
     def test_add_withNorm (self):
 
         args = Namespace(alignmentFile='tests/data/multi_net_test/PTP-KDY.fa', no_norm_struct=False)
@@ -204,6 +353,232 @@ class testMultiNetwork (unittest.TestCase):
 
         # Deletes the pickle file
         os.remove(filename)
- 
+
+    def test_exportStore (self):
+        
+        args = Namespace(alignmentFile='tests/data/multi_net_test/PTP-KDY.fa', metadata=None, output='tests/data/multi_net_test/', chunk_size=1)
+        multi = MultiNetwork(args)
+        structList = ["2SHV","1ALI"]
+
+        # Creates test array object
+        multi.array = xr.DataArray(
+            np.arange(18, dtype=float).reshape(2, 3, 3), 
+            coords=dict(network=structList, firstResi=range(3), secondResi=range(3)), 
+            dims=("network", "firstResi", "secondResi")
+        )
+
+        # Creates Zarr store and opens it again
+        multi.exportStore()
+        filename = args.output + 'MultiNetwork.zarr'
+        multiFromStore = readMultiNetwork(filename)
+
+        # Asserts that the array is opened lazily in chunks of networks and has the same values
+        self.assertEqual(multiFromStore.array.chunks[0], (1, 1))
+        self.assertTrue(multi.array.equals(multiFromStore.array.compute()))
+
+        # Asserts that the sequence alignment is stored alongside the array
+        self.assertEqual(len(multi.seqaln), len(multiFromStore.seqaln))
+        self.assertEqual(multiFromStore.oneToAll("2SJR", [0, 211, 212, 213, 214, 215, 216, 217, 218, 219, 220, 221, 222], 220), 12)
+
+        # Deletes the Zarr store
+        shutil.rmtree(filename)
+
+    def test_appendStore (self):
+
+        args = self.getArgs()
+        net1, net3 = self.getNetworks(args)
+
+        # Creates the MultiNetwork of both structures at once
+        multiAll = MultiNetwork(args)
+        multiAll.addNetworks([net1, net3])
+
+        # Creates a Zarr store of the first structure, and then appends the second structure to it
+        multiFirst = MultiNetwork(args)
+        multiFirst.addNetworks([net1])
+        multiFirst.exportStore()
+
+        filename = args.output + 'MultiNetwork.zarr'
+        multiSecond = MultiNetwork(args)
+        multiSecond.populateArray([net3])
+        appendStore(multiSecond.array, filename)
+
+        # Recalculates the global normalization steps across both structures
+        multiAppended = openStore(filename)
+        multiAppended.args = args
+        multiAppended.array = multiAppended.localArray
+        globalNorm = multiAppended.getGlobalNorm()
+
+        # Asserts that the global steps changed, and are the same as creating the MultiNetwork of both structures at once
+        self.assertNotEqual(globalNorm, multiFirst.globalNorm)
+        self.assertEqual(globalNorm, multiAll.globalNorm)
+        self.assertTrue(multiAppended.applyGlobalNorm(multiAppended.localArray, globalNorm).fillna(0).compute().equals(multiAll.array))
+
+        # Deletes the Zarr store
+        shutil.rmtree(filename)
+
+    def test_streamStore (self):
+
+        args = self.getArgs()
+        net1, net3 = self.getNetworks(args)
+
+        # Creates the MultiNetwork of both structures at once
+        multiAll = MultiNetwork(args)
+        multiAll.addNetworks([net1, net3])
+
+        # Writes the networks from a generator into the Zarr store one chunk (network) at a time
+        filename = args.output + 'MultiNetwork.zarr'
+        multiStream = MultiNetwork(args)
+        streamStore(multiStream, (net for net in [net1, net3]), ["2SHV", "2SJR"], filename)
+
+        # Asserts that the store has the same global normalization steps and values as creating the MultiNetwork at once
+        multiFromStore = openStore(filename)
+        self.assertEqual(multiFromStore.globalNorm, multiAll.globalNorm)
+        self.assertTrue(multiFromStore.array.compute().equals(multiAll.array))
+
+        # Deletes the Zarr store
+        shutil.rmtree(filename)
+
+    def test_streamStore_finishesNetworks (self):
+
+        # Generator of networks that records whether it ran past its last network (e.g. to shut down a pool of worker processes)
+        finished = []
+        def iterateNetworks (networkList):
+            yield from networkList
+            finished.append(True)
+
+        # The number of structures is a multiple of the chunk size, so the last chunk takes the last network of the generator
+        args = self.getArgs(chunk_size=2, cache_dir='tests/data/multi_net_test/cache/', cache_size=1)
+        net1, net3 = self.getNetworks(args)
+
+        with mock.patch('multirin.generate.MainFunctions.NetworkCache') as networkCache:
+            generateMultiNetwork(iterateNetworks([net1, net3]), args, structList=["2SHV", "2SJR"])
+
+        # Asserts that the generator finished, and that the cache was evicted once the networks were added
+        self.assertEqual(finished, [True])
+        networkCache.return_value.evict.assert_called_once()
+
+        # Deletes the Zarr store
+        shutil.rmtree(args.output + 'MultiNetwork.zarr')
+
+    def test_normalizeInPlace (self):
+
+        for normType in ['log', 'clip']:
+
+            args = self.getArgs(norm_type=normType, output_format='pickle')
+            net1, net3 = self.getNetworks(args)
+
+            # Normalizes the array in place, one network at a time
+            with mock.patch.object(NetworkBlocks, 'blockElements', 1):
+                multiInPlace = MultiNetwork(args)
+                multiInPlace.addNetworks([net1, net3])
+
+            # Keeps the locally normalized array, so the global steps are applied to a copy of the array
+            args.output_format = 'zarr'
+            multiCopy = MultiNetwork(args)
+            multiCopy.addNetworks([net1, net3])
+
+            # Asserts that both give the same array, and that the clip value is the same percentile as np.percentile
+            self.assertTrue(multiInPlace.array.equals(multiCopy.array))
+            self.assertEqual(multiInPlace.globalNorm, multiCopy.globalNorm)
+
+            if normType == 'log':
+                self.assertAlmostEqual(multiCopy.globalNorm['clipValue'], np.percentile(multiCopy.localArray.values[multiCopy.localArray.values > 0], 50))
+
+    def test_nonzeroPercentile (self):
+
+        # Networks with many identical weights, so the values around the percentiles share all of their bits
+        weights = np.zeros((4, 5, 5))
+        weights[:, :2, :] = 0.3
+        weights[:, 2, :] = np.arange(1, 6)
+        array = xr.DataArray(weights, coords=dict(network=range(4), firstResi=range(5), secondResi=range(5)), dims=("network", "firstResi", "secondResi"))
+
+        # Asserts that the percentiles are the same as np.percentile, when every bucket of values is larger than the values held in memory at a time
+        with mock.patch.object(NetworkBlocks, 'blockElements', 1):
+            for percentile in [0, 30, 72.5, 99, 100]:
+                self.assertAlmostEqual(float(NetworkBlocks.getNonzeroPercentile(array, percentile)), np.percentile(weights[weights > 0], percentile))
+
+    def test_normalizationRegistry (self):
+
+        # Normalization that divides each network by its sum (as the total normalization), and clips by a percentile of the sums (as the clip normalization)
+        class TotalClipNormalization (StructNormalization):
+            name = 'total_clip'
+            localStatistics = ('networkTotals',)
+            globalStatistics = ('networkTotals',)
+
+            def normalizeLocal (self, multinet, statistics):
+                structNormalizations['total']().normalizeLocal(multinet, statistics)
+
+            def getGlobalNorm (self, multinet, statistics):
+                return structNormalizations['clip']().getGlobalNorm(multinet, statistics)
+
+        register(structNormalizations)(TotalClipNormalization)
+        self.addCleanup(structNormalizations.pop, 'total_clip')
+
+        args = self.getArgs(norm_type='total_clip', scale_multinet=False, output_format='pickle')
+        net1, net3 = self.getNetworks(args)
+
+        multiNew = MultiNetwork(args)
+        multiNew.addNetworks([net1, net3])
+
+        # Asserts that the new normalization is the same as the total normalization followed by the global steps of the clip normalization
+        args.norm_type = 'total'
+        multiTotal = MultiNetwork(args)
+        multiTotal.populateArray([net1, net3])
+        args.norm_type = 'clip'
+        globalNorm = multiTotal.getGlobalNorm()
+
+        self.assertEqual(multiNew.globalNorm, globalNorm)
+        self.assertTrue(multiNew.array.equals(multiTotal.applyGlobalNorm(multiTotal.array, globalNorm).fillna(0)))
+
+        # Asserts that statistics are only calculated once
+        statistics = NetworkStatistics(multiNew)
+        self.assertIs(statistics.get('networkTotals'), statistics.calculate(['networkTotals']).get('networkTotals'))
+
+    def test_subsetManifest (self):
+
+        args = Namespace(alignmentFile='tests/data/multi_net_test/PTP-KDY.fa', metadata=None, output='tests/data/multi_net_test/', chunk_size=2)
+        structList = ["2SHV","1ALI","2SJR"]
+
+        # Creates test MultiNetwork object with metadata, and exports it as a Zarr store
+        multi = MultiNetwork(args,
+            array=xr.DataArray(
+                np.arange(27, dtype=float).reshape(3, 3, 3),
+                coords=dict(network=structList, firstResi=range(3), secondResi=range(3)),
+                dims=("network", "firstResi", "secondResi")),
+            seqaln={struct: 'ACD' for struct in structList},
+            metadata=pd.DataFrame({'ID': [[struct] for struct in structList], 'Group': [['a'], ['b'], ['a']]})
+        )
+        multi.exportStore()
+        filename = args.output + 'MultiNetwork.zarr'
+
+        # Creates a manifest of each subset of the store, and opens them again
+        parent = readMultiNetwork(filename)
+        exportManifests(parent, filename, getSubsetIndices(parent, 'Group'), 'Group', args.output + 'subset')
+
+        # Group a has the non-consecutive networks 0 and 2, and group b has network 1
+        expectedIndices = {'a': [0, 2], 'b': [1]}
+
+        for group, indices in expectedIndices.items():
+            subset = readMultiNetwork(args.output + f'subset_Group_{group}.json')
+
+            # Asserts that the subset is opened lazily, and has the networks (values, names, and sequences) of the group
+            self.assertTrue(hasattr(subset.array.data, 'compute'))
+            self.assertTrue(np.array_equal(subset.array.values, multi.array.values[indices]))
+            self.assertEqual(subset.array.get_index('network').to_list(), [structList[index] for index in indices])
+            self.assertEqual(list(subset.seqaln), [structList[index] for index in indices])
+
+        # Rewrites the store with the networks in a different order, so the manifests no longer match the positions of their networks
+        multi.array = multi.array.isel(network=[2, 1, 0])
+        multi.exportStore()
+
+        # Asserts that opening a manifest with networks that moved in the store raises an error
+        with self.assertRaises(ValueError):
+            readMultiNetwork(args.output + 'subset_Group_a.json')
+
+        for group in expectedIndices:
+            os.remove(args.output + f'subset_Group_{group}.json')
+
+        shutil.rmtree(filename)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
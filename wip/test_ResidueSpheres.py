@@ -0,0 +1,31 @@
+from multirin.generate.ResidueSpheres import ResidueSpheres
+import numpy as np
+import unittest
+
+# Define class to test the program
+class testResidueSpheres (unittest.TestCase):
+
+    def test_findClosePairs (self):
+
+        # Creates three residues with atoms along the x axis, and one residue without atoms
+        # Residue 1 spans 0-2A, residue 2 spans 5.5-6.5A (1.5A gap from residue 3), and residue 3 spans 8-10A (6A gap from residue 1)
+        coordsDict = {1: np.array([[0.0, 0.0, 0.0], [2.0, 0.0, 0.0]]),
+                      2: np.array([[5.5, 0.0, 0.0], [6.5, 0.0, 0.0]]),
+                      3: np.array([[8.0, 0.0, 0.0], [10.0, 0.0, 0.0]]),
+                      4: np.zeros((0, 3))}
+        spheres = ResidueSpheres(coordsDict)
+
+        # Tests the gaps between the spheres, which are never larger than the closest atom-atom distance
+        gaps = spheres.getGaps()
+        self.assertAlmostEqual(gaps[0, 1], 3.5)
+        self.assertAlmostEqual(gaps[0, 2], 6.0)
+        self.assertEqual(gaps[0, 3], np.inf)
+
+        # Pairs within 4A (both orders, and each residue with itself)
+        self.assertEqual(spheres.findClosePairs(4), {(1, 1), (2, 2), (3, 3), (1, 2), (2, 1), (2, 3), (3, 2)})
+
+        # Only the first residue against the other residues
+        self.assertEqual(ResidueSpheres({1: coordsDict[1]}).findClosePairs(4, spheres), {(1, 1), (1, 2)})
+
+if __name__ == '__main__':
+    unittest.main()
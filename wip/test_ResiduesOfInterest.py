@@ -0,0 +1,85 @@
+from multirin.analysis.ResiduesOfInterest import ResiduesOfInterest, ksStatistics, samplePermutations, calculateSignificance
+from argparse import Namespace
+import numpy as np
+import networkx as nx
+import pandas as pd
+import scipy
+import tempfile
+import unittest
+
+# Define class to test the program
+class testResiduesOfInterest (unittest.TestCase):
+
+    def test_samplePermutations (self):
+
+        sampleIndices = samplePermutations(10, 4, 50, np.random.default_rng(0))
+
+        # Tests that every sample has 4 different indices from the population
+        self.assertEqual(sampleIndices.shape, (50, 4))
+        self.assertTrue(all(len(set(sample)) == 4 for sample in sampleIndices.tolist()))
+        self.assertTrue((sampleIndices >= 0).all() and (sampleIndices < 10).all())
+
+        with self.assertRaises(ValueError):
+            samplePermutations(3, 4, 50, np.random.default_rng(0))
+
+    def test_calculateSignificance (self):
+
+        # Input set and random samples with tied values (as with the numbers of adjacent network residues)
+        inputSet = [0, 1, 1, 2, 3, 3, 3, 5]
+        randomSamples = np.random.default_rng(0).integers(0, 6, size=(20, 8))
+
+        sig_test_df = calculateSignificance(inputSet, randomSamples)
+
+        # Tests that the statistics and p-values are the same as running the KS test on each random sample
+        for i, randomSample in enumerate(randomSamples):
+            ksStat, pValue = scipy.stats.ks_2samp(inputSet, randomSample)
+
+            self.assertAlmostEqual(ksStatistics(np.array(inputSet), randomSamples)[i], ksStat)
+            self.assertEqual(sig_test_df['ks_stat'][i], ksStat)
+            self.assertEqual(sig_test_df['pvalue'][i], pValue)
+            self.assertAlmostEqual(sig_test_df['non-input_set_mean'][i], np.mean(randomSample))
+
+    def test_findSignificance_jobs (self):
+
+        # Runs the same significance test (in 3 blocks of iterations) with one and two worker processes
+        with tempfile.TemporaryDirectory() as tempDir:
+
+            sigTestDfs = []
+            for jobs in [1, 2]:
+                args = Namespace(find_significance='tests/data/sum_net_test/6B8Z_qFit_chainA.pdb', col='set', n_iter_sig_test=2500, seed=1, jobs=jobs,
+                                 outputname=f'{tempDir}/jobs{jobs}', no_normalize_by_total=False, histogram=False, cumulative_histogram=False)
+
+                roi = ResiduesOfInterest(args)
+                roi.sumNetwork = nx.Graph([(20, 40), (40, 60), (60, 80)])
+                roi.inputSetDict = {'set': [20, 21, 22, 40, 41, 42]}
+                roi.findSignificance()
+
+                sigTestDfs.append(pd.read_csv(f'{tempDir}/jobs{jobs}_set_sig_test.csv'))
+
+        # Tests that the results are the same for the same seed regardless of the number of worker processes
+        self.assertEqual(len(sigTestDfs[0]), 2500)
+        pd.testing.assert_frame_equal(sigTestDfs[0], sigTestDfs[1])
+
+    def test_findSignificanceAllCols (self):
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            args = Namespace(find_significance='tests/data/sum_net_test/6B8Z_qFit_chainA.pdb', col='set2', n_iter_sig_test=1200, seed=1, jobs=1,
+                             outputname=f'{tempDir}/test', no_normalize_by_total=False, histogram=False, cumulative_histogram=False)
+
+            roi = ResiduesOfInterest(args)
+            roi.sumNetwork = nx.Graph([(20, 40), (40, 60), (60, 80)])
+            roi.inputSetDict = {'set1': [20, 21, 22, 40, 41, 42], 'set2': [60, 61, 62, 80]}
+
+            # Runs every column at once, then only the second column
+            roi.findSignificanceAllCols()
+            roi.findSignificance()
+
+            allColsDf = pd.read_csv(f'{tempDir}/test_sig_test.csv')
+            colDf = pd.read_csv(f'{tempDir}/test_set2_sig_test.csv')
+
+        # Tests that the combined table has the results of every column, and that these are the same as running each column alone
+        self.assertEqual(allColsDf['col'].value_counts().to_dict(), {'set1': 1200, 'set2': 1200})
+        pd.testing.assert_frame_equal(allColsDf[allColsDf['col'] == 'set2'].drop(columns='col').reset_index(drop=True), colDf)
+
+if __name__ == '__main__':
+    unittest.main()
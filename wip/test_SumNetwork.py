@@ -1,5 +1,6 @@
 from multirin.analysis.SumNetwork import SumNetwork
 from multirin.generate.MultiNetwork import MultiNetwork
+from multirin.generate.NetworkBlocks import getGroupSums
 from argparse import Namespace
 import unittest
 import numpy as np
@@ -149,5 +150,45 @@ class testSumNetwork (unittest.TestCase):
         self.assertEqual(labels_unshifted, ['180','309','310'])
         self.assertEqual(labels_backshifted, ['109','215','216'])    
 
+    def test_calculateSum_chunked (self):
+
+        args = Namespace(scale_sum_network='none', sum_network_scaling_factor=20, remove_weak_edges=20)
+        sumNetwork = SumNetwork(args)
+
+        # Random symmetric networks, as a NumPy array and as a lazily loaded array that is read one network at a time
+        rng = np.random.default_rng(0)
+        weights = rng.random((5, 6, 6)) * (rng.random((5, 6, 6)) < 0.5)
+        weights = weights + weights.transpose(0, 2, 1)
+        array = xr.DataArray(weights, coords=dict(network=list('ABCDE'), firstResi=range(6), secondResi=range(6)), dims=("network", "firstResi", "secondResi"))
+        chunkedArray = array.chunk({'network': 1})
+
+        sumArray = sumNetwork.calculateSum(array)
+
+        # Asserts that the sums are the same as summing across the network axis, and do not depend on how the array is read
+        self.assertTrue(sumArray.equals(sumNetwork.calculateSum(chunkedArray)))
+
+        # Asserts that the weakest 20% of the non-zero sums are removed
+        sumValues = array.sum(dim='network').to_numpy()
+        nonzeroValues = np.sort(sumValues[sumValues != 0])
+        cutoffValue = nonzeroValues[round(nonzeroValues.size * 0.2)]
+        self.assertTrue(np.array_equal(sumArray.to_numpy(), np.where(sumValues < cutoffValue, 0.0, sumValues)))
+
+    def test_groupSums (self):
+
+        rng = np.random.default_rng(1)
+        weights = rng.random((6, 4, 4)) * (rng.random((6, 4, 4)) < 0.5)
+        array = xr.DataArray(weights, coords=dict(network=list('ABCDEF'), firstResi=range(4), secondResi=range(4)), dims=("network", "firstResi", "secondResi"))
+
+        # Groups can overlap, and do not have to include every network
+        groupIndices = [[0, 2, 3], [3, 4], [5]]
+
+        # Asserts that the sums of all groups are the same as summing each subset array, whether the array is dense, lazily loaded, or sparse
+        import sparse
+        for groupArray in [array, array.chunk({'network': 4}), array.copy(data=sparse.COO.from_numpy(weights))]:
+            groupSums = getGroupSums(groupArray, groupIndices)
+
+            for group, indices in enumerate(groupIndices):
+                self.assertTrue(np.allclose(groupSums[group], array.isel(network=indices).sum(dim='network')))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file